@@ -1,10 +1,14 @@
 #!/usr/bin/env python
 """
 Command line interface to interact with the cost report's scripts
+The writers, and their dependencies (openpyxl, matplotlib and Pillow), are
+only imported when their stage runs, so that reading the cost report starts
+quickly.
 """
 
 # Standard library modules.
 import os
+import sys
 import logging
 import glob
 from optparse import OptionParser
@@ -13,18 +17,43 @@ from operator import attrgetter
 # Third party modules.
 
 # Local modules.
-from fsaecostreport.xlscsv import xlstocsv
-from fsaecostreport.reader import SystemFileReader, MetadataReader
-from fsaecostreport.writer import (
-    CostReportLaTeXWriter,
-    eBOMWriter,
-    FSGBOMWriter,
-    FSGAppendixLaTeXWriter,
+from fsaecostreport.reader import (
+    SystemFileReader,
+    MetadataReader,
+    COMMA_SPLIT_PATTERN,
+)
+from fsaecostreport.pipeline import Pipeline, PipelineError, set_model, get_model
+import fsaecostreport.tracing as tracing
+import fsaecostreport.metrics as metrics
+from fsaecostreport.constants import (
+    BUILD_DIR,
+    PROFILE_DIR,
+    MEMORY_REPORT_FILE,
+    TRACE_FILE,
 )
 
 # Globals and constants variables.
 
-logging.getLogger().setLevel(logging.DEBUG)
+
+def _render_charts(basepath, labels, chart_format, system_charts):
+    import fsaecostreport.graph as graph
+
+    metadata = get_model(basepath, labels)
+    graph.cost_summary(basepath, metadata, chart_format)
+    if system_charts:
+        graph.system_charts(basepath, metadata, chart_format)
+
+
+def _prepare_pictures(basepath, labels, dpi):
+    from fsaecostreport.picture import prepare_pictures
+
+    prepare_pictures(basepath, get_model(basepath, labels), dpi)
+
+
+def _write(writer, basepath, labels):
+    metadata = get_model(basepath, labels)
+    with tracing.span(type(writer).__name__, "writer"):
+        writer.write(basepath, metadata)
 
 
 def run():
@@ -75,6 +104,84 @@ def run():
         help="Read, process and write the eBOM",
     )
 
+    parser.add_option(
+        "--bundle",
+        action="store",
+        dest="bundle",
+        default=None,
+        help="Load the cost report from this bundle instead of reading the CSVs (see fsaecostreport.bundle)",
+    )
+
+    parser.add_option(
+        "--chart-format",
+        action="store",
+        dest="chart_format",
+        type="choice",
+        choices=["pdf", "png"],
+        default="pdf",
+        help="Format of the charts, png being faster to include in LaTeX [default=pdf]",
+    )
+
+    parser.add_option(
+        "--system-charts",
+        action="store_true",
+        dest="system_charts",
+        default=False,
+        help="Add the cost breakdown charts of each system to the cost report",
+    )
+
+    parser.add_option(
+        "--picture-dpi",
+        action="store",
+        type="int",
+        dest="picture_dpi",
+        default=None,
+        help="Downscale the pictures to this resolution before including them",
+    )
+
+    parser.add_option(
+        "--split",
+        action="store_true",
+        dest="split",
+        default=False,
+        help="Write each system chapter in its own file, included with \\include",
+    )
+
+    parser.add_option(
+        "--include-only",
+        action="store",
+        dest="include_only",
+        default=None,
+        help="Comma-separated labels of the systems to compile with \\includeonly (implies --split)",
+    )
+
+    parser.add_option(
+        "--bom-chunk-size",
+        action="store",
+        type="int",
+        dest="bom_chunk_size",
+        default=None,
+        help="Split the BOM tables in pages of this number of rows instead of a longtable",
+    )
+
+    parser.add_option(
+        "--ebom-format",
+        action="store",
+        dest="ebom_format",
+        type="choice",
+        choices=["csv", "xlsx"],
+        default="csv",
+        help="Format of the eBOM [default=csv]",
+    )
+
+    parser.add_option(
+        "--estimate-pages",
+        action="store_true",
+        dest="estimate_pages",
+        default=False,
+        help="Estimate the cost table pages of the eBOM missing from the .aux file",
+    )
+
     parser.add_option(
         "--fsg",
         action="store_true",
@@ -83,16 +190,173 @@ def run():
         help="Read, process and write FSG related documents",
     )
 
+    parser.add_option(
+        "--fsg-write-only",
+        action="store_true",
+        dest="fsg_write_only",
+        default=False,
+        help="Stream the FSG workbook to disk (lower memory use for large cars)",
+    )
+
+    parser.add_option(
+        "--fsg-layout",
+        action="store",
+        dest="fsg_layout",
+        type="choice",
+        choices=["sheets", "compact"],
+        default="sheets",
+        help="Layout of the FSG workbook: one sheet per cost table (sheets) or one sheet per system (compact) [default=sheets]",
+    )
+
+    parser.add_option(
+        "--fsg-shard",
+        action="store",
+        dest="fsg_shard",
+        default=None,
+        help="Write the FSG cost tables in one workbook per system (system) or per N components (N)",
+    )
+
+    parser.add_option(
+        "--watch",
+        action="store_true",
+        dest="watch",
+        default=False,
+        help="Keep running and regenerate the outputs of the modified systems when their files change",
+    )
+
+    parser.add_option(
+        "--watch-interval",
+        action="store",
+        type="float",
+        dest="watch_interval",
+        default=0.5,
+        help="Interval between two polls of the files in watch mode, in seconds [default=0.5]",
+    )
+
+    parser.add_option(
+        "--debounce",
+        action="store",
+        type="float",
+        dest="debounce",
+        default=1.0,
+        help="Delay without modification before the files are read again in watch mode, in seconds [default=1.0]",
+    )
+
+    parser.add_option(
+        "-j",
+        "--processes",
+        action="store",
+        type="int",
+        dest="processes",
+        default=None,
+        help="Number of worker processes [default=number of CPUs]",
+    )
+
+    parser.add_option(
+        "--profile",
+        action="store_true",
+        dest="profile",
+        default=False,
+        help="Profile each stage and save the statistics in build/profile",
+    )
+
+    parser.add_option(
+        "--profile-top",
+        action="store",
+        type="int",
+        dest="profile_top",
+        default=10,
+        help="Number of functions listed in the profile summary of each stage [default=10]",
+    )
+
+    parser.add_option(
+        "--memory-report",
+        action="store_true",
+        dest="memory_report",
+        default=False,
+        help="Trace the memory of each stage and write a report in build/memory.json",
+    )
+
+    parser.add_option(
+        "--trace",
+        action="store_true",
+        dest="trace",
+        default=False,
+        help="Record the spans of each stage and write them in build/trace.json (Chrome trace event format)",
+    )
+
+    parser.add_option(
+        "--metrics",
+        action="store_true",
+        dest="metrics",
+        default=False,
+        help="Print the metrics of the run (files read, rows parsed, cache hits, bytes written, etc.)",
+    )
+
+    parser.add_option(
+        "--metrics-textfile",
+        action="store",
+        dest="metrics_textfile",
+        default=None,
+        help="Write the metrics of the run in this file, in the Prometheus text format",
+    )
+
+    parser.add_option(
+        "-v",
+        "--verbose",
+        action="store_true",
+        dest="verbose",
+        default=False,
+        help="Log debug messages",
+    )
+
     options, args = parser.parse_args()
 
+    if options.fsg_shard is not None and options.fsg_shard != "system":
+        try:
+            shard = int(options.fsg_shard)
+        except ValueError:
+            shard = 0
+        if shard < 1:
+            parser.error("--fsg-shard must be system or a positive number")
+
+    if options.bom_chunk_size is not None and options.bom_chunk_size < 2:
+        parser.error("--bom-chunk-size must be at least 2")
+
+    logging.getLogger().setLevel(logging.DEBUG if options.verbose else logging.INFO)
+
     # basepath
     basepath = os.path.abspath(options.basepath)
-    logging.info("Base path: %s" % basepath)
+    logging.info("Base path: %s", basepath)
+
+    # profiling
+    profile_dir = None
+    if options.profile:
+        profile_dir = os.path.join(basepath, BUILD_DIR, PROFILE_DIR)
+        logging.info("Profiling stages in %s", profile_dir)
 
-    # read metadata
-    logging.info("Reading metadata...")
-    metadata = MetadataReader().read(basepath)
-    logging.info("Reading metadata... DONE")
+    if options.trace:
+        tracing.enable()
+
+    # in watch mode, the first build runs in the main process, so that the
+    # chapters and eBOM rows are kept by the writers given to the watcher
+    processes = 1 if options.watch else options.processes
+    pipeline = Pipeline(processes, profile_dir, options.memory_report)
+
+    # read metadata, or the whole cost report from its bundle
+    if options.bundle is not None:
+        from fsaecostreport.bundle import Bundle
+
+        logging.info("Loading bundle %s...", options.bundle)
+        with Bundle.open(options.bundle) as bundle:
+            if not bundle.is_uptodate(basepath):
+                logging.warning("The bundle is outdated, compile it again")
+            metadata = pipeline.call("bundle", bundle.to_metadata, basepath)
+        logging.info("Loading bundle %s... DONE", options.bundle)
+    else:
+        logging.info("Reading metadata...")
+        metadata = pipeline.call("metadata", MetadataReader().read, basepath)
+        logging.info("Reading metadata... DONE")
 
     # systems
     values = metadata.systems
@@ -118,40 +382,190 @@ def run():
     metadata.systems = sorted(systems)
 
     if options.xlsx2csv:
+        from fsaecostreport.xlscsv import xlstocsv
+
         for system in metadata.systems:
             dir = os.path.join(basepath, system.label)
             output_dir = os.path.join(dir, "components")
 
             for input_file in glob.glob(os.path.join(dir, "*.xls*")):
-                logging.info("Converting %s..." % input_file)
+                logging.info("Converting %s...", input_file)
                 xlstocsv(input_file, output_dir)
-                logging.info("Converting %s... DONE" % input_file)
+                logging.info("Converting %s... DONE", input_file)
 
     # read systems
-    if options.read or options.write or options.ebom or options.fsg:
+    reader = None
+    if options.watch:
+        from fsaecostreport.incremental import IncrementalReader
+
+        # kept to read again only the modified components
+        reader = IncrementalReader(basepath, [system.label for system in systems])
+        logging.info("Reading systems...")
+        metadata = pipeline.call("read", reader.read)
+        logging.info("Reading systems... DONE")
+    elif options.bundle is None and (
+        options.read or options.write or options.ebom or options.fsg
+    ):
         for system in metadata.systems:
-            logging.info("Reading system %s..." % system)
-            SystemFileReader().read(basepath, system)
-            logging.info("Reading system %s... DONE" % system)
+            logging.info("Reading system %s...", system)
+            name = "read_" + system.label
+            pipeline.call(name, SystemFileReader().read, basepath, system)
+            logging.info("Reading system %s... DONE", system)
+
+    # the workers which do not inherit the model load it from the bundle
+    bundle = options.bundle if reader is None else None
+    set_model(basepath, metadata, bundle)
+    labels = [system.label for system in metadata.systems]
+
+    # charts and pictures shared by the cost report and the FSG appendix
+    requires = []
+    outputs = []
+    if options.write or options.fsg:
+        pipeline.add_stage(
+            "charts",
+            _render_charts,
+            (
+                basepath,
+                labels,
+                options.chart_format,
+                options.system_charts and options.write,
+            ),
+        )
+
+        if options.picture_dpi is not None:
+            pipeline.add_stage(
+                "pictures", _prepare_pictures, (basepath, labels, options.picture_dpi)
+            )
+            requires.append("pictures")
 
     # write cost report
     if options.write:
-        logging.info("Writing cost report...")
-        CostReportLaTeXWriter().write(basepath, metadata)
-        logging.info("Writing cost report... DONE")
+        from fsaecostreport.writer import CostReportLaTeXWriter
+
+        include_only = None
+        if options.include_only is not None:
+            include_only = COMMA_SPLIT_PATTERN.findall(options.include_only.upper())
+            for label in include_only:
+                if label not in available_systems:
+                    parser.error("Unknown system: %s" % label)
+
+        writer = CostReportLaTeXWriter(
+            options.chart_format,
+            options.system_charts,
+            options.picture_dpi,
+            options.split,
+            include_only,
+            options.bom_chunk_size,
+            render_charts=False,
+            reuse_chapters=options.watch,
+        )
+        pipeline.add_stage(
+            "report", _write, (writer, basepath, labels), requires=requires
+        )
+        outputs.append(("report", writer))
 
     # write eBOM
     if options.ebom:
-        logging.info("Writing eBOM...")
-        eBOMWriter().write(basepath, metadata)
-        logging.info("Writing eBOM... DONE")
+        from fsaecostreport.writer import eBOMWriter, eBOMXLSXWriter
+
+        if options.ebom_format == "xlsx":
+            writer_class = eBOMXLSXWriter
+        else:
+            writer_class = eBOMWriter
+        writer = writer_class(
+            options.estimate_pages, options.bom_chunk_size, reuse_rows=options.watch
+        )
+        pipeline.add_stage("ebom", _write, (writer, basepath, labels))
+        outputs.append(("ebom", writer))
 
     # write FSG related documents
     if options.fsg:
-        logging.info("Writing FSG...")
-        FSGBOMWriter().write(basepath, metadata)
-        FSGAppendixLaTeXWriter().write(basepath, metadata)
-        logging.info("Writing FSG... DONE")
+        from fsaecostreport.writer import FSGBOMWriter, FSGAppendixLaTeXWriter
+
+        writer = FSGBOMWriter(
+            write_only=options.fsg_write_only,
+            shard=options.fsg_shard,
+            processes=options.processes,
+            layout=options.fsg_layout,
+        )
+        pipeline.add_stage("fsg_bom", _write, (writer, basepath, labels))
+        outputs.append(("fsg_bom", writer))
+
+        writer = FSGAppendixLaTeXWriter(
+            options.chart_format,
+            picture_dpi=options.picture_dpi,
+            render_charts=False,
+            reuse_chapters=options.watch,
+        )
+        # the appendix is written to the same file as the cost report
+        if options.write:
+            requires.append("report")
+        pipeline.add_stage(
+            "fsg_appendix", _write, (writer, basepath, labels), requires=requires
+        )
+        outputs.append(("fsg_appendix", writer))
+
+    try:
+        pipeline.run()
+    except PipelineError as ex:
+        logging.error("%s", ex, exc_info=ex.__cause__)
+        sys.exit(1)
+
+    for name, duration in sorted(pipeline.timings.items()):
+        logging.info("Stage %s: %.2f s", name, duration)
+
+    if profile_dir is not None:
+        from fsaecostreport.profiling import print_summary
+
+        print_summary(profile_dir, list(pipeline.timings), options.profile_top)
+
+    if options.memory_report:
+        for name, stats in pipeline.memory.items():
+            logging.info(
+                "Stage %s: current %.1f MiB, peak %.1f MiB",
+                name,
+                stats["current"] / 2**20,
+                stats["peak"] / 2**20,
+            )
+
+        from fsaecostreport.memory import write_report
+
+        filepath = os.path.join(basepath, BUILD_DIR, MEMORY_REPORT_FILE)
+        write_report(filepath, pipeline.memory)
+        logging.info("Memory report: %s", filepath)
+
+    if options.trace:
+        filepath = os.path.join(basepath, BUILD_DIR, TRACE_FILE)
+        tracing.write_trace(filepath)
+        tracing.clear()  # the watcher writes the spans of each regeneration
+        logging.info("Trace: %s", filepath)
+
+    if options.metrics:
+        print(metrics.registry.format_summary())
+
+    if options.metrics_textfile is not None:
+        metrics.registry.write_textfile(options.metrics_textfile)
+        logging.info("Metrics: %s", options.metrics_textfile)
+
+    if options.watch:
+        from fsaecostreport.watch import Watcher
+
+        watcher = Watcher(
+            basepath,
+            reader,
+            outputs,
+            options.chart_format if options.write or options.fsg else None,
+            options.system_charts and options.write,
+            options.picture_dpi if options.write or options.fsg else None,
+            options.watch_interval,
+            options.debounce,
+            os.path.join(basepath, BUILD_DIR, TRACE_FILE) if options.trace else None,
+            options.metrics_textfile,
+        )
+        try:
+            watcher.run()
+        except KeyboardInterrupt:
+            logging.info("Watching stopped")
 
 
 if __name__ == "__main__":
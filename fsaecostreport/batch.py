@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+"""
+Regenerates the cost reports of many cars, e.g. of several competition
+years, in one process.
+The cars are read concurrently by worker processes, which send back their
+model in its flat serialization (see :mod:`fsaecostreport.serialization`),
+then the output stages of all the cars are scheduled in one pipeline, whose
+worker processes are started once and share the read models and the imported
+writers, instead of paying the startup of the command line interface for
+each car.
+A failed car does not stop the others: the status and timings of each car
+are summarized at the end.
+
+Usage::
+
+    python -m fsaecostreport.batch files/2012 files/2013 -w -e
+"""
+
+# Standard library modules.
+import os
+import sys
+import json
+import time
+import logging
+from argparse import ArgumentParser
+
+# Third party modules.
+
+# Local modules.
+from fsaecostreport.reader import MetadataReader, SystemFileReader
+from fsaecostreport.pipeline import Pipeline, set_model
+from fsaecostreport.app import _render_charts, _write
+import fsaecostreport.serialization as serialization
+
+# Globals and constants variables.
+
+OUTPUTS = ("report", "ebom", "fsg")
+
+
+def _read(basepath):
+    metadata = MetadataReader().read(basepath)
+
+    for system in metadata.systems:
+        SystemFileReader().read(basepath, system)
+
+    return metadata
+
+
+def _read_serialized(basepath):
+    # much faster to send back to the main process than a pickled model
+    return serialization.dumps(_read(basepath))
+
+
+def _preload(outputs):
+    """
+    Imports the writers and their dependencies before the worker processes
+    are started, so that they are imported once for all the cars.
+    """
+    import fsaecostreport.writer  # noqa: F401
+
+    if "report" in outputs or "fsg" in outputs:
+        import matplotlib.figure  # noqa: F401
+        import matplotlib.backends.backend_agg  # noqa: F401
+    if "fsg" in outputs:
+        import openpyxl  # noqa: F401
+
+
+def _add_stages(pipeline, basepath, labels, outputs, chart_format):
+    from fsaecostreport.writer import (
+        CostReportLaTeXWriter,
+        eBOMWriter,
+        FSGBOMWriter,
+        FSGAppendixLaTeXWriter,
+    )
+
+    def add_stage(name, func, args, requires=()):
+        requires = [basepath + ":" + required for required in requires]
+        pipeline.add_stage(basepath + ":" + name, func, args, requires=requires)
+
+    if "report" in outputs or "fsg" in outputs:
+        add_stage("charts", _render_charts, (basepath, labels, chart_format, False))
+
+    if "report" in outputs:
+        writer = CostReportLaTeXWriter(chart_format, render_charts=False)
+        add_stage("report", _write, (writer, basepath, labels), requires=["charts"])
+
+    if "ebom" in outputs:
+        add_stage("ebom", _write, (eBOMWriter(), basepath, labels))
+
+    if "fsg" in outputs:
+        # the pipeline already runs the cars in parallel
+        writer = FSGBOMWriter(processes=1)
+        add_stage("fsg_bom", _write, (writer, basepath, labels))
+
+        # the appendix is written to the same file as the cost report
+        requires = ["charts"]
+        if "report" in outputs:
+            requires.append("report")
+        writer = FSGAppendixLaTeXWriter(chart_format, render_charts=False)
+        add_stage("fsg_appendix", _write, (writer, basepath, labels), requires)
+
+
+def run_batch(basepaths, outputs=("report",), chart_format="pdf", processes=None):
+    """
+    Reads the cost reports of *basepaths* and writes their *outputs*
+    (``report``, ``ebom`` and/or ``fsg``).
+    Returns a :class:`list` of the summary of each car: its base path,
+    status (``ok`` or ``failed``), duration of each stage (in seconds) and
+    errors.
+    A base path given several times is only regenerated once.
+
+    :arg processes: number of worker processes shared by all the cars
+        (default: number of CPUs)
+    """
+    for output in outputs:
+        if output not in OUTPUTS:
+            raise ValueError("Unknown output: %s" % output)
+
+    unique_basepaths = []
+    for basepath in basepaths:
+        basepath = os.path.abspath(basepath)
+        if basepath in unique_basepaths:
+            logging.warning("Duplicate base path ignored: %s", basepath)
+            continue
+        unique_basepaths.append(basepath)
+    basepaths = unique_basepaths
+
+    # reading, the longest stage of each car
+    readers = Pipeline(processes, keep_going=True)
+    for basepath in basepaths:
+        readers.add_stage(basepath + ":read", _read_serialized, (basepath,))
+    results = readers.run()
+
+    pipeline = Pipeline(processes, keep_going=True)
+    for basepath in basepaths:
+        name = basepath + ":read"
+        if name not in results:
+            continue
+
+        metadata = pipeline.call(basepath + ":load", serialization.loads, results[name])
+        set_model(basepath, metadata)
+        labels = [system.label for system in metadata.systems]
+        _add_stages(pipeline, basepath, labels, outputs, chart_format)
+
+    _preload(outputs)
+    pipeline.run()
+
+    summaries = []
+    for basepath in basepaths:
+        prefix = basepath + ":"
+        timings = {}
+        errors = {}
+        skipped = []
+        for stages in [readers, pipeline]:
+            for name, duration in stages.timings.items():
+                if name.startswith(prefix):
+                    timings[name[len(prefix) :]] = duration
+            for name, ex in stages.errors.items():
+                if name.startswith(prefix):
+                    errors[name[len(prefix) :]] = str(ex)
+            skipped.extend(
+                name[len(prefix) :]
+                for name in stages.skipped
+                if name.startswith(prefix)
+            )
+
+        summaries.append(
+            {
+                "basepath": basepath,
+                "status": "failed" if errors else "ok",
+                "timings": timings,
+                "errors": errors,
+                "skipped": skipped,
+            }
+        )
+
+    return summaries
+
+
+def format_summary(summaries, duration=None):
+    lines = []
+    for summary in summaries:
+        lines.append(
+            "%-6s %8.2f s  %s"
+            % (
+                summary["status"].upper(),
+                sum(summary["timings"].values()),
+                summary["basepath"],
+            )
+        )
+
+        for name, stage_duration in sorted(summary["timings"].items()):
+            lines.append("         %-16s %8.2f s" % (name, stage_duration))
+        for name, message in sorted(summary["errors"].items()):
+            lines.append("         %-16s FAILED: %s" % (name, message))
+        for name in summary["skipped"]:
+            lines.append("         %-16s skipped" % name)
+
+    failed = sum(1 for summary in summaries if summary["status"] != "ok")
+    line = "%i car(s), %i failed" % (len(summaries), failed)
+    if duration is not None:
+        line += " in %.2f s" % duration
+    lines.append(line)
+
+    return "\n".join(lines)
+
+
+def run():
+    parser = ArgumentParser(description="Regenerate the cost reports of many cars")
+    parser.add_argument("basepaths", nargs="+", help="Base paths of the cost reports")
+    parser.add_argument(
+        "-w", "--write", action="store_true", help="Write the cost reports"
+    )
+    parser.add_argument("-e", "--ebom", action="store_true", help="Write the eBOMs")
+    parser.add_argument("--fsg", action="store_true", help="Write the FSG documents")
+    parser.add_argument(
+        "--chart-format", default="pdf", choices=["pdf", "png"], help="Chart format"
+    )
+    parser.add_argument(
+        "-j",
+        "--processes",
+        type=int,
+        help="Number of worker processes (default: number of CPUs)",
+    )
+    parser.add_argument("--summary", help="Write the summary in this JSON file")
+
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.INFO)
+
+    outputs = []
+    if args.write:
+        outputs.append("report")
+    if args.ebom:
+        outputs.append("ebom")
+    if args.fsg:
+        outputs.append("fsg")
+
+    start = time.perf_counter()
+    summaries = run_batch(args.basepaths, outputs, args.chart_format, args.processes)
+    duration = time.perf_counter() - start
+
+    print(format_summary(summaries, duration))
+
+    if args.summary:
+        with open(args.summary, "w") as fp:
+            json.dump(
+                {"duration": duration, "cars": summaries}, fp, indent=2, sort_keys=True
+            )
+
+    if any(summary["status"] != "ok" for summary in summaries):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    run()
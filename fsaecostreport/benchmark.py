@@ -0,0 +1,433 @@
+#!/usr/bin/env python
+"""
+Benchmarks of the readers, the roll-up of the costs and the writers on
+generated cars (see :mod:`fsaecostreport.generator`).
+The results are saved in a JSON file, which can be used as a baseline for
+a later run: the slowdowns beyond a threshold are reported as regressions.
+The import time of the command line interface is measured separately with
+``python -X importtime`` and checked against a budget.
+"""
+
+# Standard library modules.
+import os
+import re
+import sys
+import glob
+import json
+import time
+import shutil
+import logging
+import platform
+import tempfile
+import statistics
+import subprocess
+from argparse import ArgumentParser
+
+# Third party modules.
+
+# Local modules.
+from fsaecostreport.generator import CarGenerator
+from fsaecostreport.reader import (
+    MetadataReader,
+    SystemFileReader,
+    PartFileReader,
+    ascii,
+)
+from fsaecostreport.system import System
+from fsaecostreport.writer import (
+    CostReportLaTeXWriter,
+    eBOMWriter,
+    FSGBOMWriter,
+    FSGAppendixLaTeXWriter,
+)
+import fsaecostreport.graph as graph
+import fsaecostreport.serialization as serialization
+
+# Globals and constants variables.
+from fsaecostreport.constants import COMPONENTS_DIR
+
+BASELINE_VERSION = 1
+
+SIZES = {
+    "small": dict(systems=2, parts=10, depth=2, fanout=3, items=2),
+    "medium": dict(systems=6, parts=60, depth=3, fanout=3, shared=3, items=4),
+    "large": dict(systems=10, parts=250, depth=4, fanout=4, shared=8, items=6),
+}
+
+DEFAULT_THRESHOLD = 0.2
+
+# Maximum import time (in seconds) of the command line interface with --read
+STARTUP_BUDGET = 0.15
+HEAVY_MODULES = ["openpyxl", "matplotlib", "PIL"]
+
+IMPORTTIME_PATTERN = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)")
+
+
+def _time(func, setup=None, repeat=3):
+    """
+    Returns the minimum and median durations (in seconds) of *repeat* calls
+    of *func*. *setup* is called, untimed, before each call.
+    """
+    durations = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+
+    return {
+        "min": min(durations),
+        "median": statistics.median(durations),
+        "repeat": repeat,
+    }
+
+
+def _read(basepath):
+    metadata = MetadataReader().read(basepath)
+
+    for system in metadata.systems:
+        SystemFileReader().read(basepath, system)
+
+    return metadata
+
+
+def _iter_benchmarks(basepath, metadata):
+    """
+    Yields the name, function and setup function of each benchmark.
+    """
+    components = [
+        component
+        for system in metadata.systems
+        for component in system.get_components()
+    ]
+
+    names = []
+    for component in components:
+        names.append(component.name)
+        for items in [
+            component.materials,
+            component.processes,
+            component.fasteners,
+            component.toolings,
+        ]:
+            names.extend(item.name for item in items)
+
+    def ascii_names():
+        for name in names:
+            ascii(name)
+
+    yield "ascii", ascii_names, None
+
+    system = metadata.systems[0]
+    part_filepaths = sorted(
+        glob.glob(os.path.join(basepath, system.label, COMPONENTS_DIR, "*-00*.csv"))
+    )
+
+    def parse_parts():
+        # a new system, as a component can only be added once
+        other = System(system._order, system.label, system.name, system.colour)
+        for filepath in part_filepaths:
+            PartFileReader().read(filepath, other)
+
+    yield "parse_parts", parse_parts, None
+
+    yield "read_systems", lambda: _read(basepath), None
+
+    def rollup():
+        for component in components:
+            component.quantity * component.unitcost
+
+    yield "rollup", rollup, None
+
+    def hierarchy():
+        for system in metadata.systems:
+            system.get_hierarchy()
+
+    yield "get_hierarchy", hierarchy, None
+
+    data = serialization.dumps(metadata)
+    yield "dumps", lambda: serialization.dumps(metadata), None
+    yield "loads", lambda: serialization.loads(data), None
+
+    writers = [
+        CostReportLaTeXWriter(render_charts=False),
+        eBOMWriter(),
+        FSGBOMWriter(),
+        FSGAppendixLaTeXWriter(render_charts=False),
+    ]
+    for writer in writers:
+        yield type(writer).__name__, lambda w=writer: w.write(basepath, metadata), None
+
+    chart_format = "pdf"
+    chart_path = graph.cost_summary(basepath, metadata, chart_format, render=False)
+
+    def remove_chart():
+        # otherwise, the chart is not rendered again
+        for path in [chart_path, graph._get_hashpath(chart_path)]:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def cost_summary():
+        graph.cost_summary(basepath, metadata, chart_format)
+
+    yield "cost_summary", cost_summary, remove_chart
+
+
+def run_benchmarks(sizes=None, repeat=3, names=None):
+    """
+    Generates a car of each size, runs the benchmarks and returns the results,
+    as saved by :func:`save_results`.
+
+    :arg sizes: :class:`dict` of the name and the arguments of
+        :class:`CarGenerator <fsaecostreport.generator.CarGenerator>` of each
+        car (default: :data:`SIZES`)
+    :arg repeat: number of times each benchmark is run
+    :arg names: names of the benchmarks to run (default: all)
+    """
+    if sizes is None:
+        sizes = SIZES
+
+    results = {}
+    for size, kwargs in sizes.items():
+        basepath = tempfile.mkdtemp()
+        try:
+            logging.info("Generating %s car...", size)
+            CarGenerator(**kwargs).generate(basepath)
+            metadata = _read(basepath)
+
+            results[size] = {}
+            for name, func, setup in _iter_benchmarks(basepath, metadata):
+                if names is not None and name not in names:
+                    continue
+
+                logging.info("Running %s on %s car...", name, size)
+                results[size][name] = _time(func, setup, repeat)
+                logging.info(
+                    "Running %s on %s car... DONE (%.4f s)",
+                    name,
+                    size,
+                    results[size][name]["min"],
+                )
+        finally:
+            shutil.rmtree(basepath, ignore_errors=True)
+
+    return {
+        "version": BASELINE_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+
+
+def save_results(filepath, results):
+    dirpath = os.path.dirname(filepath)
+    if dirpath:
+        os.makedirs(dirpath, exist_ok=True)
+
+    with open(filepath, "w") as fp:
+        json.dump(results, fp, indent=2, sort_keys=True)
+
+
+def load_results(filepath):
+    with open(filepath, "r") as fp:
+        results = json.load(fp)
+
+    if results.get("version") != BASELINE_VERSION:
+        raise ValueError("Unsupported baseline version: %s" % results.get("version"))
+
+    return results
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Compares the minimum durations of two runs.
+    Returns a :class:`list` of the size, name, baseline duration, current
+    duration, ratio and whether the benchmark is slower than the baseline by
+    more than *threshold* (e.g. ``0.2`` for 20%), for the benchmarks in both
+    runs.
+    """
+    rows = []
+    for size, benchmarks in sorted(current["results"].items()):
+        baseline_benchmarks = baseline["results"].get(size, {})
+
+        for name, result in sorted(benchmarks.items()):
+            if name not in baseline_benchmarks:
+                continue
+
+            before = baseline_benchmarks[name]["min"]
+            after = result["min"]
+            ratio = after / before if before > 0 else float("inf")
+            rows.append((size, name, before, after, ratio, ratio > 1 + threshold))
+
+    return rows
+
+
+def format_comparison(rows):
+    lines = []
+    for size, name, before, after, ratio, regression in rows:
+        lines.append(
+            "%-8s %-24s %10.4f s %10.4f s %6.2fx%s"
+            % (size, name, before, after, ratio, "  REGRESSION" if regression else "")
+        )
+    return "\n".join(lines)
+
+
+def measure_startup(basepath, args=("--read",)):
+    """
+    Runs the command line interface on *basepath* with ``-X importtime``.
+    Returns the total import time (in seconds) and a :class:`dict` of the
+    cumulative import time of each imported module.
+    """
+    command = [sys.executable, "-X", "importtime", "-m", "fsaecostreport.app"]
+    command += ["-b", basepath] + list(args)
+    process = subprocess.run(
+        command,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+
+    total = 0.0
+    modules = {}
+    for line in process.stderr.splitlines():
+        match = IMPORTTIME_PATTERN.match(line)
+        if not match:
+            continue
+
+        cumulative = int(match.group(2)) / 1e6
+        modules[match.group(4)] = cumulative
+
+        # the time of nested imports is included in the cumulative time
+        if not match.group(3):
+            total += cumulative
+
+    return total, modules
+
+
+def check_startup(basepath, budget=STARTUP_BUDGET):
+    """
+    Measures the import time of ``--read`` on *basepath*.
+    Returns the total import time, the ten slowest modules and a
+    :class:`list` of the problems: over budget or heavy modules imported.
+    """
+    total, modules = measure_startup(basepath)
+
+    problems = []
+    if total > budget:
+        problems.append("import time %.3f s > budget %.3f s" % (total, budget))
+
+    for name in HEAVY_MODULES:
+        if name in modules:
+            problems.append("%s imported (%.3f s)" % (name, modules[name]))
+
+    slowest = sorted(modules.items(), key=lambda item: item[1], reverse=True)
+    return total, slowest[:10], problems
+
+
+def run():
+    parser = ArgumentParser(description="Benchmark the cost report")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    parser_run = subparsers.add_parser("run", help="Run the benchmarks")
+    parser_run.add_argument("output", help="Path of the JSON results")
+    parser_run.add_argument(
+        "--size",
+        action="append",
+        choices=sorted(SIZES),
+        help="Size of the generated car (default: all)",
+    )
+    parser_run.add_argument(
+        "--benchmark", action="append", help="Name of a benchmark (default: all)"
+    )
+    parser_run.add_argument(
+        "--repeat", type=int, default=3, help="Number of runs of each benchmark"
+    )
+    parser_run.add_argument(
+        "--baseline", help="Compare the results with this JSON baseline"
+    )
+    parser_run.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="Relative slowdown reported as a regression (default: %(default)s)",
+    )
+
+    parser_compare = subparsers.add_parser(
+        "compare", help="Compare results with a baseline"
+    )
+    parser_compare.add_argument("baseline", help="Path of the JSON baseline")
+    parser_compare.add_argument("current", help="Path of the JSON results")
+    parser_compare.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="Relative slowdown reported as a regression (default: %(default)s)",
+    )
+
+    parser_startup = subparsers.add_parser(
+        "startup", help="Check the import time of the command line interface"
+    )
+    parser_startup.add_argument(
+        "--basepath", help="Cost report to read (default: small generated car)"
+    )
+    parser_startup.add_argument(
+        "--budget",
+        type=float,
+        default=STARTUP_BUDGET,
+        help="Maximum import time in seconds (default: %(default)s)",
+    )
+
+    args = parser.parse_args()
+
+    if args.command == "startup":
+        basepath = args.basepath
+        if basepath is None:
+            basepath = tempfile.mkdtemp()
+            CarGenerator(**SIZES["small"]).generate(basepath)
+
+        try:
+            total, slowest, problems = check_startup(basepath, args.budget)
+        finally:
+            if args.basepath is None:
+                shutil.rmtree(basepath, ignore_errors=True)
+
+        print("Import time: %.3f s (budget: %.3f s)" % (total, args.budget))
+        for name, duration in slowest:
+            print("  %-40s %.3f s" % (name, duration))
+        for problem in problems:
+            print("FAILED: %s" % problem)
+
+        if problems:
+            sys.exit(1)
+        return
+
+    if args.command == "run":
+        sizes = SIZES
+        if args.size:
+            sizes = dict((size, SIZES[size]) for size in args.size)
+
+        current = run_benchmarks(sizes, args.repeat, args.benchmark)
+        save_results(args.output, current)
+
+        if not args.baseline:
+            return
+        baseline = load_results(args.baseline)
+    else:
+        baseline = load_results(args.baseline)
+        current = load_results(args.current)
+
+    rows = compare(baseline, current, args.threshold)
+    print(format_comparison(rows))
+
+    if any(row[-1] for row in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    logging.getLogger().setLevel(logging.INFO)
+    run()
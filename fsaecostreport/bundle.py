@@ -0,0 +1,421 @@
+#!/usr/bin/env python
+"""
+Compiled cost report: the whole model of a base path packed in one file,
+loaded in a fraction of the time needed to read the CSV files.
+The bundle is the flat serialization of the model
+(see :mod:`fsaecostreport.serialization`), with the paths relative to the
+base path, and additional sections:
+
+    * ``pns``: P/N of each component, in fixed-width records
+    * ``index``: open addressing hash table of the P/Ns, for the lookup of
+      a component in constant time
+    * ``offsets``: first row of each component in the edges, files and
+      cost tables sections
+    * ``hashes``: SHA-1 hash of each drawing and picture
+    * ``source``: signatures (modification time and size) of the files of
+      the base path, to detect an outdated bundle
+
+All the sections can be read from a memory-mapped file, without loading
+the whole model.
+
+Usage::
+
+    python -m fsaecostreport.bundle compile -b BASEPATH
+    python -m fsaecostreport.bundle show -b BASEPATH TM-00001-AA
+    python -m fsaecostreport.app -b BASEPATH --bundle build/model.bundle -e
+"""
+
+# Standard library modules.
+import os
+import sys
+import json
+import time
+import zlib
+import math
+import logging
+from array import array
+from argparse import ArgumentParser
+
+# Third party modules.
+
+# Local modules.
+from fsaecostreport.incremental import IncrementalReader
+from fsaecostreport.picture import get_digest
+import fsaecostreport.serialization as serialization
+
+# Globals and constants variables.
+from fsaecostreport.constants import BUILD_DIR, BUNDLE_FILE
+
+PN_SIZE = 16
+HASH_SIZE = 20  # SHA-1
+
+# sections with one row per element of a component, with the component in
+# the first column, and their number of integer columns
+_OFFSET_SECTIONS = [
+    ("edges", serialization.EDGE_COLUMNS),
+    ("files", serialization.FILE_COLUMNS),
+] + [
+    (name, len(integer_fields) + 1)
+    for name, _class, _attr, integer_fields, _float_fields in serialization.ITEMS
+]
+
+_KINDS = ["part", "assembly"]
+
+
+def get_bundle_path(basepath):
+    return os.path.join(basepath, BUILD_DIR, BUNDLE_FILE)
+
+
+def _hash_pn(pn):
+    # not hash(), which changes between processes
+    return zlib.crc32(pn)
+
+
+def _create_index(pns):
+    size = 8
+    while size < 2 * len(pns):
+        size *= 2
+    mask = size - 1
+
+    table = array("i", [-1]) * size
+    for index, pn in enumerate(pns):
+        slot = _hash_pn(pn) & mask
+        while table[slot] != -1:
+            slot = (slot + 1) & mask
+        table[slot] = index
+
+    return table
+
+
+def _create_offsets(sections, count):
+    """
+    Returns the first row of the elements of each component in the sections,
+    as the rows are in the order of the components.
+    """
+    offsets = array("i")
+    for name, columns in _OFFSET_SECTIONS:
+        rows = memoryview(sections[name]).cast("i").tolist()[::columns]
+
+        starts = [0] * (count + 1)
+        for index in rows:
+            starts[index + 1] += 1
+        for index in range(count):
+            starts[index + 1] += starts[index]
+
+        offsets.extend(starts)
+
+    return offsets
+
+
+def compile_bundle(basepath, filepath=None):
+    """
+    Reads the cost report of *basepath* and writes its bundle in *filepath*
+    (default: ``build/model.bundle`` of *basepath*).
+    Returns the path of the bundle.
+    """
+    basepath = os.path.abspath(basepath)
+    if filepath is None:
+        filepath = get_bundle_path(basepath)
+
+    reader = IncrementalReader(basepath)
+    metadata = reader.read()
+
+    sections = serialization.create_sections(metadata, basepath)
+
+    components = [
+        component
+        for system in metadata.systems
+        for component in system.get_components()
+    ]
+    pns = [component.pn.encode("ascii") for component in components]
+    sections["pns"] = b"".join(pn.ljust(PN_SIZE, b"\0") for pn in pns)
+    sections["index"] = serialization.to_bytes(_create_index(pns))
+    sections["offsets"] = serialization.to_bytes(
+        _create_offsets(sections, len(components))
+    )
+
+    hashes = []
+    for component in components:
+        for filepaths in [component.drawings, component.pictures]:
+            hashes.extend(bytes.fromhex(get_digest(path)) for path in filepaths)
+    sections["hashes"] = b"".join(hashes)
+
+    signatures = dict(
+        (os.path.relpath(path, basepath), list(signature))
+        for path, signature in reader.signatures.items()
+    )
+    source = {
+        "basepath": basepath,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "signatures": signatures,
+    }
+    sections["source"] = json.dumps(source).encode("utf8")
+
+    dirpath = os.path.dirname(filepath)
+    if dirpath:
+        os.makedirs(dirpath, exist_ok=True)
+
+    with open(filepath, "wb") as fp:
+        fp.write(serialization.pack_sections(sections))
+
+    return filepath
+
+
+def load_bundle(filepath, basepath=None):
+    """
+    Returns the metadata of a bundle, with the paths of its files relative
+    to *basepath* (default: base path of the compilation).
+    """
+    with Bundle.open(filepath) as bundle:
+        return bundle.to_metadata(basepath)
+
+
+class Bundle(object):
+    def __init__(self, modelfile):
+        """
+        Wraps a :class:`ModelFile <fsaecostreport.serialization.ModelFile>`
+        of a compiled bundle.
+        """
+        if not modelfile.has_section("index"):
+            raise ValueError("Not a compiled bundle")
+
+        self._modelfile = modelfile
+        self._pns = modelfile.get_bytes("pns")
+        self._index = modelfile.get_ints("index")
+        self._mask = len(self._index) - 1
+        self._labels = [system.label for system in modelfile.get_systems()]
+        self._strings = None
+
+        offsets = modelfile.get_ints("offsets")
+        self._count = len(offsets) // len(_OFFSET_SECTIONS) - 1
+        self._offsets = offsets
+
+    @classmethod
+    def open(cls, filepath, use_mmap=True):
+        modelfile = serialization.ModelFile.open(filepath, use_mmap)
+        try:
+            return cls(modelfile)
+        except Exception:
+            modelfile.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exctype, value, tb):
+        self.close()
+
+    def close(self):
+        # the views must be released before the memory mapping is closed
+        for view in [self._pns, self._index, self._offsets]:
+            view.release()
+        self._modelfile.close()
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, pn):
+        try:
+            self.find(pn)
+        except KeyError:
+            return False
+        return True
+
+    def _get_pn(self, index):
+        start = index * PN_SIZE
+        return bytes(self._pns[start : start + PN_SIZE]).rstrip(b"\0")
+
+    def find(self, pn):
+        """
+        Returns the row of the component *pn*.
+        Raises :exc:`KeyError` if the bundle has no such component.
+        """
+        key = pn.encode("ascii")
+        slot = _hash_pn(key) & self._mask
+        while True:
+            index = self._index[slot]
+            if index == -1:
+                raise KeyError(pn)
+            if self._get_pn(index) == key:
+                return index
+            slot = (slot + 1) & self._mask
+
+    def get_source(self):
+        """
+        Returns the base path, date and signatures of the files of the
+        compilation.
+        """
+        return self._modelfile.get_json("source")
+
+    def is_uptodate(self, basepath=None):
+        """
+        Returns whether the files of *basepath* (default: base path of the
+        compilation) were not modified since the compilation.
+        """
+        source = self.get_source()
+        if basepath is None:
+            basepath = source["basepath"]
+
+        signatures = IncrementalReader(basepath, self._labels).scan()
+        signatures = dict(
+            (os.path.relpath(path, basepath), list(signature))
+            for path, signature in signatures.items()
+        )
+        return signatures == source["signatures"]
+
+    def _get_rows(self, name, index):
+        """
+        Returns the integer rows of the component *index* in a section and
+        the first row.
+        """
+        names = [section for section, _columns in _OFFSET_SECTIONS]
+        columns = _OFFSET_SECTIONS[names.index(name)][1]
+
+        base = names.index(name) * (self._count + 1)
+        start = self._offsets[base + index]
+        end = self._offsets[base + index + 1]
+
+        values = self._modelfile.get_ints(name)
+        rows = values[start * columns : end * columns].tolist()
+        values.release()
+
+        return [rows[i : i + columns] for i in range(0, len(rows), columns)], start
+
+    def get_component(self, pn):
+        """
+        Returns a :class:`dict` of the component *pn*: its P/N, system label,
+        kind, name, details, quantity in its file, components with their
+        quantity, drawings and pictures with their SHA-1 hash, and cost
+        tables.
+        Only the rows of the component are read.
+        """
+        index = self.find(pn)
+        if self._strings is None:
+            self._strings = self._modelfile.get_strings() + [None]
+        strings = self._strings
+
+        comps = self._modelfile.get_ints("comps")
+        columns = serialization.COMPONENT_COLUMNS
+        row = comps[index * columns : (index + 1) * columns].tolist()
+        comps.release()
+
+        system_index, kind, _pn_base, _revision, name, details, _filepath, qty = row
+
+        component = {
+            "pn": pn,
+            "system": self._labels[system_index],
+            "kind": _KINDS[kind],
+            "name": strings[name],
+            "details": strings[details],
+            "quantity": qty,
+            "components": [],
+            "drawings": [],
+            "pictures": [],
+        }
+
+        rows, _start = self._get_rows("edges", index)
+        for _parent, child, quantity in rows:
+            component["components"].append((self._get_pn(child).decode(), quantity))
+
+        rows, start = self._get_rows("files", index)
+        hashes = self._modelfile.get_bytes("hashes")
+        for row, (_index, kind, filepath) in enumerate(rows, start):
+            digest = bytes(hashes[row * HASH_SIZE : (row + 1) * HASH_SIZE]).hex()
+            key = "drawings" if kind == serialization.DRAWING else "pictures"
+            component[key].append((strings[filepath], digest))
+        hashes.release()
+
+        for name, _class, attr, integer_fields, float_fields in serialization.ITEMS:
+            rows, start = self._get_rows(name, index)
+
+            count = len(float_fields)
+            floats = self._modelfile.get_floats(name + ".f")
+            values = floats[start * count : (start + len(rows)) * count].tolist()
+            floats.release()
+
+            items = []
+            for position, row in enumerate(rows):
+                item = {}
+                for field, value in zip(integer_fields, row[1:]):
+                    if field in serialization.INTEGER_FIELDS:
+                        item[field] = None if value == -1 else value
+                    else:
+                        item[field] = strings[value]
+
+                start = position * count
+                for field, value in zip(float_fields, values[start : start + count]):
+                    item[field] = None if math.isnan(value) else value
+
+                items.append(item)
+
+            component[attr] = items
+
+        return component
+
+    def to_metadata(self, basepath=None):
+        """
+        Returns the metadata of the bundle, with the paths of its files
+        relative to *basepath* (default: base path of the compilation).
+        """
+        if basepath is None:
+            basepath = self.get_source()["basepath"]
+        return self._modelfile.to_metadata(basepath)
+
+
+def run():
+    parser = ArgumentParser(description="Compiled bundle of the cost report")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    parser_compile = subparsers.add_parser(
+        "compile", help="Pack the cost report in a bundle"
+    )
+    parser_compile.add_argument(
+        "-b", "--basepath", default=os.curdir, help="Base path of the cost report"
+    )
+    parser_compile.add_argument(
+        "-o", "--output", help="Path of the bundle (default: build/model.bundle)"
+    )
+
+    parser_show = subparsers.add_parser("show", help="Show a component of a bundle")
+    parser_show.add_argument("pn", help="P/N of the component")
+    parser_show.add_argument(
+        "-b", "--basepath", default=os.curdir, help="Base path of the cost report"
+    )
+    parser_show.add_argument(
+        "--bundle", help="Path of the bundle (default: build/model.bundle)"
+    )
+
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.INFO)
+
+    basepath = os.path.abspath(args.basepath)
+
+    if args.command == "compile":
+        start = time.perf_counter()
+        filepath = compile_bundle(basepath, args.output)
+        logging.info(
+            "Compiled %s (%i bytes) in %.2f s",
+            filepath,
+            os.path.getsize(filepath),
+            time.perf_counter() - start,
+        )
+        return
+
+    filepath = args.bundle or get_bundle_path(basepath)
+    with Bundle.open(filepath) as bundle:
+        if not bundle.is_uptodate():
+            logging.warning("The bundle is outdated, compile it again")
+
+        try:
+            component = bundle.get_component(args.pn.upper())
+        except KeyError:
+            print("Unknown P/N: %s" % args.pn, file=sys.stderr)
+            sys.exit(1)
+
+    print(json.dumps(component, indent=2))
+
+
+if __name__ == "__main__":
+    run()
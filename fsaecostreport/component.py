@@ -193,12 +193,17 @@ class _Component(object):
         """
         Returns an ordered list of this component and its sub-components.
         """
-        hierarchy = [self]
+        return list(self.iter_hierarchy())
 
-        for component in reversed(sorted(self.components.keys())):
-            hierarchy.extend(component.get_hierarchy())
+    def iter_hierarchy(self):
+        """
+        Yields this component and its sub-components, in the same order as
+        :meth:`get_hierarchy`.
+        """
+        yield self
 
-        return hierarchy
+        for component in reversed(sorted(self.components.keys())):
+            yield from component.iter_hierarchy()
 
 
 class Part(_Component):
@@ -13,7 +13,14 @@ Constants used by the readers and writers
 COMPONENTS_DIR = "components"
 DRAWINGS_DIR = "drawings"
 PICTURES_DIR = "pictures"
+CHARTS_DIR = "charts"
+BUILD_DIR = "build"
+PROFILE_DIR = "profile"
+MEMORY_REPORT_FILE = "memory.json"
+TRACE_FILE = "trace.json"
+DAEMON_SOCKET_FILE = "daemon.sock"
 CONFIG_FILE = "costreport.cfg"
 INTRODUCTION_FILE = "introduction.txt"
 LOGO_FILE = "logo.jpg"
 SAE_PARTS_FILE = "sae_parts.csv"
+BUNDLE_FILE = "model.bundle"
@@ -0,0 +1,326 @@
+#!/usr/bin/env python
+"""
+Daemon keeping the cost report in memory between regenerations.
+The daemon listens on a Unix socket, by default in the build folder of the
+cost report. Each request is a line of JSON answered by a line of JSON.
+When idle and before each request, the files are polled and only the
+modified component files are read again
+(see :class:`fsaecostreport.incremental.IncrementalReader`).
+
+Usage::
+
+    python -m fsaecostreport.daemon serve -b BASEPATH
+    python -m fsaecostreport.daemon regenerate -b BASEPATH --ebom
+    python -m fsaecostreport.daemon stop -b BASEPATH
+"""
+
+# Standard library modules.
+import os
+import sys
+import json
+import time
+import errno
+import socket
+import logging
+from argparse import ArgumentParser
+
+# Third party modules.
+
+# Local modules.
+from fsaecostreport.incremental import IncrementalReader
+from fsaecostreport.watch import invalidate_writers
+
+# Globals and constants variables.
+from fsaecostreport.constants import BUILD_DIR, DAEMON_SOCKET_FILE
+
+OUTPUTS = ("report", "ebom", "fsg")
+
+
+def get_socket_path(basepath):
+    return os.path.join(basepath, BUILD_DIR, DAEMON_SOCKET_FILE)
+
+
+class Daemon(object):
+    def __init__(
+        self,
+        basepath,
+        socket_path=None,
+        labels=None,
+        chart_format="pdf",
+        poll_interval=1.0,
+        request_timeout=5.0,
+    ):
+        """
+        Creates a daemon for the cost report in *basepath*.
+
+        :arg socket_path: path of the Unix socket
+            (default: ``build/daemon.sock`` in *basepath*)
+        :arg labels: labels of the systems to read (default: all)
+        :arg chart_format: format of the charts, ``pdf`` or ``png``
+        :arg poll_interval: interval (in seconds) between two polls of the
+            files when no request is received
+        :arg request_timeout: delay (in seconds) to receive the request of a
+            connection, after which it is answered with an error, so that a
+            silent client does not block the daemon
+        """
+        self.basepath = basepath
+        self.socket_path = socket_path or get_socket_path(basepath)
+        self.chart_format = chart_format
+        self.poll_interval = poll_interval
+        self.request_timeout = request_timeout
+        self.reader = IncrementalReader(basepath, labels)
+        self._writers = {}
+        self._running = False
+
+    def serve(self):
+        """
+        Reads the cost report and answers the requests until a ``stop``
+        request is received.
+        """
+        self.reader.read()
+
+        server = self._bind()
+        server.settimeout(self.poll_interval)
+        logging.info("Listening on %s", self.socket_path)
+
+        self._running = True
+        try:
+            while self._running:
+                try:
+                    connection, _address = server.accept()
+                except socket.timeout:
+                    self._poll()
+                    continue
+
+                with connection:
+                    self._handle_connection(connection)
+        finally:
+            server.close()
+            os.remove(self.socket_path)
+
+    def _bind(self):
+        os.makedirs(os.path.dirname(self.socket_path), exist_ok=True)
+
+        if os.path.exists(self.socket_path):
+            try:
+                send(self.socket_path, {"command": "ping"}, timeout=1.0)
+            except OSError:
+                os.remove(self.socket_path)  # left by a daemon which crashed
+            else:
+                raise RuntimeError(
+                    "A daemon is already running on %s" % self.socket_path
+                )
+
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.socket_path)
+        server.listen(1)
+        return server
+
+    def _update(self):
+        changes = self.reader.update()
+
+        # the chapters and rows of the modified systems must be written again
+        invalidate_writers(self._writers.values(), changes)
+
+        return changes
+
+    def _poll(self):
+        try:
+            changes = self._update()
+        except Exception as ex:
+            logging.error("Reading failed: %s", ex)
+            return
+
+        if changes:
+            logging.info("Updated: %r", changes)
+
+    def _handle_connection(self, connection):
+        connection.settimeout(self.request_timeout)
+        with connection.makefile("rwb") as fp:
+            try:
+                request = json.loads(fp.readline().decode("utf8"))
+                response = self.handle(request)
+            except socket.timeout:
+                logging.error("No request received")
+                response = {
+                    "status": "error",
+                    "message": "No request received within %g s" % self.request_timeout,
+                }
+            except Exception as ex:
+                logging.error("Request failed: %s", ex, exc_info=True)
+                response = {"status": "error", "message": str(ex)}
+
+            fp.write(json.dumps(response).encode("utf8") + b"\n")
+
+    def handle(self, request):
+        """
+        Answers a request.
+        The requests are a :class:`dict` with a ``command``:
+
+            * ``ping``: checks that the daemon is running
+            * ``status``: returns the systems read and their number of
+              components
+            * ``regenerate``: reads the modified files and writes the
+              ``outputs`` of the request (``report``, ``ebom`` and/or ``fsg``)
+            * ``stop``: stops the daemon
+        """
+        command = request.get("command")
+
+        if command == "ping":
+            return {"status": "ok"}
+
+        if command == "status":
+            systems = dict(
+                (system.label, len(system.get_components()))
+                for system in self.reader.metadata.systems
+            )
+            return {"status": "ok", "systems": systems}
+
+        if command == "regenerate":
+            return self.regenerate(request.get("outputs", ["report"]))
+
+        if command == "stop":
+            self._running = False
+            return {"status": "ok"}
+
+        raise ValueError("Unknown command: %s" % command)
+
+    def _get_writers(self, outputs):
+        from fsaecostreport.writer import (
+            CostReportLaTeXWriter,
+            eBOMWriter,
+            FSGBOMWriter,
+            FSGAppendixLaTeXWriter,
+        )
+
+        if not self._writers:
+            # the writers keep the chapters and rows of the unmodified systems
+            self._writers["report"] = CostReportLaTeXWriter(
+                self.chart_format, reuse_chapters=True
+            )
+            self._writers["ebom"] = eBOMWriter(reuse_rows=True)
+            self._writers["fsg_bom"] = FSGBOMWriter(processes=1)
+            self._writers["fsg_appendix"] = FSGAppendixLaTeXWriter(
+                self.chart_format, reuse_chapters=True
+            )
+
+        # same order as the pipeline of the command line interface, since the
+        # FSG appendix is written in the same file as the cost report
+        names = []
+        if "report" in outputs:
+            names.append("report")
+        if "ebom" in outputs:
+            names.append("ebom")
+        if "fsg" in outputs:
+            names += ["fsg_bom", "fsg_appendix"]
+
+        return [(name, self._writers[name]) for name in names]
+
+    def regenerate(self, outputs):
+        """
+        Reads the modified files and writes the *outputs*.
+        Returns the changes and the duration of each step.
+        """
+        for output in outputs:
+            if output not in OUTPUTS:
+                raise ValueError("Unknown output: %s" % output)
+
+        durations = {}
+
+        start = time.perf_counter()
+        changes = self._update()
+        durations["update"] = time.perf_counter() - start
+
+        metadata = self.reader.metadata
+        for name, writer in self._get_writers(outputs):
+            start = time.perf_counter()
+            writer.write(self.basepath, metadata)
+            durations[name] = time.perf_counter() - start
+
+        return {"status": "ok", "changes": changes.to_dict(), "durations": durations}
+
+
+def send(socket_path, request, timeout=None):
+    """
+    Sends a request to a daemon and returns its response.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        client.connect(socket_path)
+
+        with client.makefile("rwb") as fp:
+            fp.write(json.dumps(request).encode("utf8") + b"\n")
+            fp.flush()
+            line = fp.readline()
+
+    if not line:
+        raise ConnectionError(errno.ECONNRESET, "No response from daemon")
+    return json.loads(line.decode("utf8"))
+
+
+def run():
+    parser = ArgumentParser(description="Daemon regenerating the cost report")
+    parser.add_argument(
+        "command",
+        choices=["serve", "regenerate", "status", "stop"],
+        help="Start the daemon or send it a request",
+    )
+    parser.add_argument(
+        "systems", nargs="*", help="Systems read by the daemon (default: all)"
+    )
+    parser.add_argument(
+        "-b", "--basepath", default=os.curdir, help="Base path of the cost report"
+    )
+    parser.add_argument("--socket", help="Path of the Unix socket")
+    parser.add_argument(
+        "--chart-format", default="pdf", choices=["pdf", "png"], help="Chart format"
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=1.0,
+        help="Interval between two polls of the files in seconds",
+    )
+    parser.add_argument(
+        "-w", "--write", action="store_true", help="Regenerate the cost report"
+    )
+    parser.add_argument("-e", "--ebom", action="store_true", help="Regenerate the eBOM")
+    parser.add_argument(
+        "--fsg", action="store_true", help="Regenerate the FSG documents"
+    )
+
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.INFO)
+
+    basepath = os.path.abspath(args.basepath)
+    socket_path = args.socket or get_socket_path(basepath)
+
+    if args.command == "serve":
+        labels = [label.upper() for label in args.systems] or None
+        daemon = Daemon(
+            basepath, socket_path, labels, args.chart_format, args.poll_interval
+        )
+        daemon.serve()
+        return
+
+    request = {"command": args.command}
+    if args.command == "regenerate":
+        outputs = []
+        if args.write:
+            outputs.append("report")
+        if args.ebom:
+            outputs.append("ebom")
+        if args.fsg:
+            outputs.append("fsg")
+        request["outputs"] = outputs or ["report"]
+
+    response = send(socket_path, request)
+    print(json.dumps(response, indent=2, sort_keys=True))
+
+    if response["status"] != "ok":
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    run()
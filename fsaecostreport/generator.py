@@ -0,0 +1,519 @@
+#!/usr/bin/env python
+"""
+Generator of synthetic cost reports, e.g. to test the readers and writers
+on cars of any size.
+The generated folder has the same structure as a real cost report and can be
+read by :class:`fsaecostreport.reader.SystemFileReader`.
+"""
+
+# Standard library modules.
+import os
+import csv
+import random
+import string
+import logging
+import itertools
+from argparse import ArgumentParser
+
+# Third party modules.
+from PIL import Image
+
+# Local modules.
+
+# Globals and constants variables.
+from fsaecostreport.constants import (
+    COMPONENTS_DIR,
+    DRAWINGS_DIR,
+    PICTURES_DIR,
+    CONFIG_FILE,
+    INTRODUCTION_FILE,
+    SAE_PARTS_FILE,
+)
+
+MAX_PARTS = 999
+MAX_SUB_ASSEMBLIES = 999
+NCOLUMNS = 10
+
+WORDS = [
+    "bracket",
+    "bolt",
+    "bushing",
+    "clamp",
+    "cover",
+    "flange",
+    "housing",
+    "hub",
+    "link",
+    "mount",
+    "plate",
+    "rod",
+    "shaft",
+    "spacer",
+    "tab",
+    "tube",
+]
+UNICODE_WORDS = [
+    "pédale",
+    "châssis",
+    "écrou",
+    "rondelle à ressort",
+    "entretoise",
+    "moyeu traité",
+    "Träger",
+    "Gehäuse",
+    "Führung",
+    "Kühler",
+    "señal",
+    "cañón",
+]
+MATERIALS = [("Aluminum", "kg"), ("Steel", "kg"), ("Titanium", "kg"), ("ABS", "m")]
+PROCESSES = [("Machining", "cm3"), ("Welding", "cm"), ("Drilling", "hole")]
+FASTENERS = ["Bolt, Grade 8.8", "Nut, Grade 8.8", "Washer", "Rivet"]
+TOOLINGS = [("Welding Fixture", "point"), ("Mold", "part")]
+
+# Smallest valid PDF with one empty page
+PDF = (
+    b"%PDF-1.4\n"
+    b"1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n"
+    b"2 0 obj<</Type/Pages/Kids[3 0 R]/Count 1>>endobj\n"
+    b"3 0 obj<</Type/Page/Parent 2 0 R/MediaBox[0 0 612 792]>>endobj\n"
+    b"trailer<</Root 1 0 R>>\n"
+    b"%%EOF\n"
+)
+
+
+class _Node(object):
+    """
+    Component of a generated system.
+    """
+
+    def __init__(self, pn, name):
+        self.pn = pn
+        self.name = name
+        self.level = 0
+        self.parents = []
+        self.components = []  # (node, quantity)
+        self.materials = []
+        self.processes = []
+        self.fasteners = []
+        self.toolings = []
+
+    @property
+    def is_part(self):
+        return self.pn.split("-")[1].startswith("00")
+
+    @property
+    def tablecost(self):
+        cost = 0.0
+        cost += sum(row[-1] for row in self.materials)
+        cost += sum(row[-2] for row in self.processes)
+        cost += sum(row[-1] for row in self.fasteners)
+        cost += sum(row[-2] for row in self.toolings)
+        return cost
+
+    @property
+    def unitcost(self):
+        cost = self.tablecost
+        for component, quantity in self.components:
+            cost += component.unitcost * quantity
+        return cost
+
+    @property
+    def quantity(self):
+        if not self.parents:
+            return 1
+
+        qty = 0
+        for parent in self.parents:
+            for component, quantity in parent.components:
+                if component is self:
+                    qty += parent.quantity * quantity
+        return qty
+
+
+def _pad(row):
+    return list(row) + [""] * (NCOLUMNS - len(row))
+
+
+class CarGenerator(object):
+    def __init__(
+        self,
+        systems=2,
+        parts=10,
+        depth=2,
+        fanout=3,
+        shared=0,
+        items=2,
+        unicode_names=False,
+        seed=0,
+    ):
+        """
+        Creates a generator of synthetic cost reports.
+
+        :arg systems: number of systems
+        :arg parts: number of parts per system
+        :arg depth: number of levels of assemblies, including the system
+            assembly (1: the parts are directly in the system assembly)
+        :arg fanout: number of sub-assemblies in each assembly
+        :arg shared: number of sub-assemblies per system which are also
+            used by a second assembly (only possible from a depth of 3)
+        :arg items: number of rows in each table (materials, processes,
+            fasteners and toolings) of each component
+        :arg unicode_names: whether the names have accented characters
+        :arg seed: seed of the random values, the same seed gives the same
+            cost report
+        """
+        if systems < 1 or systems > 26 * 26:
+            raise ValueError("Number of systems must be between 1 and 676")
+        if parts < 1 or parts > MAX_PARTS:
+            raise ValueError("Number of parts must be between 1 and %i" % MAX_PARTS)
+        if depth < 1:
+            raise ValueError("Depth must be at least 1")
+        if fanout < 1:
+            raise ValueError("Fan-out must be at least 1")
+
+        sub_assemblies = sum(fanout**level for level in range(1, depth))
+        if sub_assemblies > MAX_SUB_ASSEMBLIES:
+            raise ValueError(
+                "Too many sub-assemblies (%i > %i)"
+                % (sub_assemblies, MAX_SUB_ASSEMBLIES)
+            )
+        if shared and shared > sub_assemblies - fanout:
+            raise ValueError(
+                "Cannot share %i sub-assemblies, maximum is %i"
+                % (shared, max(sub_assemblies - fanout, 0))
+            )
+
+        self.systems = systems
+        self.parts = parts
+        self.depth = depth
+        self.fanout = fanout
+        self.shared = shared
+        self.items = items
+        self.unicode_names = unicode_names
+        self.seed = seed
+
+    def generate(self, basepath):
+        """
+        Writes a cost report in *basepath*.
+        Returns the labels of the generated systems.
+        """
+        rng = random.Random(self.seed)
+        os.makedirs(basepath, exist_ok=True)
+
+        labels = [
+            "".join(letters)
+            for letters in itertools.islice(
+                itertools.product(string.ascii_uppercase, repeat=2), self.systems
+            )
+        ]
+
+        self._write_config(basepath, labels, rng)
+        self._write_introduction(basepath)
+
+        roots = []
+        for label in labels:
+            logging.debug("Generating system %s...", label)
+            nodes = self._create_system(label, rng)
+            self._write_system(basepath, label, nodes)
+            roots.append(nodes[0])
+            logging.debug("Generating system %s... DONE", label)
+
+        self._write_sae_parts(basepath, labels, roots)
+
+        return labels
+
+    def _name(self, rng, index):
+        words = UNICODE_WORDS if self.unicode_names else WORDS
+        return "%s %i" % (rng.choice(words).capitalize(), index)
+
+    def _system_name(self, label):
+        if self.unicode_names:
+            return "Système %s" % label
+        return "System %s" % label
+
+    def _write_config(self, basepath, labels, rng):
+        lines = [
+            "[CostReport]",
+            "carNumber=%i" % rng.randint(1, 999),
+            "university=%s"
+            % (
+                "Université Synthétique"
+                if self.unicode_names
+                else "Synthetic University"
+            ),
+            "teamName=Synthetic Racing Team",
+            "year=2011",
+            "competitionName=Formula SAE Competition Michigan",
+            "competitionAbbrev=FSAEM",
+            "systems=%s" % ",".join(labels),
+        ]
+
+        for order, label in enumerate(labels, 1):
+            colour = tuple(rng.randint(0, 255) for _ in range(3))
+            lines += [
+                "",
+                "[%s]" % label,
+                "order=%i" % order,
+                "name=%s" % self._system_name(label),
+                "colour=%i, %i, %i" % colour,
+            ]
+
+        with open(os.path.join(basepath, CONFIG_FILE), "w", encoding="utf-8") as fp:
+            fp.write("\n".join(lines) + "\n")
+
+    def _write_introduction(self, basepath):
+        filepath = os.path.join(basepath, INTRODUCTION_FILE)
+        with open(filepath, "w", encoding="utf-8") as fp:
+            fp.write("Synthetic cost report generated for testing.\n")
+
+    def _write_sae_parts(self, basepath, labels, roots):
+        filepath = os.path.join(basepath, SAE_PARTS_FILE)
+        with open(filepath, "w", encoding="utf-8", newline="") as fp:
+            writer = csv.writer(fp)
+            for label, root in zip(labels, roots):
+                writer.writerow([label, root.name, root.pn])
+                writer.writerow([label, "Not applicable", ""])
+
+    def _create_system(self, label, rng):
+        """
+        Returns the components of a system, the system assembly first.
+        """
+        root = _Node("%s-A1000-AA" % label, self._name(rng, 1000))
+        nodes = [root]
+
+        # Assemblies, level by level
+        assemblies = [root]
+        level = [root]
+        for _ in range(1, self.depth):
+            next_level = []
+            for parent in level:
+                for _ in range(self.fanout):
+                    index = len(assemblies)
+                    node = _Node(
+                        "%s-A0%03i-AA" % (label, index), self._name(rng, index)
+                    )
+                    node.level = parent.level + 1
+                    self._add(parent, node, rng)
+                    next_level.append(node)
+                    assemblies.append(node)
+            level = next_level
+
+        # Shared sub-assemblies, from the second level as the ones of the
+        # first level can only be in the system assembly. The second parent
+        # is on an upper level to avoid any cycle.
+        for node in assemblies[1 + self.fanout :][: self.shared]:
+            candidates = [
+                other
+                for other in assemblies
+                if other.level < node.level and other not in node.parents
+            ]
+            self._add(rng.choice(candidates), node, rng)
+
+        # Parts, distributed in the assemblies of the last level
+        for index in range(1, self.parts + 1):
+            node = _Node("%s-%05i-AA" % (label, index), self._name(rng, index))
+            self._add(level[(index - 1) % len(level)], node, rng)
+            nodes.append(node)
+
+        nodes.extend(assemblies[1:])
+
+        for node in nodes:
+            self._fill_tables(node, rng)
+
+        return nodes
+
+    def _add(self, parent, node, rng):
+        parent.components.append((node, rng.randint(1, 4)))
+        node.parents.append(parent)
+
+    def _fill_tables(self, node, rng):
+        for i in range(self.items):
+            name, unit = rng.choice(MATERIALS)
+            unitcost = round(rng.uniform(0.5, 50.0), 2)
+            size = round(rng.uniform(0.1, 2.0), 2)
+            quantity = rng.randint(1, 4)
+            node.materials.append(
+                [100 + i, name, "body", unitcost, size, unit, "", "", quantity]
+                + [unitcost * quantity]
+            )
+
+            name, unit = rng.choice(PROCESSES)
+            unitcost = round(rng.uniform(0.1, 10.0), 2)
+            quantity = rng.randint(1, 10)
+            if i % 2:
+                multiplier_id, multiplier = 20, round(rng.uniform(1.0, 4.0), 2)
+                subtotal = quantity * unitcost * multiplier
+            else:
+                multiplier_id = multiplier = ""
+                subtotal = quantity * unitcost
+            node.processes.append(
+                [200 + i, name, "shape", unitcost, unit, quantity]
+                + [multiplier_id, multiplier, subtotal, ""]
+            )
+
+            name = rng.choice(FASTENERS)
+            unitcost = round(rng.uniform(0.01, 1.0), 2)
+            quantity = rng.randint(1, 8)
+            node.fasteners.append(
+                [300 + i, name, "attach", unitcost, 6.0, "mm", 20.0, "mm", quantity]
+                + [unitcost * quantity]
+            )
+
+            name, unit = rng.choice(TOOLINGS)
+            unitcost = round(rng.uniform(100.0, 1000.0), 2)
+            quantity = rng.randint(1, 5)
+            pvf = 3000
+            node.toolings.append(
+                [400 + i, name, "", unitcost, unit, quantity, pvf, ""]
+                + [unitcost * quantity / pvf, ""]
+            )
+
+    def _write_system(self, basepath, label, nodes):
+        system_dir = os.path.join(basepath, label)
+        components_dir = os.path.join(system_dir, COMPONENTS_DIR)
+        drawings_dir = os.path.join(system_dir, DRAWINGS_DIR)
+        pictures_dir = os.path.join(system_dir, PICTURES_DIR)
+        for dirpath in [components_dir, drawings_dir, pictures_dir]:
+            os.makedirs(dirpath, exist_ok=True)
+
+        for node in nodes:
+            rows = self._create_rows(label, node)
+            filepath = os.path.join(components_dir, node.pn + ".csv")
+            with open(filepath, "w", encoding="utf-8", newline="") as fp:
+                csv.writer(fp).writerows(map(_pad, rows))
+
+            # Drawings for the parts, pictures for the assemblies
+            if node.is_part:
+                # the P/N is added as a comment so that the drawings are not
+                # detected as duplicates
+                with open(os.path.join(drawings_dir, node.pn + ".pdf"), "wb") as fp:
+                    fp.write(PDF + b"% " + node.pn.encode("ascii") + b"\n")
+            else:
+                image = Image.new("RGB", (64, 48), (128, 128, 128))
+                image.save(
+                    os.path.join(pictures_dir, node.pn + ".jpg"),
+                    comment=node.pn.encode("ascii"),
+                )
+
+    def _create_rows(self, label, node):
+        unitcost = node.unitcost
+        quantity = node.quantity
+        pn_base = node.pn.split("-")[1]
+
+        rows = [
+            ["University", "Synthetic University", "", "Car #", "001", ""]
+            + ["Asm Cost", unitcost],
+            ["System", self._system_name(label), "", "", "", "", "Qty", quantity],
+        ]
+
+        if node.is_part:
+            rows += [
+                ["Assembly", node.parents[0].name],
+                ["Part", node.name],
+            ]
+        else:
+            rows += [["Assembly", node.name]]
+
+        rows += [
+            ["P/N Base", pn_base, "", "", "", "", "Extended Cost", unitcost * quantity],
+            ["Suffix", "AA"],
+            ["Details", ""],
+            [],
+            [],
+        ]
+
+        if not node.is_part:
+            rows += [
+                ["Parts"],
+                ["ItemOrder", "Part", "Part Cost", "Quantity", "Sub Total"],
+            ]
+            subtotal = 0.0
+            for component, qty in node.components:
+                cost = component.unitcost
+                rows.append([component.pn, component.name, cost, qty, cost * qty])
+                subtotal += cost * qty
+            rows += [[], ["", "", "", "Sub Total", subtotal], []]
+
+        rows += self._create_table(
+            "Materials",
+            ["ID", "Material", "Use", "UnitCost", "Size1", "Unit1"]
+            + ["Size2", "Unit2", "Quantity", "Sub Total"],
+            node.materials,
+            9,
+        )
+        rows += self._create_table(
+            "Processes",
+            ["ID", "Process", "Use", "UnitCost", "Unit", "Quantity"]
+            + ["Multiplier ID", "Mult. Val.", "Sub Total"],
+            node.processes,
+            8,
+        )
+        rows += self._create_table(
+            "Fasteners",
+            ["ID", "Fastener", "Use", "UnitCost", "Size1", "Unit1"]
+            + ["Size2", "Unit2", "Quantity", "Sub Total"],
+            node.fasteners,
+            9,
+        )
+        rows += self._create_table(
+            "Tooling",
+            ["ID", "Tooling", "Use", "UnitCost", "Unit", "Quantity"]
+            + ["PVF", "FracIncld", "Sub Total"],
+            node.toolings,
+            8,
+        )
+
+        return rows
+
+    def _create_table(self, title, header, items, subtotal_column):
+        subtotal = sum(item[subtotal_column] for item in items)
+        footer = [""] * (subtotal_column - 1) + ["Sub Total", subtotal]
+        return [[title], header] + items + [[], footer, []]
+
+
+def run():
+    parser = ArgumentParser(description="Generate a synthetic cost report")
+    parser.add_argument("basepath", help="Output folder")
+    parser.add_argument("--systems", type=int, default=2, help="Number of systems")
+    parser.add_argument(
+        "--parts", type=int, default=10, help="Number of parts per system"
+    )
+    parser.add_argument(
+        "--depth", type=int, default=2, help="Number of levels of assemblies"
+    )
+    parser.add_argument(
+        "--fanout", type=int, default=3, help="Sub-assemblies per assembly"
+    )
+    parser.add_argument(
+        "--shared",
+        type=int,
+        default=0,
+        help="Sub-assemblies per system used by two assemblies",
+    )
+    parser.add_argument("--items", type=int, default=2, help="Rows in each cost table")
+    parser.add_argument(
+        "--unicode", action="store_true", help="Use accented characters in names"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+
+    args = parser.parse_args()
+
+    generator = CarGenerator(
+        args.systems,
+        args.parts,
+        args.depth,
+        args.fanout,
+        args.shared,
+        args.items,
+        args.unicode,
+        args.seed,
+    )
+    labels = generator.generate(args.basepath)
+
+    logging.info("Generated systems %s in %s", ", ".join(labels), args.basepath)
+
+
+if __name__ == "__main__":
+    logging.getLogger().setLevel(logging.INFO)
+    run()
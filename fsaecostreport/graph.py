@@ -1,59 +1,350 @@
 #!/usr/bin/env python
 """
+Charts of the cost report.
+matplotlib is only imported when a chart is rendered.
 """
 
 # Standard library modules.
 import os
+import hashlib
+import operator
+from concurrent.futures import ProcessPoolExecutor
 
 # Third party modules.
-from matplotlib.figure import Figure
-from matplotlib.axes import Axes
-from matplotlib.backends.backend_agg import FigureCanvasAgg
 
 # Local modules.
+import fsaecostreport.tracing as tracing
+import fsaecostreport.metrics as metrics
 
 # Globals and constants variables.
+from fsaecostreport.constants import CHARTS_DIR
 
+CHART_FORMATS = ("pdf", "png")
+SYSTEM_CHARTS = ("categories", "components", "treemap")
 
-def cost_summary(basepath, metadata):
-    def calculate_values(systems):
-        names = []
-        colours = []
-        values = []
+SUBTOTAL = operator.attrgetter("subtotal")
 
-        for system in sorted(systems):
-            system_cost = 0.0
 
-            for component in system.get_components():
-                # use of tablecost instead of unitcost not to include the cost
-                # of parts twice in the system cost
-                system_cost += component.tablecost * component.quantity
+def _calculate_cost_summary_values(systems):
+    names = []
+    colours = []
+    values = []
 
-            names.append(system.name)
-            colours.append(
-                (
-                    system.colour[0] / 255.0,
-                    system.colour[1] / 255.0,
-                    system.colour[2] / 255.0,
-                )
+    for system in sorted(systems):
+        system_cost = 0.0
+
+        for component in system.get_components():
+            # use of tablecost instead of unitcost not to include the cost
+            # of parts twice in the system cost
+            system_cost += component.tablecost * component.quantity
+
+        names.append(system.name)
+        colours.append(
+            (
+                system.colour[0] / 255.0,
+                system.colour[1] / 255.0,
+                system.colour[2] / 255.0,
             )
-            values.append(system_cost)
+        )
+        values.append(system_cost)
+
+    return names, colours, values
+
+
+def calculate_hash(*args):
+    """
+    Returns a hash of the representation of the arguments.
+    Used to check whether a chart must be rendered again.
+    """
+    return hashlib.sha1(repr(args).encode("utf8")).hexdigest()
+
+
+def is_uptodate(path, digest):
+    """
+    Returns ``True`` if the file at *path* exists and was rendered from
+    inputs with the same *digest*.
+    """
+    hashpath = _get_hashpath(path)
+    if not os.path.exists(path) or not os.path.exists(hashpath):
+        return False
+
+    with open(hashpath, "r") as fp:
+        return fp.read().strip() == digest
+
+
+def save_hash(path, digest):
+    with open(_get_hashpath(path), "w") as fp:
+        fp.write(digest)
+
+
+def _get_hashpath(path):
+    dirname, basename = os.path.split(path)
+    return os.path.join(dirname, "." + basename + ".sha1")
+
+
+def cost_summary(basepath, metadata, format="pdf", dpi=150, render=True):
+    """
+    Renders the pie chart of the cost of each system.
+    The chart is only rendered if the names, colours or costs of the
+    systems changed since the previous render.
+
+    :arg format: ``pdf`` or ``png`` (rasterized, faster to include in LaTeX)
+    :arg dpi: resolution of the ``png`` chart
+    :arg render: if ``False``, only the path is returned (the chart is
+        rendered by another process)
+
+    Returns the path of the chart.
+    """
+    if format not in CHART_FORMATS:
+        raise ValueError("Unknown chart format: %s" % format)
+
+    path = os.path.join(basepath, "cost_summary." + format)
+    if not render:
+        return path
+
+    names, colours, values = _calculate_cost_summary_values(metadata.systems)
+
+    digest = calculate_hash(names, colours, values, format, dpi)
+    if is_uptodate(path, digest):
+        metrics.inc("cache_hits", cache="chart")
+        return path
+    metrics.inc("cache_misses", cache="chart")
+
+    from matplotlib.figure import Figure
+    from matplotlib.axes import Axes
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    with tracing.span("render chart", "chart", chart=os.path.basename(path)):
+        fig = Figure(figsize=(12, 7), facecolor="w")
+        ax = Axes(fig, rect=[0.1, 0.1, 0.5, 0.8])
+        fig.add_axes(ax)
+
+        labels = ["$%.2f" % value for value in values]
+
+        patches, _texts, _autotexts = ax.pie(
+            values, labels=labels, colors=colours, autopct="%1.1f%%", shadow=True
+        )
+
+        fig.legend(patches, names, loc="center right")
+
+        fig.set_canvas(FigureCanvasAgg(fig))
+        fig.savefig(path, dpi=dpi)
+
+    save_hash(path, digest)
+
+    return path
+
+
+def _calculate_categories_data(system):
+    values = [0.0] * 4
+
+    for component in system.get_components():
+        quantity = component.quantity
+        values[0] += sum(map(SUBTOTAL, component.materials)) * quantity
+        values[1] += sum(map(SUBTOTAL, component.processes)) * quantity
+        values[2] += sum(map(SUBTOTAL, component.fasteners)) * quantity
+        values[3] += sum(map(SUBTOTAL, component.toolings)) * quantity
+
+    names = ["Materials", "Processes", "Fasteners", "Tooling"]
+    return "%s: cost per category" % system.name, names, values
+
+
+def _calculate_components_data(system, top):
+    costs = []
+    for component in system.get_components():
+        # cost of the component itself, without the cost of its parts
+        costs.append((component.tablecost * component.quantity, component.pn))
+    costs.sort(reverse=True)
+    costs = costs[:top]
+
+    labels = [pn for _cost, pn in reversed(costs)]
+    values = [cost for cost, _pn in reversed(costs)]
+    return "%s: top %i components" % (system.name, top), labels, values
+
+
+def _calculate_treemap_data(system):
+    assemblies = []
+
+    orphans = [c for c in system.get_components() if not c.parents]
+    for orphan in reversed(sorted(orphans)):
+        quantity = orphan.quantity
+
+        children = []
+        for component, subquantity in reversed(sorted(orphan.components.items())):
+            value = component.unitcost * subquantity * quantity
+            children.append((component.pn, value))
+
+        # cost of the assembly itself
+        children.append((orphan.pn, orphan.tablecost * quantity))
 
-        return names, colours, values
+        assemblies.append((orphan.pn, orphan.unitcost * quantity, children))
 
-    fig = Figure(figsize=(12, 7), facecolor="w")
-    ax = Axes(fig, rect=[0.1, 0.1, 0.5, 0.8])
-    fig.add_axes(ax)
+    return "%s: assemblies" % system.name, assemblies
 
-    names, colours, values = calculate_values(metadata.systems)
-    labels = ["$%.2f" % value for value in values]
 
-    patches, _texts, _autotexts = ax.pie(
-        values, labels=labels, colors=colours, autopct="%1.1f%%", shadow=True
+def _calculate_system_chart_data(system, top):
+    return [
+        ("categories", _calculate_categories_data(system)),
+        ("components", _calculate_components_data(system, top)),
+        ("treemap", _calculate_treemap_data(system)),
+    ]
+
+
+def _slice(values, x, y, width, height, vertical):
+    """
+    Divides the rectangle in slices proportional to the values
+    (slice-and-dice treemap layout).
+    """
+    total = sum(values)
+
+    rects = []
+    for value in values:
+        fraction = value / total if total > 0 else 0.0
+
+        if vertical:
+            rects.append((x, y, width, height * fraction))
+            y += height * fraction
+        else:
+            rects.append((x, y, width * fraction, height))
+            x += width * fraction
+
+    return rects
+
+
+def _draw_categories(fig, data):
+    title, names, values = data
+
+    ax = fig.add_axes([0.1, 0.1, 0.8, 0.8])
+    ax.bar(names, values, color="#4682b4")
+    ax.set_title(title)
+    ax.set_ylabel("Cost ($)")
+
+    for index, value in enumerate(values):
+        ax.annotate("$%.2f" % value, (index, value), ha="center", va="bottom")
+
+
+def _draw_components(fig, data):
+    title, labels, values = data
+
+    ax = fig.add_axes([0.2, 0.1, 0.7, 0.8])
+    ax.barh(labels, values, color="#4682b4")
+    ax.set_title(title)
+    ax.set_xlabel("Cost ($)")
+
+
+def _draw_treemap(fig, data):
+    title, assemblies = data
+
+    ax = fig.add_axes([0.05, 0.05, 0.9, 0.85])
+    ax.set_axis_off()
+    ax.set_xlim(0, 1)
+    ax.set_ylim(0, 1)
+    ax.set_title(title, pad=25)
+
+    values = [value for _pn, value, _children in assemblies]
+    rects = _slice(values, 0.0, 0.0, 1.0, 1.0, False)
+
+    for index, ((pn, _value, children), rect) in enumerate(zip(assemblies, rects)):
+        x, y, width, height = rect
+        colour = "C%i" % (index % 10)
+
+        childvalues = [value for _pn, value in children]
+        for (childpn, _value), (cx, cy, cw, ch) in zip(
+            children, _slice(childvalues, x, y, width, height, True)
+        ):
+            ax.add_patch(_rectangle((cx, cy), cw, ch, colour))
+            if cw > 0.05 and ch > 0.03:
+                ax.text(cx + cw / 2, cy + ch / 2, childpn, ha="center", va="center")
+
+        ax.add_patch(_rectangle((x, y), width, height, "none", linewidth=3))
+        if width > 0.05:
+            ax.text(x + width / 2, y + height + 0.005, pn, ha="center", va="bottom")
+
+
+def _rectangle(xy, width, height, colour, linewidth=1):
+    from matplotlib.patches import Rectangle
+
+    return Rectangle(
+        xy, width, height, facecolor=colour, edgecolor="w", linewidth=linewidth
     )
 
-    fig.legend(patches, names, "center right")
 
-    path = os.path.join(basepath, "cost_summary.pdf")
-    fig.set_canvas(FigureCanvasAgg(fig))
-    fig.savefig(path)
+_DRAWERS = {
+    "categories": _draw_categories,
+    "components": _draw_components,
+    "treemap": _draw_treemap,
+}
+
+
+def _render_chart(kind, path, data, dpi, digest):
+    # Agg canvas, no GUI backend is ever loaded
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    with tracing.span("render chart", "chart", chart=os.path.basename(path)):
+        fig = Figure(figsize=(12, 7), facecolor="w")
+        fig.set_canvas(FigureCanvasAgg(fig))
+
+        _DRAWERS[kind](fig, data)
+
+        fig.savefig(path, dpi=dpi)
+
+    save_hash(path, digest)
+
+    return path
+
+
+def system_charts(
+    basepath, metadata, format="pdf", dpi=150, top=10, processes=None, render=True
+):
+    """
+    Renders for each system the breakdown of its cost per category, the
+    bar chart of its *top* most expensive components and the treemap of
+    its assemblies, in the ``charts`` folder of the *basepath*.
+    The charts are rendered in parallel and only if their inputs changed
+    since the previous render.
+
+    :arg processes: number of worker processes (default: number of CPUs)
+    :arg render: if ``False``, only the paths are returned
+
+    Returns a :class:`dict` where the keys are the systems and the values,
+    the paths of their charts.
+    """
+    if format not in CHART_FORMATS:
+        raise ValueError("Unknown chart format: %s" % format)
+
+    charts_dir = os.path.join(basepath, CHARTS_DIR)
+    os.makedirs(charts_dir, exist_ok=True)
+
+    paths = {}
+    jobs = []
+
+    for system in metadata.systems:
+        for kind, data in _calculate_system_chart_data(system, top):
+            filename = "%s_%s.%s" % (system.label, kind, format)
+            path = os.path.join(charts_dir, filename)
+            paths.setdefault(system, []).append(path)
+
+            digest = calculate_hash(kind, data, format, dpi)
+            if not render:
+                continue
+            if is_uptodate(path, digest):
+                metrics.inc("cache_hits", cache="chart")
+            else:
+                metrics.inc("cache_misses", cache="chart")
+                jobs.append((kind, path, data, dpi, digest))
+
+    if processes == 1 or len(jobs) < 2:
+        for job in jobs:
+            _render_chart(*job)
+    else:
+        with ProcessPoolExecutor(processes) as executor:
+            futures = [
+                executor.submit(tracing.call_traced, _render_chart, *job)
+                for job in jobs
+            ]
+            for future in futures:
+                _path, events = future.result()  # re-raise exception of worker
+                tracing.add_events(events)
+
+    return paths
@@ -0,0 +1,295 @@
+#!/usr/bin/env python
+"""
+Incremental reading of a cost report.
+The files of the systems are polled and only the component files modified
+since the previous read are read again. A system is read again entirely when
+files are added or removed, or when the components of an assembly change.
+The cost of a modified component is not checked in its unmodified
+assemblies.
+"""
+
+# Standard library modules.
+import os
+import logging
+
+# Third party modules.
+
+# Local modules.
+from fsaecostreport.reader import (
+    MetadataReader,
+    SystemFileReader,
+    PartFileReader,
+    AssemblyFileReader,
+)
+from fsaecostreport.component import Part
+import fsaecostreport.tracing as tracing
+import fsaecostreport.metrics as metrics
+
+# Globals and constants variables.
+from fsaecostreport.constants import (
+    COMPONENTS_DIR,
+    DRAWINGS_DIR,
+    PICTURES_DIR,
+    CONFIG_FILE,
+    INTRODUCTION_FILE,
+    SAE_PARTS_FILE,
+)
+
+SYSTEM_DIRS = [(COMPONENTS_DIR, ".csv"), (DRAWINGS_DIR, ".pdf"), (PICTURES_DIR, ".jpg")]
+
+
+def _scan_files(filepaths):
+    signatures = {}
+    for filepath in filepaths:
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            continue
+        signatures[filepath] = (stat.st_mtime_ns, stat.st_size)
+    return signatures
+
+
+def _scan_dir(dirpath, ext):
+    signatures = {}
+    try:
+        entries = list(os.scandir(dirpath))
+    except OSError:
+        return signatures
+
+    for entry in entries:
+        if entry.name.endswith(ext) and entry.is_file():
+            stat = entry.stat()
+            signatures[entry.path] = (stat.st_mtime_ns, stat.st_size)
+    return signatures
+
+
+def _height(component):
+    return 1 + max((_height(child) for child in component.components), default=-1)
+
+
+def _iter_ancestors(component):
+    for parent in component.parents:
+        yield parent
+        yield from _iter_ancestors(parent)
+
+
+def _iter_descendants(component):
+    for child in component.components:
+        yield child
+        yield from _iter_descendants(child)
+
+
+class Changes(object):
+    """
+    Changes found by :meth:`IncrementalReader.update`.
+
+    **Attributes**:
+
+        * :attr:`metadata`: whether the metadata, and so all the systems,
+          were read again
+        * :attr:`systems`: labels of the systems read again entirely
+        * :attr:`components`: :class:`dict` of the label of each other
+          modified system and the P/Ns of its affected components: the
+          modified components, their parents, whose cost changed, and
+          the components of the modified assemblies, whose quantity may have
+          changed
+    """
+
+    def __init__(self, metadata=False, systems=(), components=None):
+        self.metadata = metadata
+        self.systems = set(systems)
+        self.components = components or {}
+
+    def __bool__(self):
+        return bool(self.metadata or self.systems or self.components)
+
+    def __repr__(self):
+        return "<Changes(metadata=%s, systems=%s, components=%s)>" % (
+            self.metadata,
+            sorted(self.systems),
+            dict((label, sorted(pns)) for label, pns in self.components.items()),
+        )
+
+    @property
+    def labels(self):
+        """
+        Labels of the modified systems.
+        """
+        return self.systems | set(self.components)
+
+    def to_dict(self):
+        return {
+            "metadata": self.metadata,
+            "systems": sorted(self.systems),
+            "components": dict(
+                (label, sorted(pns)) for label, pns in self.components.items()
+            ),
+        }
+
+
+class IncrementalReader(object):
+    def __init__(self, basepath, labels=None):
+        """
+        Creates a reader of the cost report in *basepath*.
+
+        :arg labels: labels of the systems to read (default: all)
+        """
+        self.basepath = basepath
+        self.labels = labels
+        self.metadata = None
+        self._metadata_signatures = {}
+        self._system_signatures = {}
+
+    def _metadata_filepaths(self):
+        return [
+            os.path.join(self.basepath, filename)
+            for filename in [CONFIG_FILE, INTRODUCTION_FILE, SAE_PARTS_FILE]
+        ]
+
+    def _scan_system(self, label):
+        signatures = {}
+        for dirname, ext in SYSTEM_DIRS:
+            dirpath = os.path.join(self.basepath, label, dirname)
+            signatures.update(_scan_dir(dirpath, ext))
+        return signatures
+
+    @property
+    def signatures(self):
+        """
+        Signatures (modification time and size) of the files at the previous
+        read or update.
+        """
+        signatures = dict(self._metadata_signatures)
+        for system_signatures in self._system_signatures.values():
+            signatures.update(system_signatures)
+        return signatures
+
+    def scan(self):
+        """
+        Returns the current signatures of the files, without reading them.
+        Before the first read, only the systems of :attr:`labels` are
+        scanned.
+        """
+        if self.metadata is not None:
+            labels = [system.label for system in self.metadata.systems]
+        else:
+            labels = self.labels or []
+
+        signatures = _scan_files(self._metadata_filepaths())
+        for label in labels:
+            signatures.update(self._scan_system(label))
+        return signatures
+
+    def read(self):
+        """
+        Reads the whole cost report and returns its metadata.
+        """
+        self._metadata_signatures = _scan_files(self._metadata_filepaths())
+        self._system_signatures = {}
+
+        metadata = MetadataReader().read(self.basepath)
+        if self.labels is not None:
+            metadata.systems = sorted(
+                system for system in metadata.systems if system.label in self.labels
+            )
+        self.metadata = metadata
+
+        for system in metadata.systems:
+            self._read_system(system)
+
+        return metadata
+
+    def _read_system(self, system):
+        # scanned before reading, so that a file modified during the read is
+        # read again at the next update
+        signatures = self._scan_system(system.label)
+
+        try:
+            SystemFileReader().read(self.basepath, system)
+        except Exception:
+            # read again entirely at the next update
+            self._system_signatures[system.label] = {}
+            raise
+
+        self._system_signatures[system.label] = signatures
+
+    def update(self):
+        """
+        Reads the files modified since the previous read or update.
+        Returns the :class:`Changes`.
+        """
+        with tracing.span("update", "reader"):
+            if self.metadata is None or (
+                _scan_files(self._metadata_filepaths()) != self._metadata_signatures
+            ):
+                logging.info("Reading metadata and all systems...")
+                metadata = self.read()
+                metrics.inc("updates", kind="metadata")
+                return Changes(True, [system.label for system in metadata.systems])
+
+            changes = Changes()
+            for system in self.metadata.systems:
+                self._update_system(system, changes)
+
+            return changes
+
+    def _update_system(self, system, changes):
+        previous = self._system_signatures.get(system.label, {})
+        current = self._scan_system(system.label)
+        if current == previous:
+            return
+
+        modified = [
+            filepath
+            for filepath, signature in current.items()
+            if filepath in previous and previous[filepath] != signature
+        ]
+        added_or_removed = set(current) ^ set(previous)
+
+        if not added_or_removed:
+            try:
+                pns = self._update_components(system, modified)
+            except (ValueError, KeyError, AssertionError) as ex:
+                logging.debug("Cannot update system %s: %s", system.label, ex)
+            else:
+                self._system_signatures[system.label] = current
+                if pns:
+                    changes.components[system.label] = pns
+                metrics.inc("updates", kind="component")
+                return
+
+        logging.info("Reading system %s...", system.label)
+        self._read_system(system)
+        changes.systems.add(system.label)
+        metrics.inc("updates", kind="system")
+
+    def _update_components(self, system, filepaths):
+        """
+        Reads again the modified component files of a system, from the leaves
+        to the system assembly.
+        Returns the P/Ns of the affected components.
+        """
+        components = []
+        pns = set()
+        for filepath in filepaths:
+            name = os.path.splitext(os.path.basename(filepath))[0]
+            if filepath.endswith(".csv"):
+                components.append(system.get_component(name))
+            else:
+                # drawing or picture: only the output of its component changes
+                for component in system.get_components():
+                    if name.startswith(component.pn):
+                        pns.add(component.pn)
+
+        for component in sorted(components, key=_height):
+            logging.info("Updating %s...", component.pn)
+            if isinstance(component, Part):
+                PartFileReader().update(component, system)
+            else:
+                AssemblyFileReader().update(component, system)
+                pns.update(child.pn for child in _iter_descendants(component))
+
+            pns.add(component.pn)
+            pns.update(parent.pn for parent in _iter_ancestors(component))
+
+        return pns
@@ -7,13 +7,24 @@ Utilities used to create LaTeX output
 import os
 import glob
 import re
+import json
 
 # Third party modules.
 
 # Local modules.
+from fsaecostreport.constants import BUILD_DIR
+import fsaecostreport.metrics as metrics
 
 # Globals and constants variables.
 
+AUX_LABEL_PREFIXES = ("ct", "dwg", "img")
+AUX_INDEX_FILE = "auxindex.json"
+
+_AUX_PATTERN = re.compile(
+    r"\\(?:newlabel\{(ct|dwg|img):([^}]*)\}\{\{[^}]*\}\{([^}]*)\}"
+    r"|@input\{([^}]*)\})"
+)
+
 _latex_special_chars = {
     "$": "\\$",
     "%": "\\%",
@@ -49,7 +60,7 @@ def escape(s):
     r"""
     From Volker Grabsch, python-tex package 1.7
     http://www.profv.de/python-tex/
-    
+
     Escape a unicode string for LaTeX.
     """
     return "".join(_latex_special_chars.get(c, c) for c in s)
@@ -69,10 +80,40 @@ def create_tabular(
     format_between_rows="",
     format_after_header=r"\hline",
     header_endrow=0,
+    chunks=None,
+    format_between_chunks=r"\newpage",
 ):
     """
     Create a tabular environment based on the data and the format given.
+
+    If *chunks* is specified, the data is split in several environments,
+    one starting at each row index of *chunks*. The header rows (i.e. the
+    rows before *header_endrow*) are repeated in each environment, and
+    *format_between_chunks* is inserted between them.
     """
+    if chunks is not None:
+        header = data[:header_endrow]
+        boundaries = [header_endrow] + list(chunks) + [len(data)]
+
+        tabular = []
+        for start, end in zip(boundaries[:-1], boundaries[1:]):
+            if tabular:
+                tabular += [format_between_chunks]
+
+            tabular += create_tabular(
+                header + data[start:end],
+                environment,
+                tableparameters,
+                tablespec,
+                format_before_tabular,
+                format_after_tabular,
+                format_between_rows,
+                format_after_header,
+                header_endrow,
+            )
+
+        return tabular
+
     tabular = []
 
     # begin environment
@@ -107,22 +148,117 @@ def create_tabular(
     return tabular
 
 
+class AuxIndex(object):
+    """
+    Page numbers of the ``ct:``, ``dwg:`` and ``img:`` labels of a report.
+    """
+
+    def __init__(self, labels=None):
+        if labels is None:
+            labels = {}
+        self._labels = dict((prefix, {}) for prefix in AUX_LABEL_PREFIXES)
+        for prefix, pagerefs in labels.items():
+            self._labels[prefix].update(pagerefs)
+
+    def add(self, prefix, name, page):
+        self._labels[prefix].setdefault(name, page)
+
+    def get_page(self, prefix, name, default=None):
+        """
+        Returns the page of the label ``<prefix>:<name>``.
+        """
+        return self._labels[prefix].get(name, default)
+
+    def get_pagerefs(self, prefix="ct"):
+        """
+        Returns a :class:`dict` of the label names of *prefix* and their page.
+        """
+        return self._labels[prefix]
+
+    def to_dict(self):
+        return self._labels
+
+
+class IndexedAuxReader(object):
+    """
+    Reads the page numbers of all the labels defined in the ``.aux`` files of
+    a base path, including the ones of the ``\\include`` children.
+    The index is saved in the build folder and only parsed again when the
+    modification time of one of the ``.aux`` files changes.
+    """
+
+    def __init__(self, cache=True):
+        self.cache = cache
+
+    def read(self, basepath):
+        filepaths = sorted(glob.glob(os.path.join(basepath, "*.aux")))
+        if not filepaths:
+            return AuxIndex()
+
+        cachepath = os.path.join(basepath, BUILD_DIR, AUX_INDEX_FILE)
+        if self.cache:
+            index = self._read_cache(cachepath, filepaths)
+            if index is not None:
+                metrics.inc("cache_hits", cache="aux")
+                return index
+            metrics.inc("cache_misses", cache="aux")
+
+        index = AuxIndex()
+        mtimes = {}
+        for filepath in filepaths:
+            self._read_file(basepath, filepath, index, mtimes)
+
+        if self.cache:
+            self._write_cache(cachepath, index, mtimes)
+
+        return index
+
+    def _read_file(self, basepath, filepath, index, mtimes):
+        if filepath in mtimes or not os.path.exists(filepath):
+            return
+        mtimes[filepath] = os.path.getmtime(filepath)
+        metrics.inc("files_read", kind="aux")
+
+        with open(filepath, "r") as fp:
+            for line in fp:
+                match = _AUX_PATTERN.match(line)
+                if match is None:
+                    continue
+
+                prefix, name, page, child = match.groups()
+                if child is not None:
+                    childpath = os.path.join(basepath, child)
+                    self._read_file(basepath, childpath, index, mtimes)
+                else:
+                    index.add(prefix, name, int(page) if page.isdigit() else page)
+
+    def _read_cache(self, cachepath, filepaths):
+        if not os.path.exists(cachepath):
+            return None
+
+        try:
+            with open(cachepath, "r") as fp:
+                cache = json.load(fp)
+            mtimes = cache["mtimes"]
+
+            if not set(filepaths).issubset(mtimes):
+                return None
+            for filepath, mtime in mtimes.items():
+                if os.path.getmtime(filepath) != mtime:
+                    return None
+
+            return AuxIndex(cache["labels"])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write_cache(self, cachepath, index, mtimes):
+        dirpath = os.path.dirname(cachepath)
+        os.makedirs(dirpath, exist_ok=True)
+
+        with open(cachepath, "w") as fp:
+            json.dump({"mtimes": mtimes, "labels": index.to_dict()}, fp)
+
+
 class AuxReader(object):
     def read(self, basepath):
-        files = glob.glob(os.path.join(basepath, "*.aux"))
-        if not files:
-            return {}
-
-        newlabel_lines = []
-        with open(files[0], "r") as f:
-            for line in f.readlines():
-                if line.startswith("\\newlabel{ct:"):
-                    newlabel_lines.append(line.strip())
-
-        pagerefs = {}
-        for line in newlabel_lines:
-            pn = line[13:24]
-            page = int(re.findall("{(\d+)}", line)[0])
-            pagerefs.setdefault(pn, page)
-
-        return pagerefs
+        return IndexedAuxReader().read(basepath).get_pagerefs("ct")
@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+"""
+Estimation of the page numbers of the cost report without compiling it.
+The layout of the system chapters is simulated from the structure written by
+:class:`fsaecostreport.writer.SystemLaTeXWriter`, with a fixed height for
+each heading and table row.
+"""
+
+# Standard library modules.
+import logging
+
+# Third party modules.
+
+# Local modules.
+from fsaecostreport.latex import AuxIndex
+
+# Globals and constants variables.
+
+# Heights in lines of text of a landscape letter page with 3cm margins
+PAGE_HEIGHT = 36.0
+CHAPTER_HEIGHT = 8.0
+SECTION_HEIGHT = 3.0
+SUBSECTION_HEIGHT = 2.5
+SUBSUBSECTION_HEIGHT = 2.0
+BOM_ROW_HEIGHT = 1.5
+COSTTABLE_ROW_HEIGHT = 1.5
+PICTURE_HEIGHT = 0.8 * PAGE_HEIGHT
+
+
+class _Cursor(object):
+    """
+    Position in the document, as a page number and the height used on it.
+    """
+
+    def __init__(self, page=1):
+        self.page = page
+        self.used = 0.0
+
+    def newpage(self):
+        if self.used > 0:
+            self.page += 1
+            self.used = 0.0
+
+    def add(self, height):
+        self.used += height
+
+        while self.used > PAGE_HEIGHT:
+            self.page += 1
+            self.used -= PAGE_HEIGHT
+
+    def add_page(self):
+        """
+        Adds a full page (e.g. an included PDF) and returns its number.
+        """
+        self.newpage()
+        page = self.page
+        self.page += 1
+        return page
+
+
+class PageEstimator(object):
+    def __init__(self, duplicates=None, chunk_size=None):
+        """
+        Creates an estimator of the page numbers of the labels of the
+        system chapters.
+
+        :arg duplicates: drawings and pictures replaced by a cross-reference
+            (see :func:`fsaecostreport.writer._find_duplicates`)
+        :arg chunk_size: maximum number of rows of each BOM ``tabular``,
+            as for :class:`fsaecostreport.writer.CostReportLaTeXWriter`
+        """
+        self.duplicates = duplicates or {}
+        self.chunk_size = chunk_size
+
+    def estimate(self, metadata):
+        """
+        Returns an :class:`AuxIndex <fsaecostreport.latex.AuxIndex>` with the
+        estimated page of the ``ct:``, ``dwg:`` and ``img:`` labels.
+        The arabic page numbering starts at the first system chapter.
+        """
+        index = AuxIndex()
+        cursor = _Cursor()
+
+        for system in metadata.systems:
+            self._estimate_system(system, cursor, index)
+
+        return index
+
+    def _estimate_system(self, system, cursor, index):
+        hierarchy = system.get_hierarchy()
+
+        cursor.newpage()
+        cursor.add(CHAPTER_HEIGHT)
+        cursor.newpage()
+
+        self._estimate_bom(hierarchy, cursor)
+        cursor.newpage()
+
+        cursor.add(SECTION_HEIGHT)
+        for component in hierarchy:
+            self._estimate_costtables(component, cursor, index)
+            cursor.newpage()
+
+        cursor.add(SECTION_HEIGHT + 1)
+        for component in hierarchy:
+            for i, drawing in enumerate(component.drawings):
+                name = "%s-%i" % (component.pn, i)
+                if drawing in self.duplicates:
+                    index.add("dwg", name, cursor.page)
+                    cursor.add(1)
+                else:
+                    index.add("dwg", name, cursor.add_page())
+        cursor.newpage()
+
+        cursor.add(SECTION_HEIGHT)
+        for component in hierarchy:
+            for i, picture in enumerate(component.pictures):
+                name = "%s-%i" % (component.pn, i)
+                if picture in self.duplicates:
+                    index.add("img", name, cursor.page)
+                    cursor.add(1)
+                else:
+                    cursor.add(SUBSECTION_HEIGHT)
+                    index.add("img", name, cursor.page)
+                    cursor.add(PICTURE_HEIGHT)
+                    cursor.newpage()
+        cursor.newpage()
+
+    def _estimate_bom(self, hierarchy, cursor):
+        cursor.add(SECTION_HEIGHT)
+
+        rows = len(hierarchy)
+        if not self.chunk_size:
+            cursor.add((rows + 1) * BOM_ROW_HEIGHT)
+            return
+
+        for start in range(0, max(rows, 1), self.chunk_size):
+            if start > 0:
+                cursor.newpage()
+            size = min(self.chunk_size, rows - start)
+            cursor.add((size + 1) * BOM_ROW_HEIGHT)
+
+    def _estimate_costtables(self, component, cursor, index):
+        cursor.add(SUBSECTION_HEIGHT)
+        index.add("ct", component.pn, cursor.page)
+
+        # an assembly lists its parts before its cost tables
+        for items in [
+            component.components,
+            component.materials,
+            component.processes,
+            component.fasteners,
+            component.toolings,
+        ]:
+            if items:
+                cursor.add(SUBSUBSECTION_HEIGHT)
+                # header, items and total rows
+                cursor.add((len(items) + 2) * COSTTABLE_ROW_HEIGHT)
+
+
+def reconcile(estimate, index, prefix="ct"):
+    """
+    Compares the estimated pages with the ones of an ``.aux`` file.
+    Returns the page references of *prefix*, taken from *index* when the
+    label was compiled and from *estimate* otherwise, and logs the labels
+    whose estimate was wrong.
+    """
+    pagerefs = dict(estimate.get_pagerefs(prefix))
+    actual = index.get_pagerefs(prefix)
+
+    mismatches = 0
+    for name, page in actual.items():
+        if name in pagerefs and pagerefs[name] != page:
+            logging.debug(
+                "Estimated page of %s:%s is %s, actual %s",
+                prefix,
+                name,
+                pagerefs[name],
+                page,
+            )
+            mismatches += 1
+        pagerefs[name] = page
+
+    if mismatches:
+        logging.info("%i estimated page(s) differ from the .aux file", mismatches)
+
+    return pagerefs
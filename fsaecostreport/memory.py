@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""
+Memory instrumentation of the stages of the cost report with
+:mod:`tracemalloc`.
+"""
+
+# Standard library modules.
+import os
+import json
+import tracemalloc
+
+# Third party modules.
+
+# Local modules.
+
+# Globals and constants variables.
+
+
+def _reset_peak():
+    if hasattr(tracemalloc, "reset_peak"):
+        tracemalloc.reset_peak()  # Python 3.9+
+        return
+
+    # restarting the tracing also resets the peak, but clears the traces
+    # of the memory allocated before
+    limit = tracemalloc.get_traceback_limit()
+    tracemalloc.stop()
+    tracemalloc.start(limit)
+
+
+def trace_call(func, *args, top=10, **kwargs):
+    """
+    Calls *func* while tracing the memory allocations.
+    Returns the result of *func* and a :class:`dict` with the current and
+    peak traced memory at the end of the call (in bytes) and the *top*
+    source lines which allocated the most memory during the call.
+    """
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+
+    try:
+        _reset_peak()
+        before = tracemalloc.take_snapshot()
+
+        result = func(*args, **kwargs)
+
+        current, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        if started:
+            tracemalloc.stop()
+
+    filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    diffs = after.filter_traces(filters).compare_to(
+        before.filter_traces(filters), "lineno"
+    )
+
+    lines = []
+    for diff in diffs[:top]:
+        frame = diff.traceback[0]
+        lines.append(
+            {
+                "filename": frame.filename,
+                "lineno": frame.lineno,
+                "size": diff.size_diff,
+                "count": diff.count_diff,
+            }
+        )
+
+    return result, {"current": current, "peak": peak, "top": lines}
+
+
+def write_report(filepath, stats):
+    """
+    Writes the memory statistics of the stages in a JSON file.
+
+    :arg stats: :class:`dict` of the statistics of each stage, as returned
+        by :func:`trace_call`
+    """
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+
+    with open(filepath, "w") as fp:
+        json.dump({"stages": stats}, fp, indent=2)
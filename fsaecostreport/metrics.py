@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+"""
+Registry of the counters and gauges of a run (files read, rows parsed,
+cache hits and misses, bytes written, etc.).
+The metrics recorded in worker processes are collected with
+:func:`call_counted` and merged in the registry of the main process.
+"""
+
+# Standard library modules.
+import os
+
+# Third party modules.
+
+# Local modules.
+
+# Globals and constants variables.
+
+PROMETHEUS_PREFIX = "fsaecostreport_"
+
+
+class Metrics(object):
+    """
+    Counters and gauges identified by a name and labels.
+    """
+
+    def __init__(self):
+        self._counters = {}
+        self._gauges = {}
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        """
+        Increments a counter.
+        """
+        key = self._key(name, labels)
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        """
+        Sets the value of a gauge.
+        """
+        self._gauges[self._key(name, labels)] = value
+
+    def get(self, name, default=0, **labels):
+        key = self._key(name, labels)
+        if key in self._gauges:
+            return self._gauges[key]
+        return self._counters.get(key, default)
+
+    def clear(self):
+        self._counters.clear()
+        self._gauges.clear()
+
+    def copy(self):
+        other = Metrics()
+        other.update(self)
+        return other
+
+    def update(self, other):
+        """
+        Adds the counters and sets the gauges of another registry.
+        """
+        for key, value in other._counters.items():
+            self._counters[key] = self._counters.get(key, 0) + value
+        self._gauges.update(other._gauges)
+
+    def __bool__(self):
+        return bool(self._counters or self._gauges)
+
+    def iter_values(self):
+        """
+        Yields the type (``counter`` or ``gauge``), name, labels and value of
+        each metric, sorted by name and labels.
+        """
+        values = [("counter", key, value) for key, value in self._counters.items()]
+        values += [("gauge", key, value) for key, value in self._gauges.items()]
+
+        for kind, (name, labels), value in sorted(values, key=lambda v: v[1]):
+            yield kind, name, dict(labels), value
+
+    def format_summary(self):
+        """
+        Returns the metrics as a text table.
+        """
+        rows = []
+        for _kind, name, labels, value in self.iter_values():
+            labels = ", ".join("%s=%s" % item for item in sorted(labels.items()))
+            rows.append((name, labels, str(value)))
+
+        if not rows:
+            return ""
+
+        widths = [max(len(row[i]) for row in rows) for i in range(3)]
+        lines = []
+        for name, labels, value in rows:
+            lines.append(
+                "%s  %s  %s"
+                % (
+                    name.ljust(widths[0]),
+                    labels.ljust(widths[1]),
+                    value.rjust(widths[2]),
+                )
+            )
+        return "\n".join(lines)
+
+    def write_textfile(self, filepath):
+        """
+        Writes the metrics in the Prometheus text format, e.g. for the
+        textfile collector of the node exporter.
+        """
+        lines = []
+        types = {}
+        for kind, name, labels, value in self.iter_values():
+            name = PROMETHEUS_PREFIX + name
+            if kind == "counter":
+                name += "_total"
+
+            if name not in types:
+                types[name] = kind
+                lines.append("# TYPE %s %s" % (name, kind))
+
+            if labels:
+                name += "{%s}" % ",".join(
+                    '%s="%s"' % item for item in sorted(labels.items())
+                )
+            lines.append("%s %s" % (name, value))
+
+        dirpath = os.path.dirname(filepath)
+        if dirpath:
+            os.makedirs(dirpath, exist_ok=True)
+
+        # written in a temporary file first as the collector may read it
+        # at any time
+        tmppath = filepath + ".tmp"
+        with open(tmppath, "w") as fp:
+            fp.write("\n".join(lines) + "\n")
+        os.replace(tmppath, filepath)
+
+
+registry = Metrics()
+
+
+def inc(name, value=1, **labels):
+    registry.inc(name, value, **labels)
+
+
+def gauge(name, value, **labels):
+    registry.set(name, value, **labels)
+
+
+def call_counted(func, *args, **kwargs):
+    """
+    Calls *func*, typically in a worker process, and returns its result and
+    the metrics recorded during the call, which the main process adds to
+    its registry with ``registry.update()``.
+    """
+    saved = registry.copy()
+    registry.clear()
+    try:
+        result = func(*args, **kwargs)
+    finally:
+        recorded = registry.copy()
+        registry.clear()
+        registry.update(saved)
+    return result, recorded
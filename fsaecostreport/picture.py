@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+"""
+Preprocessing of the pictures included in the cost report.
+Pictures are downscaled and recompressed once, in a build folder, and
+cached by the hash of their content.
+"""
+
+# Standard library modules.
+import os
+import hashlib
+import posixpath
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+# Third party modules.
+
+# Local modules.
+import fsaecostreport.metrics as metrics
+
+# Globals and constants variables.
+from fsaecostreport.constants import BUILD_DIR, PICTURES_DIR
+
+# Size of the area where pictures are included (in inches), i.e.
+# 0.8\textheight of a landscape letter page
+MAX_WIDTH = 10.0
+MAX_HEIGHT = 5.0
+
+# SHA-1 hash of the files, by path, with the signature (modification time
+# and size) of the file when it was hashed
+_digests = {}
+
+
+def hash_file(filepath, blocksize=1 << 20):
+    """
+    Returns the SHA-1 hash of the content of a file.
+    """
+    sha1 = hashlib.sha1()
+
+    with open(filepath, "rb") as fp:
+        for block in iter(lambda: fp.read(blocksize), b""):
+            sha1.update(block)
+
+    return sha1.hexdigest()
+
+
+def get_digest(filepath):
+    """
+    Returns the SHA-1 hash of the content of a file.
+    The hash is cached in the process until the modification time or the
+    size of the file changes, e.g. for the regenerations of the daemon.
+    """
+    stat = os.stat(filepath)
+    signature = (stat.st_mtime_ns, stat.st_size)
+
+    cached = _digests.get(filepath)
+    if cached is not None and cached[0] == signature:
+        metrics.inc("cache_hits", cache="digest")
+        return cached[1]
+    metrics.inc("cache_misses", cache="digest")
+
+    digest = hash_file(filepath)
+    _digests[filepath] = (signature, digest)
+    return digest
+
+
+def _process_picture(src, dst, size, quality):
+    from PIL import Image
+
+    with Image.open(src) as image:
+        image.thumbnail(size)  # only downscale, keep aspect ratio
+
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+
+        # write to a temporary file so that an interrupted run does not
+        # leave a corrupted picture in the cache
+        tmp = dst + ".tmp"
+        image.save(tmp, "JPEG", quality=quality, optimize=True)
+        os.replace(tmp, dst)
+
+    return dst
+
+
+def prepare_pictures(basepath, metadata, dpi=150, quality=85, processes=None):
+    """
+    Downscales the pictures of all components to fit the page at the
+    specified resolution and recompresses them.
+    The processed pictures are saved in ``build/pictures`` under the hash
+    of their source content and processing parameters, so a picture is
+    only processed again when it changes.
+
+    :arg dpi: resolution of the processed pictures
+    :arg quality: JPEG quality (1-95)
+    :arg processes: number of worker processes (default: number of CPUs)
+
+    Returns a :class:`dict` where the keys are the paths of the source
+    pictures and the values, the paths of the processed pictures relative
+    to the *basepath* (with forward slashes, as used in LaTeX).
+    """
+    size = (int(MAX_WIDTH * dpi), int(MAX_HEIGHT * dpi))
+
+    build_dir = os.path.join(basepath, BUILD_DIR, PICTURES_DIR)
+    os.makedirs(build_dir, exist_ok=True)
+
+    pictures = {}
+    jobs = {}
+
+    for system in metadata.systems:
+        for component in system.get_components():
+            for picture in component.pictures:
+                key = hashlib.sha1(
+                    ("%s-%r-%i" % (get_digest(picture), size, quality)).encode("ascii")
+                ).hexdigest()
+                filename = key + ".jpg"
+
+                pictures[picture] = posixpath.join(BUILD_DIR, PICTURES_DIR, filename)
+
+                dst = os.path.join(build_dir, filename)
+                if os.path.exists(dst) or dst in jobs:
+                    metrics.inc("cache_hits", cache="picture")
+                else:
+                    metrics.inc("cache_misses", cache="picture")
+                    jobs[dst] = (picture, dst, size, quality)
+
+    logging.debug("Processing %i of %i pictures", len(jobs), len(pictures))
+
+    if processes == 1 or len(jobs) < 2:
+        for job in jobs.values():
+            _process_picture(*job)
+    else:
+        with ProcessPoolExecutor(processes) as executor:
+            futures = [executor.submit(_process_picture, *job) for job in jobs.values()]
+            for future in futures:
+                future.result()  # re-raise exception of worker
+
+    return pictures
@@ -0,0 +1,354 @@
+#!/usr/bin/env python
+"""
+Scheduler of the output stages of the cost report.
+The stages form a directed acyclic graph and each stage runs in a worker
+process as soon as the stages it requires are done.
+The models registered with :func:`set_model` are shared with the worker
+processes: inherited when they are forked, otherwise serialized (see
+:mod:`fsaecostreport.serialization`), or loaded from their compiled bundle
+(see :mod:`fsaecostreport.bundle`), when they start.
+"""
+
+# Standard library modules.
+import os
+import time
+import logging
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, wait
+
+# Third party modules.
+
+# Local modules.
+from fsaecostreport.reader import MetadataReader, SystemFileReader
+import fsaecostreport.tracing as tracing
+import fsaecostreport.metrics as metrics
+import fsaecostreport.serialization as serialization
+
+# Globals and constants variables.
+
+_models = {}
+_bundles = {}
+
+_StageResult = namedtuple(
+    "_StageResult", ["result", "duration", "memory", "events", "metrics"]
+)
+
+
+class PipelineError(Exception):
+    """
+    Raised when a stage of a pipeline fails.
+    The exception of the stage is available as ``__cause__``.
+    """
+
+    def __init__(self, stage, skipped=()):
+        self.stage = stage
+        self.skipped = list(skipped)
+
+        message = "Stage %s failed" % stage
+        if self.skipped:
+            message += " (skipped: %s)" % ", ".join(self.skipped)
+        Exception.__init__(self, message)
+
+
+def set_model(basepath, metadata, bundle=None):
+    """
+    Registers the model read by the main process, so that the worker
+    processes of a :class:`Pipeline` do not read it again.
+
+    :arg bundle: path of the bundle the model was loaded from, loaded
+        again by the worker processes which do not inherit the model
+    """
+    labels = tuple(system.label for system in metadata.systems)
+    _models[(basepath, labels)] = metadata
+    if bundle is not None:
+        _bundles[(basepath, labels)] = os.path.abspath(bundle)
+    else:
+        _bundles.pop((basepath, labels), None)
+
+
+def get_model(basepath, labels):
+    """
+    Returns the metadata of the *basepath* with the systems of *labels* read.
+    The model registered with :func:`set_model` is returned if any, otherwise
+    it is read once per process.
+    """
+    key = (basepath, tuple(labels))
+    if key in _models:
+        metrics.inc("cache_hits", cache="model")
+        return _models[key]
+    metrics.inc("cache_misses", cache="model")
+
+    metadata = MetadataReader().read(basepath)
+    metadata.systems = sorted(
+        system for system in metadata.systems if system.label in labels
+    )
+
+    for system in metadata.systems:
+        SystemFileReader().read(basepath, system)
+
+    _models[key] = metadata
+    return metadata
+
+
+def _dump_models():
+    # the path of the bundle, if any, rather than the serialized model
+    return dict(
+        (key, _bundles.get(key) or serialization.dumps(metadata))
+        for key, metadata in _models.items()
+    )
+
+
+def _load_bundle(filepath, basepath, labels):
+    from fsaecostreport.bundle import load_bundle
+
+    metadata = load_bundle(filepath, basepath)
+    metadata.systems = sorted(
+        system for system in metadata.systems if system.label in labels
+    )
+    return metadata
+
+
+def _init_worker(payloads):
+    """
+    Installs the models serialized by the main process, or their bundle, in
+    a worker process.
+    """
+    for key, payload in payloads.items():
+        if isinstance(payload, str):
+            _models[key] = _load_bundle(payload, *key)
+        else:
+            _models[key] = serialization.loads(payload)
+
+
+def _call_span(name, func, *args, **kwargs):
+    with tracing.span(name, "stage"):
+        return func(*args, **kwargs)
+
+
+def _run_stage(
+    name, func, args, kwargs, profile_dir=None, trace_memory=False, trace_events=False
+):
+    """
+    Runs a stage and returns its result, its duration, its memory
+    statistics (``None`` if *trace_memory* is ``False``), and the trace
+    events and metrics recorded during the stage.
+    """
+    # the memory is traced inside the profiler, so that the allocations
+    # of the profiler are not reported
+    if trace_memory:
+        from fsaecostreport.memory import trace_call
+
+        args = (func,) + tuple(args)
+        func = trace_call
+    if profile_dir is not None:
+        from fsaecostreport.profiling import profile_call
+
+        args = (profile_dir, name, func) + tuple(args)
+        func = profile_call
+    if trace_events:
+        tracing.enable()  # not inherited by spawned workers
+        args = (_call_span, name, func) + tuple(args)
+        func = tracing.call_traced
+
+    start = time.perf_counter()
+    result, recorded = metrics.call_counted(func, *args, **kwargs)
+    duration = time.perf_counter() - start
+
+    events = []
+    if trace_events:
+        result, events = result
+
+    memory = None
+    if trace_memory:
+        result, memory = result
+    return _StageResult(result, duration, memory, events, recorded)
+
+
+class Pipeline(object):
+    def __init__(
+        self, processes=None, profile_dir=None, trace_memory=False, keep_going=False
+    ):
+        """
+        Creates an empty pipeline.
+
+        :arg processes: number of worker processes (default: number of CPUs);
+            with 1, the stages run one after another in the main process
+        :arg profile_dir: if not ``None``, each stage is profiled and its
+            statistics saved in this folder
+            (see :func:`fsaecostreport.profiling.profile_call`)
+        :arg trace_memory: whether to record the memory statistics of each
+            stage in :attr:`memory`
+            (see :func:`fsaecostreport.memory.trace_call`)
+        :arg keep_going: if ``True``, a failed stage only skips the stages
+            which require it: the exceptions are stored in :attr:`errors`
+            and the skipped stages in :attr:`skipped`, instead of raising a
+            :exc:`PipelineError`
+        """
+        self.processes = processes
+        self.profile_dir = profile_dir
+        self.trace_memory = trace_memory
+        self.keep_going = keep_going
+        self._stages = {}
+        self.timings = {}
+        self.memory = {}
+        self.errors = {}
+        self.skipped = []
+
+    def add_stage(self, name, func, args=(), kwargs=None, requires=()):
+        """
+        Adds a stage.
+        The function, its arguments and its result must be picklable.
+
+        :arg requires: names of the stages which must be done before this one
+        """
+        if name in self._stages:
+            raise ValueError("Stage %s already exists" % name)
+        for required in requires:
+            if required not in self._stages:
+                raise ValueError("Unknown required stage: %s" % required)
+
+        self._stages[name] = (func, tuple(args), kwargs or {}, tuple(requires))
+
+    def call(self, name, func, *args, **kwargs):
+        """
+        Runs immediately a stage in the main process, e.g. the reading of the
+        model, with the same instrumentation as the other stages.
+        Returns the result of *func*.
+        """
+        stage = _run_stage(
+            name,
+            func,
+            args,
+            kwargs,
+            self.profile_dir,
+            self.trace_memory,
+            tracing.is_enabled(),
+        )
+        self._record(name, stage)
+        return stage.result
+
+    def _record(self, name, stage):
+        self.timings[name] = stage.duration
+        if stage.memory is not None:
+            self.memory[name] = stage.memory
+        tracing.add_events(stage.events)
+        metrics.registry.update(stage.metrics)
+
+    def run(self):
+        """
+        Runs all the stages.
+        Returns a :class:`dict` of the results of the stages.
+        The duration of each stage (in seconds) is stored in :attr:`timings`.
+
+        If a stage fails, no other stage is started, the running stages are
+        waited for and a :exc:`PipelineError` is raised, unless the pipeline
+        keeps going.
+        """
+        if self.processes == 1 or len(self._stages) < 2:
+            return self._run_sequential()
+
+        # multiprocessing is only imported when the stages run concurrently
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        # only forked workers inherit the models of the main process; with
+        # spawn (default on Windows and macOS) and forkserver, they are
+        # serialized, instead of being read again by each worker
+        payloads = {}
+        if multiprocessing.get_start_method() != "fork":
+            payloads = _dump_models()
+
+        with ProcessPoolExecutor(
+            self.processes, initializer=_init_worker, initargs=(payloads,)
+        ) as executor:
+            return self._run_concurrent(executor)
+
+    def _run_sequential(self):
+        results = {}
+
+        names = list(self._stages)
+        for i, name in enumerate(names):
+            func, args, kwargs, requires = self._stages[name]
+            if not all(required in results for required in requires):
+                self.skipped.append(name)  # a required stage failed
+                continue
+
+            logging.info("Running stage %s...", name)
+
+            try:
+                stage = _run_stage(
+                    name,
+                    func,
+                    args,
+                    kwargs,
+                    self.profile_dir,
+                    self.trace_memory,
+                    tracing.is_enabled(),
+                )
+            except Exception as ex:
+                if not self.keep_going:
+                    raise PipelineError(name, names[i + 1 :]) from ex
+
+                logging.error("Running stage %s... FAILED", name)
+                self.errors[name] = ex
+                continue
+
+            results[name] = stage.result
+            self._record(name, stage)
+            logging.info("Running stage %s... DONE (%.2f s)", name, stage.duration)
+
+        return results
+
+    def _run_concurrent(self, executor):
+        results = {}
+        pending = dict(self._stages)
+        running = {}
+        failure = None
+
+        while pending or running:
+            if failure is None:
+                for name, (func, args, kwargs, requires) in list(pending.items()):
+                    if all(required in results for required in requires):
+                        logging.info("Running stage %s...", name)
+                        future = executor.submit(
+                            _run_stage,
+                            name,
+                            func,
+                            args,
+                            kwargs,
+                            self.profile_dir,
+                            self.trace_memory,
+                            tracing.is_enabled(),
+                        )
+                        running[future] = name
+                        del pending[name]
+
+            if not running:
+                break
+
+            done, _not_done = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+
+                try:
+                    stage = future.result()
+                except Exception as ex:
+                    logging.error("Running stage %s... FAILED", name)
+                    if self.keep_going:
+                        self.errors[name] = ex
+                    elif failure is None:
+                        failure = name, ex
+                    continue
+
+                results[name] = stage.result
+                self._record(name, stage)
+                logging.info("Running stage %s... DONE (%.2f s)", name, stage.duration)
+
+        if failure is not None:
+            name, ex = failure
+            raise PipelineError(name, pending) from ex
+
+        # the stages requiring a failed stage are never started
+        self.skipped.extend(pending)
+
+        return results
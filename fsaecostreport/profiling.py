@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+"""
+Profiling of the stages of the cost report with :mod:`cProfile`.
+The statistics of each stage are saved in a ``.pstats`` file, which can be
+loaded with :mod:`pstats` or a viewer such as snakeviz.
+"""
+
+# Standard library modules.
+import os
+import sys
+import cProfile
+import pstats
+
+# Third party modules.
+
+# Local modules.
+
+# Globals and constants variables.
+
+
+def get_profile_path(profile_dir, name):
+    return os.path.join(profile_dir, name + ".pstats")
+
+
+def profile_call(profile_dir, name, func, *args, **kwargs):
+    """
+    Calls *func* under :mod:`cProfile` and saves the statistics in the
+    file *name*\\ ``.pstats`` of *profile_dir*.
+    Returns the result of *func*.
+    """
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, *args, **kwargs)
+    finally:
+        os.makedirs(profile_dir, exist_ok=True)
+        profiler.dump_stats(get_profile_path(profile_dir, name))
+
+
+def print_summary(profile_dir, names, top=10, stream=None):
+    """
+    Prints the *top* functions by cumulative time of each profiled stage.
+    """
+    if stream is None:
+        stream = sys.stdout
+
+    for name in names:
+        path = get_profile_path(profile_dir, name)
+        if not os.path.exists(path):
+            continue
+
+        stream.write("Stage %s\n" % name)
+        stats = pstats.Stats(path, stream=stream)
+        stats.strip_dirs().sort_stats("cumulative").print_stats(top)
@@ -11,6 +11,7 @@ import glob
 import re
 from configparser import ConfigParser
 import unicodedata
+import functools
 from operator import attrgetter, itemgetter
 
 # Third party modules.
@@ -21,6 +22,8 @@ from fsaecostreport.costtable import Material, Process, Fastener, Tooling
 from fsaecostreport.component import Part, Assembly
 from fsaecostreport.pattern import SYS_ASSY_PN, SUB_ASSY_PN, PART_PN
 from fsaecostreport.system import System
+import fsaecostreport.tracing as tracing
+import fsaecostreport.metrics as metrics
 
 # Globals and constants variables.
 from fsaecostreport.constants import (
@@ -38,28 +41,35 @@ COMMA_SPLIT_PATTERN = re.compile(r"[^,;\s]+")
 def ascii(unistr):
     """
     Convert unicode to ascii.
+    The conversions are cached, since the same names of materials, processes
+    and fasteners come back in many components and cars.
     """
+    if isinstance(unistr, str):
+        return _ascii(unistr)
+    else:
+        return unistr
+
+
+@functools.lru_cache(maxsize=65536)
+def _ascii(unistr):
     try:
-        if isinstance(unistr, str):
-            ascii_chrs = []
+        ascii_chrs = []
 
-            for char in unistr:
-                decomposition = unicodedata.decomposition(char)
+        for char in unistr:
+            decomposition = unicodedata.decomposition(char)
 
+            try:
+                root, _modifier = decomposition.split()
+            except:  # Not a unicode character
+                ascii_chrs.append(char)
+            else:  # Convert to ascii
                 try:
-                    root, _modifier = decomposition.split()
-                except:  # Not a unicode character
-                    ascii_chrs.append(char)
-                else:  # Convert to ascii
-                    try:
-                        ascii_chr = chr(int(root, 16))  # root is in hex base
-                        ascii_chrs.append(ascii_chr)
-                    except:
-                        pass
-
-            return "".join(ascii_chrs)
-        else:
-            return unistr
+                    ascii_chr = chr(int(root, 16))  # root is in hex base
+                    ascii_chrs.append(ascii_chr)
+                except:
+                    pass
+
+        return "".join(ascii_chrs)
     except Exception as ex:
         raise Exception("Reading %s: %s" % (unistr, str(ex)))
 
@@ -76,11 +86,23 @@ class _ComponentFileReader(object):
         component.drawings = self._read_drawings(component.filepath)
         component.pictures = self._read_pictures(component.filepath)
 
+    def _update_header(self, component, header):
+        if (header["pn_base"], header["revision"]) != (
+            component.pn_base,
+            component.revision,
+        ):
+            raise ValueError("P/N of %s changed" % component.pn)
+
+        component.name = header["name"]
+        component.details = header["details"]
+
     def _get_lines(self, filepath):
-        logging.debug("Reading csv")
-        reader = csv.reader(open(filepath, "r"))
-        logging.debug("Reading csv... DONE")
-        return list(reader)
+        with open(filepath, "r") as fp:
+            lines = list(csv.reader(fp))
+
+        metrics.inc("files_read", kind="component")
+        metrics.inc("rows_parsed", len(lines), kind="component")
+        return lines
 
     def _find_line(self, lookup, lines):
         firstcol_getter = itemgetter(0)
@@ -260,12 +282,12 @@ class _ComponentFileReader(object):
         drawings_dir = os.path.abspath(
             os.path.join(os.path.dirname(filepath), "..", DRAWINGS_DIR)
         )
-        logging.debug("Drawings dir: %s" % drawings_dir)
+        logging.debug("Drawings dir: %s", drawings_dir)
 
         basename = os.path.splitext(os.path.basename(filepath))[0]
 
         drawings = glob.glob(os.path.join(drawings_dir, basename + "*.pdf"))
-        logging.debug("Found %i drawings" % len(drawings))
+        logging.debug("Found %i drawings", len(drawings))
 
         logging.debug("Reading drawings... DONE")
         return drawings
@@ -276,12 +298,12 @@ class _ComponentFileReader(object):
         pictures_dir = os.path.abspath(
             os.path.join(os.path.dirname(filepath), "..", PICTURES_DIR)
         )
-        logging.debug("Pictures dir: %s" % pictures_dir)
+        logging.debug("Pictures dir: %s", pictures_dir)
 
         basename = os.path.splitext(os.path.basename(filepath))[0]
 
         pictures = glob.glob(os.path.join(pictures_dir, basename + "*.jpg"))
-        logging.debug("Found %i pictures" % len(pictures))
+        logging.debug("Found %i pictures", len(pictures))
 
         logging.debug("Reading pictures... DONE")
         return pictures
@@ -289,20 +311,37 @@ class _ComponentFileReader(object):
 
 class PartFileReader(_ComponentFileReader):
     def read(self, filepath, system):
-        logging.debug("Reading part %s ..." % filepath)
+        with tracing.span("read part", "reader", file=os.path.basename(filepath)):
+            logging.debug("Reading part %s ...", filepath)
+
+            lines = self._get_lines(filepath)
+
+            header = self._read_header(lines)
+            header["system_label"] = system.label
+
+            part = Part(filepath, **header)
+            self._read(part, lines)
 
-        lines = self._get_lines(filepath)
+            system.add_component(part)
 
-        header = self._read_header(lines)
-        header["system_label"] = system.label
+            logging.debug("Reading part %s ... DONE", filepath)
+            return part
 
-        part = Part(filepath, **header)
-        self._read(part, lines)
+    def update(self, part, system):
+        """
+        Reads again the file of a part of the *system*, e.g. after it was
+        modified.
+        """
+        filepath = part.filepath
+        with tracing.span("update part", "reader", file=os.path.basename(filepath)):
+            logging.debug("Updating part %s ...", filepath)
 
-        system.add_component(part)
+            lines = self._get_lines(filepath)
+            self._update_header(part, self._read_header(lines))
+            self._read(part, lines)
 
-        logging.debug("Reading part %s ... DONE" % filepath)
-        return part
+            logging.debug("Updating part %s ... DONE", filepath)
+            return part
 
     def _read_header(self, lines):
         logging.debug("Reading header ...")
@@ -323,28 +362,55 @@ class PartFileReader(_ComponentFileReader):
 
 class AssemblyFileReader(_ComponentFileReader):
     def read(self, filepath, system):
-        logging.debug("Reading assembly %s ..." % filepath)
+        with tracing.span("read assembly", "reader", file=os.path.basename(filepath)):
+            logging.debug("Reading assembly %s ...", filepath)
 
-        lines = self._get_lines(filepath)
+            lines = self._get_lines(filepath)
 
-        header = self._read_header(lines)
-        header["system_label"] = system.label
+            header = self._read_header(lines)
+            header["system_label"] = system.label
 
-        assembly = Assembly(filepath, **header)
-        self._read(assembly, lines)
+            assembly = Assembly(filepath, **header)
+            self._read(assembly, lines)
 
-        # store assembly own quantity in case it does not have any parent
-        # in this case, the system reader will take this quantity as being
-        # the assembly quantity, otherwise, the parent (system assembly)
-        # will determine the assembly quantity
-        assembly._quantity = self._read_quantity(lines)
+            # store assembly own quantity in case it does not have any parent
+            # in this case, the system reader will take this quantity as being
+            # the assembly quantity, otherwise, the parent (system assembly)
+            # will determine the assembly quantity
+            assembly._quantity = self._read_quantity(lines)
 
-        assembly.components = self._read_parts(lines, assembly, system)
+            assembly.components = self._read_parts(lines, assembly, system)
 
-        system.add_component(assembly)
+            system.add_component(assembly)
 
-        logging.debug("Reading assembly %s ... DONE" % filepath)
-        return assembly
+            logging.debug("Reading assembly %s ... DONE", filepath)
+            return assembly
+
+    def update(self, assembly, system):
+        """
+        Reads again the file of an assembly of the *system*, e.g. after it was
+        modified.
+        The modified components of the assembly must be updated first, since
+        their unit cost is checked.
+        Raises :class:`ValueError` if the assembly does not have the same
+        components as before; the system must then be read again.
+        """
+        filepath = assembly.filepath
+        with tracing.span("update assembly", "reader", file=os.path.basename(filepath)):
+            logging.debug("Updating assembly %s ...", filepath)
+
+            lines = self._get_lines(filepath)
+            self._update_header(assembly, self._read_header(lines))
+            self._read(assembly, lines)
+            assembly._quantity = self._read_quantity(lines)
+
+            components = self._read_parts(lines, assembly, system)
+            if set(components) != set(assembly.components):
+                raise ValueError("Components of %s changed" % assembly.pn)
+            assembly.components = components
+
+            logging.debug("Updating assembly %s ... DONE", filepath)
+            return assembly
 
     def _read_header(self, lines):
         logging.debug("Reading header ...")
@@ -416,27 +482,31 @@ class AssemblyFileReader(_ComponentFileReader):
 
 class SystemFileReader(object):
     def read(self, basepath, system):
-        system_dir = os.path.join(basepath, system.label)
-        self._check_dir_structure(system_dir)
-
-        components_dir = os.path.join(system_dir, COMPONENTS_DIR)
+        with tracing.span("read system", "reader", system=system.label):
+            system_dir = os.path.join(basepath, system.label)
+            self._check_dir_structure(system_dir)
 
-        system.clear_components()  # reset
+            components_dir = os.path.join(system_dir, COMPONENTS_DIR)
 
-        for file in self._find_components(components_dir, SYS_ASSY_PN):
-            AssemblyFileReader().read(file, system)
+            system.clear_components()  # reset
 
-        for file in self._find_components(components_dir, SUB_ASSY_PN):
-            pn = os.path.splitext(os.path.basename(file))[0]
-            if not system.has_component(pn):
+            for file in self._find_components(components_dir, SYS_ASSY_PN):
                 AssemblyFileReader().read(file, system)
 
-        # check
-        self._check_unread_components(basepath, system)
-        self._check_unread_drawings(basepath, system)
-        self._check_unread_pictures(basepath, system)
+            for file in self._find_components(components_dir, SUB_ASSY_PN):
+                pn = os.path.splitext(os.path.basename(file))[0]
+                if not system.has_component(pn):
+                    AssemblyFileReader().read(file, system)
 
-        return system
+            # check
+            self._check_unread_components(basepath, system)
+            self._check_unread_drawings(basepath, system)
+            self._check_unread_pictures(basepath, system)
+
+            metrics.gauge(
+                "components", len(system.get_components()), system=system.label
+            )
+            return system
 
     def _check_dir_structure(self, system_dir):
         ls = os.listdir(system_dir)
@@ -511,61 +581,65 @@ class SystemFileReader(object):
 
 class MetadataReader(object):
     def read(self, basepath):
-        filepath = os.path.join(basepath, CONFIG_FILE)
-        if not os.path.exists(filepath):
-            raise IOError("No configuration file")
-
-        parser = ConfigParser()
-        parser.read(filepath)
-
-        year = int(parser.get("CostReport", "year"))
-        car_number = int(parser.get("CostReport", "carnumber"))
-        university = ascii(parser.get("CostReport", "university"))
-        team_name = ascii(parser.get("CostReport", "teamname"))
-        competition_name = ascii(parser.get("CostReport", "competitionname"))
-        competition_abbrev = ascii(parser.get("CostReport", "competitionabbrev"))
-        introduction = self._read_introduction(basepath)
-
-        # Systems
-        system_labels = parser.get("CostReport", "systems")
-        system_labels = COMMA_SPLIT_PATTERN.findall(system_labels)
-
-        systems = []
-        for label in system_labels:
-            if not parser.has_section(label):
-                raise ValueError("No section for system: %s" % label)
-
-            order = int(parser.get(label, "order"))
-            name = parser.get(label, "name")
-            colour = parser.get(label, "colour")
-            colour = COMMA_SPLIT_PATTERN.findall(colour)
-            colour = map(int, colour)
-            colour = tuple(colour)
-
-            system = System(order, label, name, colour)
-            systems.append(system)
-
-        systems = sorted(systems)  # Sort by letters
-
-        sae_parts = self._read_sae_parts(basepath, systems)
-
-        return Metadata(
-            year,
-            car_number,
-            university,
-            team_name,
-            competition_name,
-            competition_abbrev,
-            introduction,
-            sae_parts,
-            systems,
-        )
+        with tracing.span("read metadata", "reader"):
+            filepath = os.path.join(basepath, CONFIG_FILE)
+            if not os.path.exists(filepath):
+                raise IOError("No configuration file")
+
+            parser = ConfigParser()
+            parser.read(filepath)
+            metrics.inc("files_read", kind="config")
+
+            year = int(parser.get("CostReport", "year"))
+            car_number = int(parser.get("CostReport", "carnumber"))
+            university = ascii(parser.get("CostReport", "university"))
+            team_name = ascii(parser.get("CostReport", "teamname"))
+            competition_name = ascii(parser.get("CostReport", "competitionname"))
+            competition_abbrev = ascii(parser.get("CostReport", "competitionabbrev"))
+            introduction = self._read_introduction(basepath)
+
+            # Systems
+            system_labels = parser.get("CostReport", "systems")
+            system_labels = COMMA_SPLIT_PATTERN.findall(system_labels)
+
+            systems = []
+            for label in system_labels:
+                if not parser.has_section(label):
+                    raise ValueError("No section for system: %s" % label)
+
+                order = int(parser.get(label, "order"))
+                name = parser.get(label, "name")
+                colour = parser.get(label, "colour")
+                colour = COMMA_SPLIT_PATTERN.findall(colour)
+                colour = map(int, colour)
+                colour = tuple(colour)
+
+                system = System(order, label, name, colour)
+                systems.append(system)
+
+            systems = sorted(systems)  # Sort by letters
+
+            sae_parts = self._read_sae_parts(basepath, systems)
+
+            return Metadata(
+                year,
+                car_number,
+                university,
+                team_name,
+                competition_name,
+                competition_abbrev,
+                introduction,
+                sae_parts,
+                systems,
+            )
 
     def _read_introduction(self, basepath):
         lines = []
         with open(os.path.join(basepath, INTRODUCTION_FILE), "r") as f:
             for line in f.readlines():
                 lines.append(ascii(line.strip()))
+
+        metrics.inc("files_read", kind="introduction")
         return lines
 
     def _read_sae_parts(self, basepath, systems):
@@ -609,4 +683,5 @@ class MetadataReader(object):
 
                 sae_parts[system].append((component_name, pn))
 
+        metrics.inc("files_read", kind="sae_parts")
         return sae_parts
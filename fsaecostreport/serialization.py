@@ -0,0 +1,516 @@
+#!/usr/bin/env python
+"""
+Flat, versioned serialization of the cost report model (metadata, systems,
+components and cost tables).
+Pickling the components recurses through their parents and components, so
+the model is instead flattened in sections:
+
+    * ``meta``: metadata, systems and SAE common parts (JSON)
+    * ``strings``: table of the strings (JSON)
+    * ``comps``: one row per component (int32): system, kind, P/N base,
+      revision, name, details, file path and own quantity
+    * ``edges``: one row per assembly component (int32): parent, component
+      and quantity, in the order of the assembly
+    * ``files``: one row per drawing or picture (int32): component, kind
+      and path
+    * ``mat``, ``pro``, ``fas``, ``too``: one row per material, process,
+      fastener or tooling, with its integer and string fields (int32, the
+      first column being the component) and its numeric fields (float64,
+      ``.f`` suffix)
+
+The strings are referred by their index in the string table (``-1`` for
+``None``) and the missing numbers are NaN.
+The sections are aligned, so that the numeric sections of a file can be
+memory-mapped and read without copy (see :class:`ModelFile`).
+"""
+
+# Standard library modules.
+import os
+import gc
+import sys
+import json
+import math
+import mmap
+import struct
+from array import array
+
+# Third party modules.
+
+# Local modules.
+from fsaecostreport.metadata import Metadata
+from fsaecostreport.system import System
+from fsaecostreport.component import Part, Assembly
+from fsaecostreport.costtable import Material, Process, Fastener, Tooling
+import fsaecostreport.tracing as tracing
+
+# Globals and constants variables.
+
+MAGIC = b"FSAECRM\n"
+FORMAT_VERSION = 1
+
+_HEADER = struct.Struct("<8sII")  # magic, version, number of sections
+_ENTRY = struct.Struct("<8sQQ")  # name, offset, size
+_ALIGNMENT = 8
+
+PART, ASSEMBLY = 0, 1
+DRAWING, PICTURE = 0, 1
+
+COMPONENT_COLUMNS = 8
+EDGE_COLUMNS = 3
+FILE_COLUMNS = 3
+
+# section, class, attribute of the components, integer/string fields,
+# numeric fields
+ITEMS = [
+    (
+        "mat",
+        Material,
+        "materials",
+        ["id", "name", "use", "unit1", "unit2"],
+        ["unitcost", "size1", "size2", "quantity"],
+    ),
+    (
+        "pro",
+        Process,
+        "processes",
+        ["id", "name", "use", "unit", "multiplier_id"],
+        ["unitcost", "quantity", "multiplier"],
+    ),
+    (
+        "fas",
+        Fastener,
+        "fasteners",
+        ["id", "name", "use", "unit1", "unit2"],
+        ["unitcost", "size1", "size2", "quantity"],
+    ),
+    (
+        "too",
+        Tooling,
+        "toolings",
+        ["id", "name", "use", "unit"],
+        ["unitcost", "quantity", "pvf"],
+    ),
+]
+
+INTEGER_FIELDS = {"id", "multiplier_id"}
+
+
+def to_bytes(values):
+    """
+    Returns the content of an :class:`array.array`, in little-endian order.
+    """
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+class _StringTable(object):
+    def __init__(self):
+        self.strings = []
+        self._indexes = {}
+
+    def add(self, string):
+        if string is None:
+            return -1
+
+        index = self._indexes.get(string)
+        if index is None:
+            index = self._indexes[string] = len(self.strings)
+            self.strings.append(string)
+        return index
+
+
+def create_sections(metadata, basepath=None):
+    """
+    Flattens the model of *metadata*.
+    Returns a :class:`dict` of the name and content of each section.
+
+    :arg basepath: if not ``None``, the paths of the files are saved relative
+        to this folder
+    """
+    strings = _StringTable()
+
+    def add_path(filepath):
+        if basepath is not None:
+            filepath = os.path.relpath(filepath, basepath)
+        return strings.add(filepath)
+
+    # the systems which are not selected only keep their SAE common parts
+    systems = list(metadata.systems)
+    systems += [system for system in metadata.sae_parts if system not in systems]
+    system_indexes = dict((system, index) for index, system in enumerate(systems))
+
+    meta = {
+        "year": metadata.year,
+        "car_number": metadata.car_number,
+        "university": metadata.university,
+        "team_name": metadata.team_name,
+        "competition_name": metadata.competition_name,
+        "competition_abbrev": metadata.competition_abbrev,
+        "introduction": metadata.introduction,
+        "systems": [
+            [system._order, system.label, system.name, list(system.colour)]
+            for system in systems
+        ],
+        "selected": len(metadata.systems),
+        "sae_parts": dict(
+            (system.label, [list(sae_part) for sae_part in sae_parts])
+            for system, sae_parts in metadata.sae_parts.items()
+        ),
+    }
+
+    components = []
+    for system in metadata.systems:
+        components.extend((system, component) for component in system.get_components())
+    component_indexes = dict(
+        (component, index) for index, (_system, component) in enumerate(components)
+    )
+
+    comps = array("i")
+    edges = array("i")
+    files = array("i")
+    item_sections = dict((name, (array("i"), array("d"))) for name, *_ in ITEMS)
+
+    for index, (system, component) in enumerate(components):
+        comps.extend(
+            [
+                system_indexes[system],
+                PART if isinstance(component, Part) else ASSEMBLY,
+                strings.add(component.pn_base),
+                strings.add(component.revision),
+                strings.add(component.name),
+                strings.add(component.details),
+                add_path(component.filepath),
+                component._quantity,
+            ]
+        )
+
+        for child, quantity in component.components.items():
+            edges.extend([index, component_indexes[child], quantity])
+
+        for kind, filepaths in [
+            (DRAWING, component.drawings),
+            (PICTURE, component.pictures),
+        ]:
+            for filepath in filepaths:
+                files.extend([index, kind, add_path(filepath)])
+
+        for name, _class, attr, integer_fields, float_fields in ITEMS:
+            integers, floats = item_sections[name]
+            for item in getattr(component, attr):
+                integers.append(index)
+                for field in integer_fields:
+                    value = getattr(item, field)
+                    if field in INTEGER_FIELDS:
+                        integers.append(-1 if value is None else value)
+                    else:
+                        integers.append(strings.add(value))
+
+                for field in float_fields:
+                    value = getattr(item, field)
+                    floats.append(math.nan if value is None else value)
+
+    sections = {
+        "meta": json.dumps(meta).encode("utf8"),
+        "strings": json.dumps(strings.strings).encode("utf8"),
+        "comps": to_bytes(comps),
+        "edges": to_bytes(edges),
+        "files": to_bytes(files),
+    }
+    for name, (integers, floats) in item_sections.items():
+        sections[name] = to_bytes(integers)
+        sections[name + ".f"] = to_bytes(floats)
+
+    return sections
+
+
+def _align(offset):
+    return (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def pack_sections(sections):
+    """
+    Returns the serialized *sections*, a :class:`dict` of the name (at most
+    8 ASCII characters) and content of each section.
+    """
+    offset = _align(_HEADER.size + _ENTRY.size * len(sections))
+
+    entries = []
+    for name, content in sections.items():
+        entries.append(_ENTRY.pack(name.encode("ascii"), offset, len(content)))
+        offset = _align(offset + len(content))
+
+    buffer = bytearray(offset)
+    _HEADER.pack_into(buffer, 0, MAGIC, FORMAT_VERSION, len(sections))
+    buffer[_HEADER.size : _HEADER.size + _ENTRY.size * len(sections)] = b"".join(
+        entries
+    )
+
+    for entry, content in zip(entries, sections.values()):
+        _name, offset, size = _ENTRY.unpack(entry)
+        buffer[offset : offset + size] = content
+
+    return bytes(buffer)
+
+
+def dumps(metadata):
+    """
+    Returns the serialized model of *metadata*.
+    """
+    with tracing.span("dump model", "serialization"):
+        return pack_sections(create_sections(metadata))
+
+
+def loads(data):
+    """
+    Returns the metadata of a model serialized by :func:`dumps`.
+    """
+    with ModelFile(data) as modelfile:
+        return modelfile.to_metadata()
+
+
+def dump(metadata, filepath):
+    with open(filepath, "wb") as fp:
+        fp.write(dumps(metadata))
+
+
+def load(filepath, use_mmap=False):
+    """
+    Returns the metadata of a model serialized in a file.
+
+    :arg use_mmap: whether to memory-map the file instead of reading it
+    """
+    with ModelFile.open(filepath, use_mmap) as modelfile:
+        return modelfile.to_metadata()
+
+
+class ModelFile(object):
+    """
+    Sections of a serialized model.
+    The numeric sections are :class:`memoryview` of the buffer, without copy.
+    """
+
+    def __init__(self, buffer, mapping=None):
+        """
+        :arg buffer: serialized model, e.g. :class:`bytes` or :class:`mmap.mmap`
+        :arg mapping: memory mapping closed with the model file
+        """
+        self._buffer = memoryview(buffer)
+        self._mapping = mapping
+
+        magic, version, count = _HEADER.unpack_from(self._buffer, 0)
+        if magic != MAGIC:
+            raise ValueError("Not a serialized cost report")
+        if version != FORMAT_VERSION:
+            raise ValueError("Unsupported format version: %s" % version)
+
+        self._sections = {}
+        for index in range(count):
+            name, offset, size = _ENTRY.unpack_from(
+                self._buffer, _HEADER.size + index * _ENTRY.size
+            )
+            self._sections[name.rstrip(b"\0").decode("ascii")] = (offset, size)
+
+    @classmethod
+    def open(cls, filepath, use_mmap=False):
+        with open(filepath, "rb") as fp:
+            if not use_mmap:
+                return cls(fp.read())
+
+            mapping = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+            return cls(mapping, mapping)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exctype, value, tb):
+        self.close()
+
+    def close(self):
+        self._buffer.release()
+        if self._mapping is not None:
+            self._mapping.close()
+
+    def has_section(self, name):
+        return name in self._sections
+
+    def get_bytes(self, name):
+        offset, size = self._sections[name]
+        return self._buffer[offset : offset + size]
+
+    def _get_array(self, name, typecode):
+        view = self.get_bytes(name)
+        if sys.byteorder == "little":
+            return view.cast(typecode)
+
+        values = array(typecode, view.tobytes())
+        values.byteswap()
+        return memoryview(values)
+
+    def get_ints(self, name):
+        return self._get_array(name, "i")
+
+    def get_floats(self, name):
+        return self._get_array(name, "d")
+
+    def get_json(self, name):
+        return json.loads(bytes(self.get_bytes(name)).decode("utf8"))
+
+    def get_strings(self):
+        return self.get_json("strings")
+
+    def get_systems(self):
+        """
+        Returns the systems, the selected ones first.
+        """
+        return [
+            System(order, label, name, tuple(colour))
+            for order, label, name, colour in self.get_json("meta")["systems"]
+        ]
+
+    def _read_components(self, systems, strings, paths):
+        components = []
+
+        rows = self.get_ints("comps").tolist()
+        for start in range(0, len(rows), COMPONENT_COLUMNS):
+            (
+                system_index,
+                kind,
+                pn_base,
+                revision,
+                name,
+                details,
+                filepath,
+                quantity,
+            ) = rows[start : start + COMPONENT_COLUMNS]
+
+            system = systems[system_index]
+            component_class = Part if kind == PART else Assembly
+            component = component_class(
+                paths(strings[filepath]),
+                system.label,
+                strings[name],
+                strings[pn_base],
+                strings[revision],
+                strings[details],
+            )
+            component._quantity = quantity
+
+            system.add_component(component)
+            components.append(component)
+
+        return components
+
+    def to_metadata(self, basepath=None):
+        """
+        Returns the metadata with the selected systems and their components.
+
+        :arg basepath: folder of the relative paths of the files, if saved
+            relative to a folder
+        """
+        # no garbage collection while the objects are created, as the model
+        # has no reference cycle to collect yet
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return self._to_metadata(basepath)
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    def _to_metadata(self, basepath):
+        with tracing.span("load model", "serialization"):
+            meta = self.get_json("meta")
+            strings = self.get_strings() + [None]  # index -1
+            systems = self.get_systems()
+
+            def paths(filepath):
+                if basepath is None:
+                    return filepath
+                return os.path.normpath(os.path.join(basepath, filepath))
+
+            components = self._read_components(systems, strings, paths)
+
+            rows = self.get_ints("edges").tolist()
+            for start in range(0, len(rows), EDGE_COLUMNS):
+                parent, child, quantity = rows[start : start + EDGE_COLUMNS]
+                components[parent].components[components[child]] = quantity
+                components[child].parents.add(components[parent])
+
+            rows = self.get_ints("files").tolist()
+            for start in range(0, len(rows), FILE_COLUMNS):
+                index, kind, filepath = rows[start : start + FILE_COLUMNS]
+                component = components[index]
+                filepaths = (
+                    component.drawings if kind == DRAWING else component.pictures
+                )
+                filepaths.append(paths(strings[filepath]))
+
+            for name, item_class, attr, integer_fields, float_fields in ITEMS:
+                self._read_items(
+                    components,
+                    strings,
+                    name,
+                    item_class,
+                    attr,
+                    integer_fields,
+                    float_fields,
+                )
+
+            systems_ref = dict((system.label, system) for system in systems)
+            sae_parts = dict(
+                (systems_ref[label], [tuple(sae_part) for sae_part in sae_parts])
+                for label, sae_parts in meta["sae_parts"].items()
+            )
+
+            return Metadata(
+                meta["year"],
+                meta["car_number"],
+                meta["university"],
+                meta["team_name"],
+                meta["competition_name"],
+                meta["competition_abbrev"],
+                meta["introduction"],
+                sae_parts,
+                systems[: meta["selected"]],
+            )
+
+    def _read_items(
+        self, components, strings, name, item_class, attr, integer_fields, float_fields
+    ):
+        integers = self.get_ints(name).tolist()
+        floats = self.get_floats(name + ".f").tolist()
+
+        integer_rows = zip(*[iter(integers)] * (len(integer_fields) + 1))
+        float_rows = zip(*[iter(floats)] * len(float_fields))
+
+        fields = integer_fields + float_fields
+        integer_indexes = [
+            index
+            for index, field in enumerate(integer_fields)
+            if field in INTEGER_FIELDS
+        ]
+        string_indexes = [
+            index
+            for index, field in enumerate(integer_fields)
+            if field not in INTEGER_FIELDS
+        ]
+        items = [getattr(component, attr) for component in components]
+        new = object.__new__
+
+        for integer_row, float_row in zip(integer_rows, float_rows):
+            values = list(integer_row[1:])
+            for index in integer_indexes:
+                if values[index] == -1:
+                    values[index] = None
+            for index in string_indexes:
+                values[index] = strings[values[index]]
+
+            # NaN for None
+            values.extend(value if value == value else None for value in float_row)
+
+            # the attributes are the arguments of the constructors
+            item = new(item_class)
+            item.__dict__.update(zip(fields, values))
+            items[integer_row[0]].append(item)
@@ -97,18 +97,25 @@ class System(object):
         self._components = {}
 
     def get_hierarchy(self):
+        return list(self.iter_hierarchy())
+
+    def iter_hierarchy(self):
+        """
+        Yields the components of the system in the order of the hierarchy,
+        starting from the components without parent.
+        A component used by several assemblies is only yielded once.
+        """
         orphans = []
         for component in self._components.values():
             if not component.parents:
                 orphans.append(component)
 
-        hierarchy = []
+        seen = set()
         for orphan in reversed(sorted(orphans)):
-            for component in orphan.get_hierarchy():
-                if component not in hierarchy:
-                    hierarchy.append(component)
-
-        return hierarchy
+            for component in orphan.iter_hierarchy():
+                if component not in seen:
+                    seen.add(component)
+                    yield component
 
 
 # BR = System("BR", "Brake System", "A", (153, 204, 255))
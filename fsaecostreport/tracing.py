@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+"""
+Spans of the build of the cost report, exported in the Chrome
+``trace_event`` format (e.g. to be loaded in Perfetto or chrome://tracing).
+Tracing is disabled by default and the spans then cost almost nothing.
+The spans recorded in worker processes are collected with
+:func:`call_traced` and added to the events of the main process.
+"""
+
+# Standard library modules.
+import os
+import time
+import json
+import threading
+
+# Third party modules.
+
+# Local modules.
+
+# Globals and constants variables.
+
+_enabled = False
+_events = []
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def _now():
+    # wall clock in microseconds, comparable between processes
+    return time.time_ns() / 1000.0
+
+
+class _NullSpan(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span(object):
+    def __init__(self, name, category, args):
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.start = _now()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        event = {
+            "name": self.name,
+            "cat": self.category,
+            "ph": "X",
+            "ts": self.start,
+            "dur": _now() - self.start,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+        }
+        if self.args:
+            event["args"] = self.args
+        _events.append(event)
+        return False
+
+
+def span(name, category="", **args):
+    """
+    Returns a context manager recording the duration of its block.
+
+    :arg category: category of the span, e.g. ``reader`` or ``writer``
+    :arg args: values displayed with the span
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, category, args)
+
+
+def get_events():
+    return list(_events)
+
+
+def add_events(events):
+    _events.extend(events)
+
+
+def clear():
+    del _events[:]
+
+
+def call_traced(func, *args, **kwargs):
+    """
+    Calls *func*, typically in a worker process, and returns its result and
+    the events recorded during the call, which the main process adds with
+    :func:`add_events`.
+    """
+    mark = len(_events)
+    try:
+        result = func(*args, **kwargs)
+    finally:
+        events = _events[mark:]
+        del _events[mark:]
+    return result, events
+
+
+def write_trace(filepath, events=None):
+    """
+    Writes the events in a Chrome ``trace_event`` JSON file.
+    The processes are named *main* and *worker <pid>*.
+    """
+    if events is None:
+        events = get_events()
+
+    pid = os.getpid()
+    metadata = []
+    for event_pid in sorted(set(event["pid"] for event in events)):
+        name = "main" if event_pid == pid else "worker %i" % event_pid
+        metadata.append(
+            {
+                "name": "process_name",
+                "ph": "M",
+                "pid": event_pid,
+                "args": {"name": name},
+            }
+        )
+
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+
+    with open(filepath, "w") as fp:
+        json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, fp)
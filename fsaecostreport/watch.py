@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+"""
+Watch mode of the command line interface.
+The files of the cost report are polled and, once left unmodified for a
+debounce delay (e.g. Excel writes a file several times when saving it), only
+the modified components are read again
+(see :class:`fsaecostreport.incremental.IncrementalReader`) and only the
+outputs of the modified systems are regenerated: the writers keep the
+chapters and eBOM rows of the other systems and the charts are only rendered
+again if their costs changed.
+"""
+
+# Standard library modules.
+import time
+import logging
+import threading
+
+# Third party modules.
+
+# Local modules.
+import fsaecostreport.tracing as tracing
+import fsaecostreport.metrics as metrics
+
+# Globals and constants variables.
+
+
+def invalidate_writers(writers, changes):
+    """
+    Discards what the *writers* kept of the systems modified by *changes*.
+
+    :arg writers: writers, e.g. created with ``reuse_chapters=True``
+    :arg changes: :class:`Changes <fsaecostreport.incremental.Changes>`
+    """
+    labels = None if changes.metadata else changes.labels
+    for writer in writers:
+        if hasattr(writer, "invalidate"):
+            writer.invalidate(labels)
+
+
+class Watcher(object):
+    def __init__(
+        self,
+        basepath,
+        reader,
+        writers=(),
+        chart_format=None,
+        system_charts=False,
+        picture_dpi=None,
+        poll_interval=0.5,
+        debounce=1.0,
+        trace_file=None,
+        metrics_textfile=None,
+    ):
+        """
+        Creates a watcher of the cost report in *basepath*.
+
+        :arg reader: :class:`IncrementalReader
+            <fsaecostreport.incremental.IncrementalReader>`, already read
+        :arg writers: :class:`list` of the name and writer of each output,
+            written in this order
+        :arg chart_format: if not ``None``, the charts are rendered in this
+            format before the writers
+        :arg system_charts: whether to also render the charts of each system
+        :arg picture_dpi: if not ``None``, the pictures are downscaled to
+            this resolution before the writers
+        :arg poll_interval: interval (in seconds) between two polls
+        :arg debounce: delay (in seconds) without modification before the
+            files are read
+        :arg trace_file: if not ``None``, the spans of each regeneration are
+            written in this file (see :func:`fsaecostreport.tracing.write_trace`)
+        :arg metrics_textfile: if not ``None``, the metrics are written in
+            this file after each regeneration
+        """
+        self.basepath = basepath
+        self.reader = reader
+        self.writers = list(writers)
+        self.chart_format = chart_format
+        self.system_charts = system_charts
+        self.picture_dpi = picture_dpi
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.trace_file = trace_file
+        self.metrics_textfile = metrics_textfile
+        self._signatures = reader.signatures
+        self._stopped = threading.Event()
+
+    def stop(self):
+        self._stopped.set()
+
+    def wait(self):
+        """
+        Waits until files are modified and then left unmodified for the
+        debounce delay, and reads them.
+        Returns the :class:`Changes <fsaecostreport.incremental.Changes>`,
+        or ``None`` if the watcher was stopped.
+        """
+        while not self._stopped.wait(self.poll_interval):
+            signatures = self.reader.scan()
+            if signatures == self._signatures:
+                continue
+
+            last_modified = time.monotonic()
+            while time.monotonic() - last_modified < self.debounce:
+                if self._stopped.wait(min(self.poll_interval, self.debounce)):
+                    return None
+
+                current = self.reader.scan()
+                if current != signatures:
+                    signatures = current
+                    last_modified = time.monotonic()
+
+            # not read again if the files are invalid, until modified again
+            self._signatures = signatures
+            return self.reader.update()
+
+        return None
+
+    def regenerate(self, changes):
+        """
+        Writes the outputs of the systems modified by *changes*.
+        Returns the duration of each step.
+        """
+        invalidate_writers([writer for _name, writer in self.writers], changes)
+
+        durations = {}
+        metadata = self.reader.metadata
+
+        if self.chart_format is not None:
+            import fsaecostreport.graph as graph
+
+            start = time.perf_counter()
+            graph.cost_summary(self.basepath, metadata, self.chart_format)
+            if self.system_charts:
+                graph.system_charts(self.basepath, metadata, self.chart_format)
+            durations["charts"] = time.perf_counter() - start
+
+        if self.picture_dpi is not None:
+            from fsaecostreport.picture import prepare_pictures
+
+            start = time.perf_counter()
+            prepare_pictures(self.basepath, metadata, self.picture_dpi)
+            durations["pictures"] = time.perf_counter() - start
+
+        for name, writer in self.writers:
+            start = time.perf_counter()
+            with tracing.span(type(writer).__name__, "writer"):
+                writer.write(self.basepath, metadata)
+            durations[name] = time.perf_counter() - start
+
+        metrics.inc("regenerations")
+        return durations
+
+    def export(self):
+        """
+        Writes the spans recorded since the last export in the trace file,
+        and the metrics in the textfile.
+        The spans are then discarded, so they do not accumulate while
+        watching.
+        """
+        if self.trace_file is not None:
+            tracing.write_trace(self.trace_file)
+            tracing.clear()
+
+        if self.metrics_textfile is not None:
+            metrics.registry.write_textfile(self.metrics_textfile)
+
+    def run(self):
+        """
+        Regenerates the outputs after each modification, until :meth:`stop`
+        is called.
+        """
+        logging.info("Watching %s...", self.basepath)
+
+        while True:
+            try:
+                changes = self.wait()
+            except Exception as ex:
+                logging.error("Reading failed: %s", ex)
+                continue
+
+            if changes is None:
+                return
+            if not changes:
+                continue
+
+            logging.info("Updated: %r", changes)
+            try:
+                durations = self.regenerate(changes)
+            except Exception as ex:
+                logging.error("Regeneration failed: %s", ex, exc_info=True)
+                self.export()
+                continue
+
+            for name, duration in sorted(durations.items()):
+                logging.info("Regenerated %s: %.2f s", name, duration)
+
+            self.export()
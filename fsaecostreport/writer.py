@@ -1,36 +1,46 @@
 #!/usr/bin/env python
 """
 LaTeX writer of the cost report
+openpyxl is only imported when a workbook is written.
 """
 
 # Standard library modules.
 import operator
+import functools
 import posixpath
 import os.path
 import csv
+from concurrent.futures import ProcessPoolExecutor
 
 # Third party modules.
-from openpyxl import Workbook
-from openpyxl.styles.numbers import NumberFormat
-from openpyxl.styles.colors import Color
-from openpyxl.styles.fills import PatternFill
-from openpyxl.styles.fonts import Font
 
 # Local modules.
 from fsaecostreport.latex import (
     create_tabular,
     escape as e,
-    AuxReader,
+    IndexedAuxReader,
     escape_math as m,
 )
 from fsaecostreport.component import Part, Assembly
+from fsaecostreport.picture import prepare_pictures, get_digest
+from fsaecostreport.layout import PageEstimator, reconcile
 import fsaecostreport.graph as graph
+import fsaecostreport.serialization as serialization
+import fsaecostreport.tracing as tracing
+import fsaecostreport.metrics as metrics
 
 # Globals and constants variables.
-from fsaecostreport.constants import DRAWINGS_DIR, PICTURES_DIR, LOGO_FILE
+from fsaecostreport.constants import DRAWINGS_DIR, PICTURES_DIR, CHARTS_DIR, LOGO_FILE
 
 SUBTOTAL = operator.attrgetter("subtotal")
 
+FSG_TITLE_STYLE = "FSG Title"
+FSG_HEADER_STYLE = "FSG Header"
+FSG_MONEY_STYLE = "FSG Money"
+FSG_HEADER_MONEY_STYLE = "FSG Header Money"
+FSG_MONEY_FORMAT = "#,##0.00$"
+FSG_SUMMARY_TITLE = "Summary"
+
 
 def decimal(number):
     if number < 0.01:
@@ -61,6 +71,184 @@ def humanjoin(values, sort=True, andchr="and"):
         return ", ".join(values[:-1]) + " " + andchr + " " + values[-1]
 
 
+def _create_fsg_styles():
+    """
+    Returns the named styles of the FSG workbook.
+    A new set must be created for each workbook.
+    """
+    from openpyxl.styles import NamedStyle
+    from openpyxl.styles.colors import Color
+    from openpyxl.styles.fills import PatternFill
+    from openpyxl.styles.fonts import Font
+
+    header_font = Font(bold=True)
+    header_fill = PatternFill(bgColor=Color("FFC0C0C0"))
+
+    return [
+        NamedStyle(FSG_TITLE_STYLE, font=Font(bold=True)),
+        NamedStyle(FSG_HEADER_STYLE, font=header_font, fill=header_fill),
+        NamedStyle(FSG_MONEY_STYLE, number_format=FSG_MONEY_FORMAT),
+        NamedStyle(
+            FSG_HEADER_MONEY_STYLE,
+            font=header_font,
+            fill=header_fill,
+            number_format=FSG_MONEY_FORMAT,
+        ),
+    ]
+
+
+# Model loaded by a worker process
+_worker_metadata = None
+
+
+def _init_worker(data):
+    """
+    Loads the model serialized by the main process in a worker process,
+    instead of reading the files of the cost report again.
+    """
+    global _worker_metadata
+    _worker_metadata = serialization.loads(data)
+
+
+def _write_fsg_shard(basepath, write_only, layout, filename, label, pns):
+    for system in _worker_metadata.systems:
+        if system.label == label:
+            break
+    else:
+        raise ValueError("Unknown system: %s" % label)
+
+    writer = FSGBOMWriter(write_only, layout=layout)
+    return writer.write_shard(basepath, _worker_metadata, filename, system, pns)
+
+
+def _count_bytes_written(writer, filepath):
+    metrics.inc(
+        "bytes_written", os.path.getsize(filepath), writer=type(writer).__name__
+    )
+
+
+def _find_duplicates(metadata):
+    """
+    Finds the drawings and pictures having the same content as a previous
+    one, in the order of the document.
+    Returns a :class:`dict` where the keys are the paths of the duplicate
+    files and the values, a tuple of the label, name and P/N of the
+    first occurrence.
+    """
+    duplicates = {}
+
+    for attr, prefix in [("drawings", "dwg"), ("pictures", "img")]:
+        originals = {}
+
+        for system in metadata.systems:
+            for component in system.iter_hierarchy():
+                for index, filepath in enumerate(getattr(component, attr)):
+                    digest = get_digest(filepath)
+
+                    if digest in originals:
+                        duplicates[filepath] = originals[digest]
+                    else:
+                        label = "%s:%s-%i" % (prefix, component.pn, index)
+                        originals[digest] = (label, component.name, component.pn)
+
+    return duplicates
+
+
+def _create_duplicate_lines(prefix, component, index, filepath, duplicates):
+    """
+    Creates the cross-reference replacing a duplicate drawing (*prefix*
+    ``dwg``) or picture (``img``), or returns an empty list if the file is
+    not a duplicate (see :func:`_find_duplicates`).
+    The label of the duplicate is kept, so references to it remain valid.
+    """
+    if filepath not in duplicates:
+        return []
+
+    label = "%s:%s-%i" % (prefix, component.pn, index)
+    original_label, original_name, original_pn = duplicates[filepath]
+
+    return [
+        r"\noindent\phantomsection\label{%s}%s (%s): same as %s (%s), page \pageref{%s}.\par"
+        % (
+            label,
+            e(component.name),
+            component.pn,
+            e(original_name),
+            original_pn,
+            original_label,
+        )
+    ]
+
+
+def _get_picture_path(system, picture, pictures):
+    """
+    Returns the path of a picture relative to the base path, using its
+    processed version if available.
+    """
+    if picture in pictures:
+        return pictures[picture]
+    return posixpath.join(system.label, PICTURES_DIR, os.path.basename(picture))
+
+
+BOM_TABLESPEC = r"p{13em} | p{3em} | p{2em} | p{10em} | p{7em} | p{2em} | p{4.5em} | p{4.5em} | p{5em} | p{5em} | p{5em}"
+
+
+def _is_group_row(row):
+    # assembly rows and system headings introduce the rows following them
+    return row[0].startswith(r"\hline\rowcolor") or row[0].startswith(r"\multicolumn")
+
+
+def _compute_chunks(rows, header_endrow, size):
+    """
+    Returns the indexes of the rows starting a new chunk, so that each chunk
+    has at most *size* rows after the header.
+    A chunk never ends with an assembly row or a system heading, which
+    would be separated from the rows it introduces.
+    """
+    if size < 2:
+        raise ValueError("Chunk size must be at least 2")
+
+    chunks = []
+    start = header_endrow
+
+    while len(rows) - start > size:
+        end = start + size
+        while end - 1 > start and _is_group_row(rows[end - 1]):
+            end -= 1
+
+        chunks.append(end)
+        start = end
+
+    return chunks
+
+
+def _create_bom_tabular(data, chunk_size=None):
+    if chunk_size is None:
+        return create_tabular(
+            data,
+            environment="longtable",
+            tableparameters="l",
+            tablespec=BOM_TABLESPEC,
+            format_before_tabular=r"\rowcolor[gray]{0}",
+            format_after_header=r"\hline\endhead",
+            format_between_rows=r"\hline",
+            header_endrow=1,
+        )
+
+    # fixed width tabulars are laid out in one pass, unlike longtables
+    return create_tabular(
+        data,
+        environment="tabular",
+        tablespec=BOM_TABLESPEC,
+        format_before_tabular=r"\rowcolor[gray]{0}",
+        format_after_header=r"\hline",
+        format_between_rows=r"\hline",
+        header_endrow=1,
+        chunks=_compute_chunks(data, 1, chunk_size),
+        format_between_chunks=r"\newpage\noindent",
+    )
+
+
 def _create_bom_row(component):
     if len(component.drawings) == 1:
         drawings = r"\pageref{dwg:%s-0}" % component.pn
@@ -116,20 +304,109 @@ def _create_bom_row(component):
 
 
 class CostReportLaTeXWriter(object):
+    def __init__(
+        self,
+        chart_format="pdf",
+        system_charts=False,
+        picture_dpi=None,
+        split=False,
+        include_only=None,
+        chunk_size=None,
+        render_charts=True,
+        reuse_chapters=False,
+    ):
+        r"""
+        Creates a writer of the cost report.
+
+        :arg chart_format: format of the charts, ``pdf`` or ``png``
+            (rasterized, faster to include)
+        :arg system_charts: whether to add the cost breakdown charts of
+            each system after the cost summary
+        :arg picture_dpi: if not ``None``, the pictures are downscaled to
+            this resolution in the build folder and the processed pictures
+            are included instead of the originals
+        :arg split: if ``True``, each system chapter is written in its own
+            file and included in the main document with ``\include``
+        :arg include_only: labels of the systems to compile, written in an
+            ``\includeonly`` command (implies *split*); the page references
+            to the other systems are taken from their previous ``.aux`` files
+        :arg chunk_size: if not ``None``, the BOM and SAE common parts tables
+            are split in ``tabular`` environments of at most this number of
+            rows instead of one ``longtable``
+        :arg render_charts: if ``False``, the charts are only referenced and
+            must be rendered separately (see :mod:`fsaecostreport.graph`)
+        :arg reuse_chapters: if ``True``, the system chapters are kept
+            between calls of :meth:`write` and only the ones discarded with
+            :meth:`invalidate` are written again
+        """
+        self.chart_format = chart_format
+        self.system_charts = system_charts
+        self.picture_dpi = picture_dpi
+        self.split = split or include_only is not None
+        self.include_only = include_only
+        self.chunk_size = chunk_size
+        self.render_charts = render_charts
+        self.reuse_chapters = reuse_chapters
+        self._pictures = {}
+        self._duplicates = {}
+        self._chapters = {}
+        self._system_lines = {}
+
+    def invalidate(self, labels=None):
+        """
+        Discards the kept chapters of the systems of *labels* (default: all),
+        e.g. after their components were read again.
+        """
+        if labels is None:
+            self._system_lines.clear()
+            return
+
+        for label in labels:
+            self._system_lines.pop(label, None)
+
     def write(self, basepath, metadata):
         lines = self._write(basepath, metadata)
 
-        filename = metadata.filename + ".tex"
-        with open(os.path.join(basepath, filename), "w") as out:
+        filepath = os.path.join(basepath, metadata.filename + ".tex")
+        with open(filepath, "w") as out:
             for line in lines:
                 out.write(line + "\n")
+        _count_bytes_written(self, filepath)
+
+        for name, chapter_lines in self._chapters.items():
+            filepath = os.path.join(basepath, name + ".tex")
+            content = "".join(line + "\n" for line in chapter_lines)
+
+            # unchanged chapters are not rewritten to keep their timestamp
+            if os.path.exists(filepath):
+                with open(filepath, "r") as fp:
+                    if fp.read() == content:
+                        continue
+
+            with open(filepath, "w") as out:
+                out.write(content)
+            _count_bytes_written(self, filepath)
 
     def _write(self, basepath, metadata):
+        # a duplicate may refer to a file of another system
+        duplicates = _find_duplicates(metadata)
+        if duplicates != self._duplicates:
+            self.invalidate()
+        self._duplicates = duplicates
+        self._chapters = {}
+
+        if self.picture_dpi is not None:
+            self._pictures = prepare_pictures(basepath, metadata, self.picture_dpi)
+
         lines = []
 
         lines += self.write_header(metadata)
         lines += [""]
 
+        if self.include_only is not None:
+            lines += self.write_includeonly(metadata)
+            lines += [""]
+
         lines += [r"\begin{document}"]
         lines += [""]
 
@@ -254,6 +531,10 @@ class CostReportLaTeXWriter(object):
         lines += self.write_cost_summary(basepath, metadata)
         lines += [r"\newpage", ""]
 
+        if self.system_charts:
+            lines += self.write_system_charts(basepath, metadata)
+            lines += [r"\newpage", ""]
+
         lines += self.write_standard_partnumbering(basepath)
         lines += [r"\newpage", ""]
 
@@ -298,9 +579,11 @@ class CostReportLaTeXWriter(object):
         lines += [r"\renewcommand{\arraystretch}{1}"]
         lines += [r"\newpage"]
 
-        self._create_cost_summary_chart(basepath, metadata)
+        path = self._create_cost_summary_chart(basepath, metadata)
         lines += [r"\begin{center}"]
-        lines += [r"\includegraphics[height=0.8\textheight]{cost_summary}"]
+        lines += [
+            r"\includegraphics[height=0.8\textheight]{%s}" % os.path.basename(path)
+        ]
         lines += [r"\end{center}"]
 
         return lines
@@ -372,7 +655,29 @@ class CostReportLaTeXWriter(object):
         return rows
 
     def _create_cost_summary_chart(self, basepath, metadata):
-        graph.cost_summary(basepath, metadata)
+        return graph.cost_summary(
+            basepath, metadata, self.chart_format, render=self.render_charts
+        )
+
+    def write_system_charts(self, basepath, metadata):
+        lines = []
+
+        lines += [r"\section{Cost Breakdown}"]
+
+        paths = graph.system_charts(
+            basepath, metadata, self.chart_format, render=self.render_charts
+        )
+        for system in metadata.systems:
+            lines += [r"\subsection{%s}" % e(system.name)]
+
+            for path in paths[system]:
+                path = posixpath.join(CHARTS_DIR, os.path.basename(path))
+                lines += [r"\begin{center}"]
+                lines += [r"\includegraphics[height=0.8\textheight]{%s}" % path]
+                lines += [r"\end{center}"]
+                lines += [r"\newpage"]
+
+        return lines
 
     def write_standard_partnumbering(self, basepath):
         lines = []
@@ -395,16 +700,7 @@ class CostReportLaTeXWriter(object):
         lines += [r"\renewcommand{\arraystretch}{1.1}"]
 
         data = self._write_sae_parts_bom_rows(metadata)
-        lines += create_tabular(
-            data,
-            environment="longtable",
-            tableparameters="l",
-            tablespec=r"p{13em} | p{3em} | p{2em} | p{10em} | p{7em} | p{2em} | p{4.5em} | p{4.5em} | p{5em} | p{5em} | p{5em}",
-            format_before_tabular=r"\rowcolor[gray]{0}",
-            format_after_header=r"\hline\endhead",
-            format_between_rows=r"\hline",
-            header_endrow=1,
-        )
+        lines += _create_bom_tabular(data, self.chunk_size)
 
         lines += [r"\renewcommand{\arraystretch}{1}"]
 
@@ -461,15 +757,43 @@ class CostReportLaTeXWriter(object):
 
         return lines
 
+    def write_includeonly(self, metadata):
+        names = []
+        for system in metadata.systems:
+            if system.label in self.include_only:
+                names.append(self._get_chapter_name(metadata, system))
+
+        return [r"\includeonly{%s}" % ",".join(names)]
+
+    def _get_chapter_name(self, metadata, system):
+        # \include does not support spaces in file names
+        return "%s_%s" % (metadata.filename.replace(" ", "_"), system.label)
+
     def write_systems(self, metadata):
         lines = []
 
         for system in metadata.systems:
-            lines += SystemLaTeXWriter().write(system)
-            lines += [""]
+            system_lines = self._system_lines.get(system.label)
+            if system_lines is None:
+                system_lines = self.write_system(system)
+                if self.reuse_chapters:
+                    self._system_lines[system.label] = system_lines
+
+            if self.split:
+                name = self._get_chapter_name(metadata, system)
+                self._chapters[name] = system_lines
+                lines += [r"\include{%s}" % name]
+            else:
+                lines += system_lines
+                lines += [""]
 
         return lines
 
+    def write_system(self, system):
+        return SystemLaTeXWriter(
+            self._pictures, self._duplicates, self.chunk_size
+        ).write(system)
+
     def write_backmatter(self):
         lines = []
 
@@ -481,6 +805,22 @@ class CostReportLaTeXWriter(object):
 
 
 class SystemLaTeXWriter(object):
+    def __init__(self, pictures=None, duplicates=None, chunk_size=None):
+        """
+        Creates a writer of a system chapter.
+
+        :arg pictures: paths of processed pictures to include instead of the
+            source pictures (see :func:`fsaecostreport.picture.prepare_pictures`)
+        :arg duplicates: drawings and pictures which are replaced by a
+            cross-reference to the first file with the same content
+            (see :func:`_find_duplicates`)
+        :arg chunk_size: maximum number of rows of each ``tabular`` of the
+            BOM, or ``None`` to write the BOM in one ``longtable``
+        """
+        self.pictures = pictures or {}
+        self.duplicates = duplicates or {}
+        self.chunk_size = chunk_size
+
     def write(self, system):
         hierarchy = system.get_hierarchy()
 
@@ -514,16 +854,7 @@ class SystemLaTeXWriter(object):
         lines += [r"\renewcommand{\arraystretch}{1.1}"]
 
         data = self._create_bom_lines(system, hierarchy)
-        lines += create_tabular(
-            data,
-            environment="longtable",
-            tableparameters="l",
-            tablespec=r"p{13em} | p{3em} | p{2em} | p{10em} | p{7em} | p{2em} | p{4.5em} | p{4.5em} | p{5em} | p{5em} | p{5em}",
-            format_before_tabular=r"\rowcolor[gray]{0}",
-            format_after_header=r"\hline\endhead",
-            format_between_rows=r"\hline",
-            header_endrow=1,
-        )
+        lines += _create_bom_tabular(data, self.chunk_size)
 
         lines += [r"\renewcommand{\arraystretch}{1}"]
 
@@ -579,6 +910,13 @@ class SystemLaTeXWriter(object):
             pn = component.pn
 
             for index, drawing in enumerate(component.drawings):
+                duplicate = _create_duplicate_lines(
+                    "dwg", component, index, drawing, self.duplicates
+                )
+                if duplicate:
+                    lines += duplicate
+                    continue
+
                 path = posixpath.join(
                     system.label, DRAWINGS_DIR, os.path.basename(drawing)
                 )
@@ -600,9 +938,14 @@ class SystemLaTeXWriter(object):
             pn = component.pn
 
             for index, picture in enumerate(component.pictures):
-                path = posixpath.join(
-                    system.label, PICTURES_DIR, os.path.basename(picture)
+                duplicate = _create_duplicate_lines(
+                    "img", component, index, picture, self.duplicates
                 )
+                if duplicate:
+                    lines += duplicate
+                    continue
+
+                path = _get_picture_path(system, picture, self.pictures)
                 lines += [r"\subsection{%s (%s)}" % (name, pn)]
                 lines += [r"\label{img:%s-%i}" % (pn, index)]
                 lines += [r"\begin{center}"]
@@ -995,35 +1338,142 @@ class PartLaTeXWriter(_ComponentLaTeXWriter):
 
 
 class eBOMWriter(object):
+    def __init__(self, estimate_pages=False, chunk_size=None, reuse_rows=False):
+        """
+        Creates a writer of the eBOM.
+
+        :arg estimate_pages: whether to estimate the page of the cost tables
+            missing from the ``.aux`` file, so the eBOM can be written
+            before the cost report is compiled
+            (see :class:`fsaecostreport.layout.PageEstimator`)
+        :arg chunk_size: BOM chunk size of the cost report, used by the
+            estimation
+        :arg reuse_rows: if ``True``, the rows and totals of the systems are
+            kept between calls of :meth:`write` and only the ones discarded
+            with :meth:`invalidate`, or whose page references changed, are
+            computed again
+        """
+        self.estimate_pages = estimate_pages
+        self.chunk_size = chunk_size
+        self.reuse_rows = reuse_rows
+        self._system_rows = {}
+        self._pagerefs = None
+
+    def invalidate(self, labels=None):
+        """
+        Discards the kept rows of the systems of *labels* (default: all),
+        e.g. after their components were read again.
+        """
+        if labels is None:
+            self._system_rows.clear()
+            return
+
+        for label in labels:
+            self._system_rows.pop(label, None)
+
     def write(self, basepath, metadata):
-        pagerefs = AuxReader().read(basepath)
+        pagerefs = self._read_pagerefs(basepath, metadata)
 
         filepath = os.path.join(basepath, metadata.filename + ".csv")
-        writer = csv.writer(open(filepath, "w"))
+        with open(filepath, "w", newline="") as fp:
+            writer = csv.writer(fp)
+            writer.writerows(self._iter_rows(metadata, pagerefs))
+        _count_bytes_written(self, filepath)
+
+    def _read_pagerefs(self, basepath, metadata):
+        index = IndexedAuxReader().read(basepath)
+        if not self.estimate_pages:
+            return index.get_pagerefs("ct")
 
-        rows = self._create_rows(metadata, pagerefs)
-        for row in rows:
-            writer.writerow(row)
+        duplicates = _find_duplicates(metadata)
+        estimate = PageEstimator(duplicates, self.chunk_size).estimate(metadata)
+        return reconcile(estimate, index)
 
     def _create_rows(self, metadata, pagerefs):
-        rows = []
+        return list(self._iter_rows(metadata, pagerefs))
+
+    def _compute_totals(self, system):
+        """
+        Returns the materials, processes, fasteners, toolings and total cost
+        of a system.
+        """
+        with tracing.span("roll-up", "rollup", system=system.label):
+            materials_totalcost = 0.0
+            processes_totalcost = 0.0
+            fasteners_totalcost = 0.0
+            toolings_totalcost = 0.0
+            system_totalcost = 0.0
 
-        # spreadsheet header
-        row = ["Competition Code", "FSAEM"] + [""] * 13
-        rows.append(row)
+            for component in system.get_components():
+                quantity = component.quantity
 
-        row = ["Year", str(metadata.year)[2:]] + [""] * 13
-        rows.append(row)
+                materials_totalcost += (
+                    sum(map(SUBTOTAL, component.materials)) * quantity
+                )
+                processes_totalcost += (
+                    sum(map(SUBTOTAL, component.processes)) * quantity
+                )
+                fasteners_totalcost += (
+                    sum(map(SUBTOTAL, component.fasteners)) * quantity
+                )
+                toolings_totalcost += sum(map(SUBTOTAL, component.toolings)) * quantity
 
-        row = ["Car #", str(metadata.car_number).zfill(3)] + [""] * 13
-        rows.append(row)
+                # use tablecost instead of unitcost not to include the cost of parts
+                system_totalcost += component.tablecost * quantity
+
+            return (
+                materials_totalcost,
+                processes_totalcost,
+                fasteners_totalcost,
+                toolings_totalcost,
+                system_totalcost,
+            )
+
+    def _iter_rows(self, metadata, pagerefs):
+        """
+        Yields the rows of the eBOM.
+        The totals are computed beforehand, so that the rows of the
+        components can be streamed to the output.
+        """
+        # the page references change when the cost report is compiled again
+        if pagerefs != self._pagerefs:
+            self._system_rows.clear()
+            self._pagerefs = pagerefs
+
+        totals = {}
+        vehicle_totals = [0.0] * 5
+        for system in metadata.systems:
+            if system.label in self._system_rows:
+                totals[system] = self._system_rows[system.label][0]
+            else:
+                totals[system] = self._compute_totals(system)
+            vehicle_totals = list(map(operator.add, vehicle_totals, totals[system]))
+
+        (
+            materials_totalcost,
+            processes_totalcost,
+            fasteners_totalcost,
+            toolings_totalcost,
+            systems_totalcost,
+        ) = vehicle_totals
+
+        # top row
+        yield (
+            ["University", metadata.university]
+            + [""] * 10
+            + ["Total Vehicle Cost", "", systems_totalcost]
+        )
+
+        # spreadsheet header
+        yield ["Competition Code", "FSAEM"] + [""] * 13
+        yield ["Year", str(metadata.year)[2:]] + [""] * 13
+        yield ["Car #", str(metadata.car_number).zfill(3)] + [""] * 13
 
         # empty row
-        row = [""] * 15
-        rows.append(row)
+        yield [""] * 15
 
         # table header
-        header = [
+        yield [
             "Line Num.",
             "Area of Commodity",
             "Asm/Prt #",
@@ -1040,42 +1490,20 @@ class eBOMWriter(object):
             "Total Cost",
             "Details Page Number",
         ]
-        rows.append(header)
-
-        materials_totalcost = 0.0
-        processes_totalcost = 0.0
-        fasteners_totalcost = 0.0
-        toolings_totalcost = 0.0
-        systems_totalcost = 0.0
 
         for system in metadata.systems:
-            (
-                system_rows,
-                materials_cost,
-                processes_cost,
-                fasteners_cost,
-                toolings_cost,
-                system_cost,
-            ) = self._create_system_rows(system, pagerefs)
+            if system.label in self._system_rows:
+                yield from self._system_rows[system.label][1]
+                continue
 
-            rows.extend(system_rows)
-
-            materials_totalcost += materials_cost
-            processes_totalcost += processes_cost
-            fasteners_totalcost += fasteners_cost
-            toolings_totalcost += toolings_cost
-            systems_totalcost += system_cost
-
-        # add top row since the vehicle cost is now known
-        row = (
-            ["University", metadata.university]
-            + [""] * 10
-            + ["Total Vehicle Cost", "", systems_totalcost]
-        )
-        rows.insert(0, row)
+            rows = self._iter_system_rows(system, pagerefs, totals[system])
+            if self.reuse_rows:
+                rows = list(rows)
+                self._system_rows[system.label] = (totals[system], rows)
+            yield from rows
 
         # vehicle total row
-        row = [
+        yield [
             "",
             "Vehicle Total",
             "",
@@ -1092,43 +1520,18 @@ class eBOMWriter(object):
             systems_totalcost,
             "",
         ]
-        rows.append(row)
 
-        return rows
-
-    def _create_system_rows(self, system, pagerefs):
-        rows = []
-
-        materials_totalcost = 0.0
-        processes_totalcost = 0.0
-        fasteners_totalcost = 0.0
-        toolings_totalcost = 0.0
-        system_totalcost = 0.0
-
-        for line_num, component in enumerate(system.get_hierarchy()):
+    def _iter_system_rows(self, system, pagerefs, totals):
+        for line_num, component in enumerate(system.iter_hierarchy()):
             # use tablecost instead of unitcost not to include the cost of parts
             unitcost = component.tablecost
             quantity = component.quantity
             totalcost = unitcost * quantity
 
-            materials_cost = sum(map(SUBTOTAL, component.materials))
-            materials_totalcost += materials_cost * quantity
-
-            processes_cost = sum(map(SUBTOTAL, component.processes))
-            processes_totalcost += processes_cost * quantity
-
-            fasteners_cost = sum(map(SUBTOTAL, component.fasteners))
-            fasteners_totalcost += fasteners_cost * quantity
-
-            toolings_cost = sum(map(SUBTOTAL, component.toolings))
-            toolings_totalcost += toolings_cost * quantity
-
-            system_totalcost += totalcost
-
             names = [e(capitalize(parent.name)) for parent in component.parents]
             assembly = humanjoin(names, andchr=r"\&")
 
-            row = [
+            yield [
                 line_num + 1,
                 str(system),
                 component.pn_base,
@@ -1138,17 +1541,16 @@ class eBOMWriter(object):
                 capitalize(component.details),
                 unitcost,
                 quantity,
-                materials_cost,
-                processes_cost,
-                fasteners_cost,
-                toolings_cost,
+                sum(map(SUBTOTAL, component.materials)),
+                sum(map(SUBTOTAL, component.processes)),
+                sum(map(SUBTOTAL, component.fasteners)),
+                sum(map(SUBTOTAL, component.toolings)),
                 totalcost,
                 pagerefs.get(component.pn, ""),
             ]
-            rows.append(row)
 
         # area total row
-        row = [
+        yield [
             "",
             str(system),
             "",
@@ -1158,355 +1560,626 @@ class eBOMWriter(object):
             "",
             "",
             "",
-            materials_totalcost,
-            processes_totalcost,
-            fasteners_totalcost,
-            toolings_totalcost,
-            system_totalcost,
-            "",
-        ]
-        rows.append(row)
+        ] + list(
+            totals
+        ) + [""]
 
-        return (
-            rows,
-            materials_totalcost,
-            processes_totalcost,
-            fasteners_totalcost,
-            toolings_totalcost,
-            system_totalcost,
-        )
+
+class eBOMXLSXWriter(eBOMWriter):
+    """
+    Writes the eBOM as an Excel workbook.
+    The rows are streamed to a write-only workbook.
+    """
+
+    def write(self, basepath, metadata):
+        from openpyxl import Workbook
+
+        pagerefs = self._read_pagerefs(basepath, metadata)
+
+        wb = Workbook(write_only=True)
+        sheet = wb.create_sheet(title="eBOM")
+
+        for row in self._iter_rows(metadata, pagerefs):
+            sheet.append(row)
+
+        # suffix not to overwrite the workbook of the FSGBOMWriter
+        filepath = os.path.join(basepath, metadata.filename + "_eBOM.xlsx")
+        wb.save(filepath)
+        _count_bytes_written(self, filepath)
 
 
 class FSGBOMWriter(object):
+    def __init__(
+        self, write_only=False, shard=None, processes=None, index=True, layout="sheets"
+    ):
+        """
+        Creates a writer of the FSG cost tables workbook.
+
+        :arg write_only: if ``True``, the workbook is created in openpyxl's
+            write-only mode: rows are streamed to disk as they are appended,
+            so memory use stays constant per sheet
+        :arg shard: if ``None``, all cost tables are written in one workbook;
+            if ``"system"``, one workbook is written per system;
+            if an integer *N*, one workbook is written per *N* components
+            of a system
+        :arg processes: number of worker processes used to write the shards
+            (default: number of CPUs)
+        :arg index: whether to write an index workbook linking the cost
+            tables of all shards (only used when *shard* is specified)
+        :arg layout: if ``"sheets"``, each cost table is written in its own
+            sheet; if ``"compact"``, the cost tables of a system are stacked
+            in one sheet and linked from a summary sheet
+        """
+        if shard is not None and shard != "system":
+            if not str(shard).isdigit() or int(shard) < 1:
+                raise ValueError("Invalid shard: %s" % shard)
+        if layout not in ("sheets", "compact"):
+            raise ValueError("Unknown layout: %s" % layout)
+
+        self.write_only = write_only
+        self.shard = shard
+        self.processes = processes
+        self.index = index
+        self.layout = layout
+        self._last_rows = {}
+
+        # openpyxl classes used for each cell, imported with the workbook
+        self._Cell = None
+        self._WriteOnlyCell = None
+        self._Hyperlink = None
+
     def write(self, basepath, metadata):
-        wb = Workbook()
+        if self.shard is not None:
+            self.write_shards(basepath, metadata)
+            return
+
+        wb = self._create_workbook()
 
         # create cost tables
         for system in metadata.systems:
             self.write_system(wb, system, metadata)
 
-        # remove first sheet
-        wb.remove(wb.worksheets[0])
+        filepath = os.path.join(basepath, metadata.filename + ".xlsx")
+        wb.save(filepath)
+        _count_bytes_written(self, filepath)
+
+        self._last_rows.clear()
+
+    def write_shards(self, basepath, metadata):
+        """
+        Writes the cost tables in several workbooks, in parallel.
+        The model is passed to the worker processes in its flat serialization
+        (see :mod:`fsaecostreport.serialization`), since the components
+        cannot be pickled.
+        Returns the filenames of the shards.
+        """
+        shards = self._create_shards(metadata)
+        anchors = []
+
+        if self.processes == 1:
+            for filename, system, pns in shards:
+                anchors.append(
+                    self.write_shard(basepath, metadata, filename, system, pns)
+                )
+        else:
+            with ProcessPoolExecutor(
+                self.processes,
+                initializer=_init_worker,
+                initargs=(serialization.dumps(metadata),),
+            ) as executor:
+                futures = [
+                    executor.submit(
+                        metrics.call_counted,
+                        _write_fsg_shard,
+                        basepath,
+                        self.write_only,
+                        self.layout,
+                        filename,
+                        system.label,
+                        pns,
+                    )
+                    for filename, system, pns in shards
+                ]
+                for future in futures:
+                    # re-raise exception of worker
+                    shard_anchors, recorded = future.result()
+                    anchors.append(shard_anchors)
+                    metrics.registry.update(recorded)
 
-        filename = metadata.filename + ".xlsx"
-        wb.save(os.path.join(basepath, filename))
+        if self.index:
+            self.write_index(basepath, metadata, shards, anchors)
 
-    def write_system(self, wb, system, metadata):
-        hierarchy = system.get_hierarchy()
+        return [filename for filename, _system, _pns in shards]
 
-        for component in hierarchy:
-            sheet = wb.create_sheet(title=component.partnumber)
-
-            if isinstance(component, Part):
-                self.write_costtable_part(sheet, component, system, metadata)
-            elif isinstance(component, Assembly):
-                self.write_costtable_assembly(sheet, component, system, metadata)
-
-            sheet.column_dimensions["A"].width = 30
-            sheet.column_dimensions["B"].width = 30
-            sheet.column_dimensions["C"].width = 12
-            sheet.column_dimensions["D"].width = 12
-            sheet.column_dimensions["E"].width = 12
-            sheet.column_dimensions["F"].width = 12
-            sheet.column_dimensions["G"].width = 12
-            sheet.column_dimensions["H"].width = 12
-
-    def write_costtable_part(self, sheet, component, system, metadata):
-        row = self.write_header_part(sheet, component, system, metadata)
-        row = self.write_table_materials(sheet, component, row) + 1
-        row = self.write_table_processes(sheet, component, row) + 1
-        row = self.write_table_fasteners(sheet, component, row) + 1
-        row = self.write_table_toolings(sheet, component, row) + 1
+    def write_shard(self, basepath, metadata, filename, system, pns):
+        """
+        Writes the cost tables of the components *pns* of a system in a
+        workbook.
+        Returns the anchors of the cost tables (see :meth:`write_components`).
+        """
+        wb = self._create_workbook()
 
-    def write_costtable_assembly(self, sheet, component, system, metadata):
-        row = self.write_header_assembly(sheet, component, system, metadata)
-        row = self.write_table_parts(sheet, component, row) + 1
-        row = self.write_table_materials(sheet, component, row) + 1
-        row = self.write_table_processes(sheet, component, row) + 1
-        row = self.write_table_fasteners(sheet, component, row) + 1
-        row = self.write_table_toolings(sheet, component, row) + 1
+        components = [system.get_component(pn) for pn in pns]
+        anchors = self.write_components(wb, components, system, metadata)
+
+        filepath = os.path.join(basepath, filename)
+        wb.save(filepath)
+        _count_bytes_written(self, filepath)
+
+        self._last_rows.clear()
 
-    def _set_header_cell(self, cell, value):
-        cell.value = value
-        cell.font = Font(bold=True)
-        cell.fill = PatternFill(bgColor=Color("FFC0C0C0"))
+        return anchors
 
-    def _set_money_cell(self, cell, value):
-        cell.value = value
-        cell.number_format = "#,##0.00$"
+    def _create_shards(self, metadata):
+        shards = []
 
-    def write_header_part(self, sheet, component, system, metadata):
-        self._set_header_cell(sheet["A1"], "University")
-        sheet["B1"].value = metadata.university
+        for system in metadata.systems:
+            pns = [component.pn for component in system.get_hierarchy()]
+            basename = "%s_%s" % (metadata.filename, system.label)
+
+            if self.shard == "system":
+                shards.append((basename + ".xlsx", system, pns))
+            else:
+                size = int(self.shard)
+                for index, start in enumerate(range(0, len(pns), size)):
+                    filename = "%s_%03i.xlsx" % (basename, index + 1)
+                    shards.append((filename, system, pns[start : start + size]))
+
+        return shards
+
+    def write_index(self, basepath, metadata, shards, anchors):
+        wb = self._create_workbook()
+        sheet = wb.create_sheet(title="Index")
+        sheet.column_dimensions["A"].width = 30
+        sheet.column_dimensions["B"].width = 15
+        sheet.column_dimensions["C"].width = 30
+        sheet.column_dimensions["D"].width = 50
 
-        self._set_header_cell(sheet["D1"], "Car #")
-        sheet["E1"].value = metadata.car_number
+        h = functools.partial(self._header_cell, sheet)
+        rows = [[h("System"), h("P/N"), h("Name"), h("Workbook")]]
 
-        self._set_header_cell(sheet["A2"], "System")
-        sheet["B2"].value = system.name
+        for (filename, system, _pns), shard_anchors in zip(shards, anchors):
+            for pn, title, row in shard_anchors:
+                component = system.get_component(pn)
 
-        self._set_header_cell(sheet["A3"], "Assembly")
-        sheet["B3"].value = ", ".join(assembly.name for assembly in component.parents)
+                link = self._cell(sheet, filename)
+                link.hyperlink = "%s#'%s'!A%i" % (filename, title, row)
 
-        self._set_header_cell(sheet["A4"], "Part")
-        sheet["B4"].value = component.name
+                rows.append([system.name, pn, component.name, link])
 
-        self._set_header_cell(sheet["A5"], "P/N Base")
-        sheet["B5"].value = component.pn_base
+        self._append_rows(sheet, 1, rows)
 
-        self._set_header_cell(sheet["A6"], "Suffix")
-        sheet["B6"].value = component.revision
+        filepath = os.path.join(basepath, metadata.filename + ".xlsx")
+        wb.save(filepath)
+        _count_bytes_written(self, filepath)
 
-        self._set_header_cell(sheet["A7"], "Details")
-        sheet["B7"].value = component.details
+        self._last_rows.clear()
 
-        self._set_header_cell(sheet["G1"], "Unit cost")
-        self._set_money_cell(sheet["H1"], component.unitcost)
+    def _create_workbook(self):
+        from openpyxl import Workbook
+        from openpyxl.cell import Cell, WriteOnlyCell
+        from openpyxl.worksheet.hyperlink import Hyperlink
 
-        self._set_header_cell(sheet["G2"], "Quantity")
-        sheet["H2"].value = component.quantity
+        self._Cell = Cell
+        self._WriteOnlyCell = WriteOnlyCell
+        self._Hyperlink = Hyperlink
 
-        self._set_header_cell(sheet["G4"], "Total cost")
-        self._set_money_cell(sheet["H4"], component.unitcost * component.quantity)
+        wb = Workbook(write_only=self.write_only)
 
-        return 10
+        # remove first sheet (write-only workbooks are created without sheets)
+        if not self.write_only:
+            wb.remove(wb.worksheets[0])
 
-    def write_header_assembly(self, sheet, component, system, metadata):
-        self._set_header_cell(sheet["A1"], "University")
-        sheet["B1"].value = metadata.university
+        # styles are registered once and shared by all cells of the workbook
+        for style in _create_fsg_styles():
+            wb.add_named_style(style)
 
-        self._set_header_cell(sheet["D1"], "Car #")
-        sheet["E1"].value = metadata.car_number
+        return wb
 
-        self._set_header_cell(sheet["A2"], "System")
-        sheet["B2"].value = system.name
+    def _create_sheet(self, wb, title):
+        sheet = wb.create_sheet(title=title)
 
-        self._set_header_cell(sheet["A3"], "Assembly")
-        sheet["B3"].value = component.name
+        # column widths must be set before any row is written in write-only mode
+        sheet.column_dimensions["A"].width = 30
+        sheet.column_dimensions["B"].width = 30
+        sheet.column_dimensions["C"].width = 12
+        sheet.column_dimensions["D"].width = 12
+        sheet.column_dimensions["E"].width = 12
+        sheet.column_dimensions["F"].width = 12
+        sheet.column_dimensions["G"].width = 12
+        sheet.column_dimensions["H"].width = 12
+
+        return sheet
+
+    def write_system(self, wb, system, metadata):
+        hierarchy = system.get_hierarchy()
+        self.write_components(wb, hierarchy, system, metadata)
 
-        self._set_header_cell(sheet["A4"], "P/N Base")
-        sheet["B4"].value = component.pn_base
+    def write_components(self, wb, components, system, metadata):
+        """
+        Writes the cost tables of the *components* of a system.
+        Returns the anchors of the cost tables, a list of tuples
+        (P/N, sheet title, row).
+        """
+        if self.layout == "compact":
+            return self._write_components_compact(wb, components, system, metadata)
 
-        self._set_header_cell(sheet["A5"], "Suffix")
-        sheet["B5"].value = component.revision
+        anchors = []
 
-        self._set_header_cell(sheet["A6"], "Details")
-        sheet["B6"].value = component.details
+        for component in components:
+            sheet = self._create_sheet(wb, component.partnumber)
+            self.write_costtable(sheet, component, system, metadata)
+            anchors.append((component.pn, sheet.title, 1))
 
-        self._set_header_cell(sheet["G1"], "Unit cost")
-        self._set_money_cell(sheet["H1"], component.unitcost)
+        return anchors
 
-        self._set_header_cell(sheet["G2"], "Table cost")
-        self._set_money_cell(sheet["H2"], component.tablecost)
+    def _write_components_compact(self, wb, components, system, metadata):
+        summary = self._get_summary_sheet(wb)
+        sheet = self._create_sheet(wb, system.label)
 
-        self._set_header_cell(sheet["G3"], "Quantity")
-        sheet["H3"].value = component.quantity
+        anchors = []
+        row = 1
 
-        self._set_header_cell(sheet["G4"], "Total cost")
-        self._set_money_cell(sheet["H4"], component.unitcost * component.quantity)
+        for component in components:
+            anchors.append((component.pn, sheet.title, row))
 
-        return 9
+            values = self._create_summary_row(summary, component, system, sheet, row)
+            self._append_rows(summary, self._last_rows[summary] + 1, [values])
+
+            row = self.write_costtable(sheet, component, system, metadata, row) + 1
+
+        return anchors
+
+    def _get_summary_sheet(self, wb):
+        if FSG_SUMMARY_TITLE in wb.sheetnames:
+            return wb[FSG_SUMMARY_TITLE]
+
+        sheet = wb.create_sheet(title=FSG_SUMMARY_TITLE, index=0)
+        sheet.column_dimensions["A"].width = 30
+        sheet.column_dimensions["B"].width = 15
+        sheet.column_dimensions["C"].width = 30
+        sheet.column_dimensions["D"].width = 12
+        sheet.column_dimensions["E"].width = 12
+        sheet.column_dimensions["F"].width = 12
+
+        h = functools.partial(self._header_cell, sheet)
+        header = [
+            h("System"),
+            h("P/N"),
+            h("Name"),
+            h("Unit cost"),
+            h("Quantity"),
+            h("Total cost"),
+        ]
+        self._append_rows(sheet, 1, [header])
+
+        return sheet
+
+    def _create_summary_row(self, summary, component, system, sheet, row):
+        money = functools.partial(self._money_cell, summary)
+
+        link = self._cell(summary, component.pn)
+        link.hyperlink = self._Hyperlink(
+            ref="", location="'%s'!A%i" % (sheet.title, row)
+        )
+
+        return [
+            system.name,
+            link,
+            component.name,
+            money(component.unitcost),
+            component.quantity,
+            money(component.unitcost * component.quantity),
+        ]
+
+    def write_costtable(self, sheet, component, system, metadata, row=1):
+        if isinstance(component, Part):
+            return self.write_costtable_part(sheet, component, system, metadata, row)
+        elif isinstance(component, Assembly):
+            return self.write_costtable_assembly(
+                sheet, component, system, metadata, row
+            )
+
+    def write_costtable_part(self, sheet, component, system, metadata, row=1):
+        row = self.write_header_part(sheet, component, system, metadata, row)
+        row = self.write_table_materials(sheet, component, row) + 1
+        row = self.write_table_processes(sheet, component, row) + 1
+        row = self.write_table_fasteners(sheet, component, row) + 1
+        row = self.write_table_toolings(sheet, component, row) + 1
+        return row
+
+    def write_costtable_assembly(self, sheet, component, system, metadata, row=1):
+        row = self.write_header_assembly(sheet, component, system, metadata, row)
+        row = self.write_table_parts(sheet, component, row) + 1
+        row = self.write_table_materials(sheet, component, row) + 1
+        row = self.write_table_processes(sheet, component, row) + 1
+        row = self.write_table_fasteners(sheet, component, row) + 1
+        row = self.write_table_toolings(sheet, component, row) + 1
+        return row
+
+    def _cell(self, sheet, value, style=None):
+        cell = self._WriteOnlyCell(sheet, value)
+        if style is not None:
+            cell.style = style
+        return cell
+
+    def _header_cell(self, sheet, value):
+        return self._cell(sheet, value, FSG_HEADER_STYLE)
+
+    def _money_cell(self, sheet, value):
+        return self._cell(sheet, value, FSG_MONEY_STYLE)
+
+    def _append_rows(self, sheet, row, rows):
+        """
+        Appends the *rows* to the *sheet*, the first one at index *row*.
+        Rows must be written in increasing order, since cells cannot be
+        revisited in write-only mode.
+        Returns the index of the row following the last appended row.
+        """
+        last_row = self._last_rows.get(sheet, 0)
+        if row <= last_row:
+            raise ValueError("Row %i was already written" % row)
+
+        for _ in range(row - last_row - 1):
+            sheet.append([])
+
+        for values in rows:
+            sheet.append(values)
+
+            # hyperlinks refer to the cell coordinate known once appended
+            for value in values:
+                if isinstance(value, self._Cell) and value.hyperlink is not None:
+                    value.hyperlink.ref = value.coordinate
+
+        self._last_rows[sheet] = row + len(rows) - 1
+
+        return row + len(rows)
+
+    def write_header_part(self, sheet, component, system, metadata, row=1):
+        h = functools.partial(self._header_cell, sheet)
+        money = functools.partial(self._money_cell, sheet)
+
+        rows = [
+            [
+                h("University"),
+                metadata.university,
+                None,
+                h("Car #"),
+                metadata.car_number,
+                None,
+                h("Unit cost"),
+                money(component.unitcost),
+            ],
+            [h("System"), system.name]
+            + [None] * 4
+            + [h("Quantity"), component.quantity],
+            [
+                h("Assembly"),
+                ", ".join(assembly.name for assembly in component.parents),
+            ],
+            [h("Part"), component.name]
+            + [None] * 4
+            + [h("Total cost"), money(component.unitcost * component.quantity)],
+            [h("P/N Base"), component.pn_base],
+            [h("Suffix"), component.revision],
+            [h("Details"), component.details],
+        ]
+        self._append_rows(sheet, row, rows)
+
+        return row + 9
+
+    def write_header_assembly(self, sheet, component, system, metadata, row=1):
+        h = functools.partial(self._header_cell, sheet)
+        money = functools.partial(self._money_cell, sheet)
+
+        rows = [
+            [
+                h("University"),
+                metadata.university,
+                None,
+                h("Car #"),
+                metadata.car_number,
+                None,
+                h("Unit cost"),
+                money(component.unitcost),
+            ],
+            [h("System"), system.name]
+            + [None] * 4
+            + [h("Table cost"), money(component.tablecost)],
+            [h("Assembly"), component.name]
+            + [None] * 4
+            + [h("Quantity"), component.quantity],
+            [h("P/N Base"), component.pn_base]
+            + [None] * 4
+            + [h("Total cost"), money(component.unitcost * component.quantity)],
+            [h("Suffix"), component.revision],
+            [h("Details"), component.details],
+        ]
+        self._append_rows(sheet, row, rows)
+
+        return row + 8
+
+    def _create_table_rows(self, sheet, title, headers):
+        return [
+            [self._cell(sheet, title, FSG_TITLE_STYLE)],
+            [self._header_cell(sheet, header) for header in headers],
+        ]
+
+    def _create_total_row(self, sheet, column, totalcost):
+        return [None] * (column - 2) + [
+            self._header_cell(sheet, "Sub total"),
+            self._cell(sheet, totalcost, FSG_HEADER_MONEY_STYLE),
+        ]
 
     def write_table_parts(self, sheet, component, row):
-        sheet.cell(row=row, column=1).value = "Parts"
-        sheet.cell(row=row, column=1).font = Font(bold=True)
+        money = functools.partial(self._money_cell, sheet)
 
         # header
-        row += 1
-        self._set_header_cell(sheet.cell(row=row, column=1), "P/N")
-        self._set_header_cell(sheet.cell(row=row, column=2), "Part")
-        self._set_header_cell(sheet.cell(row=row, column=3), "Part cost")
-        self._set_header_cell(sheet.cell(row=row, column=4), "Quantity")
-        self._set_header_cell(sheet.cell(row=row, column=5), "Sub total")
+        rows = self._create_table_rows(
+            sheet, "Parts", ["P/N", "Part", "Part cost", "Quantity", "Sub total"]
+        )
 
         # values
         totalcost = 0.0
         parts = component.components
         for part, quantity in reversed(sorted(parts.items())):
-            row += 1
-
             subtotal = part.unitcost * quantity
             totalcost += subtotal
 
-            sheet.cell(row=row, column=1).value = part.pn
-            sheet.cell(row=row, column=2).value = part.name
-            self._set_money_cell(sheet.cell(row=row, column=3), part.unitcost)
-            sheet.cell(row=row, column=4).value = quantity
-            self._set_money_cell(sheet.cell(row=row, column=5), subtotal)
+            rows.append(
+                [part.pn, part.name, money(part.unitcost), quantity, money(subtotal)]
+            )
 
         # total
-        row += 1
-        self._set_header_cell(sheet.cell(row=row, column=4), "Sub total")
-        self._set_header_cell(sheet.cell(row=row, column=5), totalcost)
-        sheet.cell(row=row, column=6).number_format = "#,##0.00$"
+        rows.append(self._create_total_row(sheet, 5, totalcost))
 
-        return row + 1
+        return self._append_rows(sheet, row, rows)
 
     def write_table_materials(self, sheet, component, row):
-        sheet.cell(row=row, column=1).value = "Materials"
-        sheet.cell(row=row, column=1).font = Font(bold=True)
+        money = functools.partial(self._money_cell, sheet)
 
         # header
-        row += 1
-        self._set_header_cell(sheet.cell(row=row, column=1), "Material")
-        self._set_header_cell(sheet.cell(row=row, column=2), "Use")
-        self._set_header_cell(sheet.cell(row=row, column=3), "Size 1")
-        self._set_header_cell(sheet.cell(row=row, column=4), "Size 2")
-        self._set_header_cell(sheet.cell(row=row, column=5), "Unit cost")
-        self._set_header_cell(sheet.cell(row=row, column=6), "Quantity")
-        self._set_header_cell(sheet.cell(row=row, column=7), "Sub total")
+        rows = self._create_table_rows(
+            sheet,
+            "Materials",
+            [
+                "Material",
+                "Use",
+                "Size 1",
+                "Size 2",
+                "Unit cost",
+                "Quantity",
+                "Sub total",
+            ],
+        )
 
         # values
         materials = component.materials
         for material in materials:
-            row += 1
-
-            sheet.cell(row=row, column=1).value = material.name
-            sheet.cell(row=row, column=2).value = material.use
+            size1 = size2 = None
             if material.size1:
-                sheet.cell(row=row, column=3).value = "%s %s" % (
-                    decimal(material.size1),
-                    material.unit1,
-                )
+                size1 = "%s %s" % (decimal(material.size1), material.unit1)
             if material.size2:
-                sheet.cell(row=row, column=4).value = "%s %s" % (
-                    decimal(material.size2),
-                    material.unit2,
-                )
-            self._set_money_cell(sheet.cell(row=row, column=5), material.unitcost)
-            sheet.cell(row=row, column=6).value = material.quantity
-            self._set_money_cell(sheet.cell(row=row, column=7), material.subtotal)
+                size2 = "%s %s" % (decimal(material.size2), material.unit2)
+
+            rows.append(
+                [
+                    material.name,
+                    material.use,
+                    size1,
+                    size2,
+                    money(material.unitcost),
+                    material.quantity,
+                    money(material.subtotal),
+                ]
+            )
 
         # total
-        row += 1
-        self._set_header_cell(sheet.cell(row=row, column=6), "Sub total")
-        self._set_header_cell(
-            sheet.cell(row=row, column=7), sum(map(SUBTOTAL, materials))
-        )
-        sheet.cell(row=row, column=7).number_format = "#,##0.00$"
+        rows.append(self._create_total_row(sheet, 7, sum(map(SUBTOTAL, materials))))
 
-        return row + 1
+        return self._append_rows(sheet, row, rows)
 
     def write_table_processes(self, sheet, component, row):
-        sheet.cell(row=row, column=1).value = "Processes"
-        sheet.cell(row=row, column=1).font = Font(bold=True)
+        money = functools.partial(self._money_cell, sheet)
 
         # header
-        row += 1
-        self._set_header_cell(sheet.cell(row=row, column=1), "Process")
-        self._set_header_cell(sheet.cell(row=row, column=2), "Use")
-        self._set_header_cell(sheet.cell(row=row, column=3), "Cost")
-        self._set_header_cell(sheet.cell(row=row, column=4), "Quantity")
-        self._set_header_cell(sheet.cell(row=row, column=5), "Multiplier")
-        self._set_header_cell(sheet.cell(row=row, column=6), "Sub total")
+        rows = self._create_table_rows(
+            sheet,
+            "Processes",
+            ["Process", "Use", "Cost", "Quantity", "Multiplier", "Sub total"],
+        )
 
         # values
         processes = component.processes
         for process in processes:
-            row += 1
-
-            sheet.cell(row=row, column=1).value = process.name
-            sheet.cell(row=row, column=2).value = process.use
-            sheet.cell(row=row, column=3).value = "%4.2f / %s" % (
-                process.unitcost,
-                process.unit,
+            rows.append(
+                [
+                    process.name,
+                    process.use,
+                    "%4.2f / %s" % (process.unitcost, process.unit),
+                    process.quantity,
+                    process.multiplier or 1.0,
+                    money(process.subtotal),
+                ]
             )
-            sheet.cell(row=row, column=4).value = process.quantity
-            sheet.cell(row=row, column=5).value = process.multiplier or 1.0
-            self._set_money_cell(sheet.cell(row=row, column=6), process.subtotal)
 
         # total
-        row += 1
-        self._set_header_cell(sheet.cell(row=row, column=5), "Sub total")
-        self._set_header_cell(
-            sheet.cell(row=row, column=6), sum(map(SUBTOTAL, processes))
-        )
-        sheet.cell(row=row, column=6).number_format = "#,##0.00$"
+        rows.append(self._create_total_row(sheet, 6, sum(map(SUBTOTAL, processes))))
 
-        return row + 1
+        return self._append_rows(sheet, row, rows)
 
     def write_table_fasteners(self, sheet, component, row):
-        sheet.cell(row=row, column=1).value = "Fasteners"
-        sheet.cell(row=row, column=1).font = Font(bold=True)
+        money = functools.partial(self._money_cell, sheet)
 
         # header
-        row += 1
-        self._set_header_cell(sheet.cell(row=row, column=1), "Fastener")
-        self._set_header_cell(sheet.cell(row=row, column=2), "Use")
-        self._set_header_cell(sheet.cell(row=row, column=3), "Size 1")
-        self._set_header_cell(sheet.cell(row=row, column=4), "Size 2")
-        self._set_header_cell(sheet.cell(row=row, column=5), "Unit cost")
-        self._set_header_cell(sheet.cell(row=row, column=6), "Quantity")
-        self._set_header_cell(sheet.cell(row=row, column=7), "Sub total")
+        rows = self._create_table_rows(
+            sheet,
+            "Fasteners",
+            [
+                "Fastener",
+                "Use",
+                "Size 1",
+                "Size 2",
+                "Unit cost",
+                "Quantity",
+                "Sub total",
+            ],
+        )
 
         # values
         fasteners = component.fasteners
         for fastener in fasteners:
-            row += 1
-
-            sheet.cell(row=row, column=1).value = fastener.name
-            sheet.cell(row=row, column=2).value = fastener.use
+            size1 = size2 = None
             if fastener.size1:
-                sheet.cell(row=row, column=3).value = "%s %s" % (
-                    decimal(fastener.size1),
-                    fastener.unit1,
-                )
+                size1 = "%s %s" % (decimal(fastener.size1), fastener.unit1)
             if fastener.size2:
-                sheet.cell(row=row, column=4).value = "%s %s" % (
-                    decimal(fastener.size2),
-                    fastener.unit2,
-                )
-            self._set_money_cell(sheet.cell(row=row, column=5), fastener.unitcost)
-            sheet.cell(row=row, column=6).value = fastener.quantity
-            self._set_money_cell(sheet.cell(row=row, column=7), fastener.subtotal)
+                size2 = "%s %s" % (decimal(fastener.size2), fastener.unit2)
+
+            rows.append(
+                [
+                    fastener.name,
+                    fastener.use,
+                    size1,
+                    size2,
+                    money(fastener.unitcost),
+                    fastener.quantity,
+                    money(fastener.subtotal),
+                ]
+            )
 
         # total
-        row += 1
-        self._set_header_cell(sheet.cell(row=row, column=6), "Sub total")
-        self._set_header_cell(
-            sheet.cell(row=row, column=7), sum(map(SUBTOTAL, fasteners))
-        )
-        sheet.cell(row=row, column=7).number_format = "#,##0.00$"
+        rows.append(self._create_total_row(sheet, 7, sum(map(SUBTOTAL, fasteners))))
 
-        return row + 1
+        return self._append_rows(sheet, row, rows)
 
     def write_table_toolings(self, sheet, component, row):
-        sheet.cell(row=row, column=1).value = "Tooling"
-        sheet.cell(row=row, column=1).font = Font(bold=True)
+        money = functools.partial(self._money_cell, sheet)
 
         # header
-        row += 1
-        self._set_header_cell(sheet.cell(row=row, column=1), "Tooling")
-        self._set_header_cell(sheet.cell(row=row, column=2), "Use")
-        self._set_header_cell(sheet.cell(row=row, column=3), "Unit cost")
-        self._set_header_cell(sheet.cell(row=row, column=4), "Quantity")
-        self._set_header_cell(sheet.cell(row=row, column=5), "PVF")
-        self._set_header_cell(sheet.cell(row=row, column=6), "Sub total")
+        rows = self._create_table_rows(
+            sheet,
+            "Tooling",
+            ["Tooling", "Use", "Unit cost", "Quantity", "PVF", "Sub total"],
+        )
 
         # values
         toolings = component.toolings
         for tooling in toolings:
-            row += 1
-
-            sheet.cell(row=row, column=1).value = tooling.name
-            sheet.cell(row=row, column=2).value = tooling.use
-            sheet.cell(row=row, column=3).value = "%4.2f / %s" % (
-                tooling.unitcost,
-                tooling.unit,
+            rows.append(
+                [
+                    tooling.name,
+                    tooling.use,
+                    "%4.2f / %s" % (tooling.unitcost, tooling.unit),
+                    tooling.quantity,
+                    tooling.pvf,
+                    money(tooling.subtotal),
+                ]
             )
-            sheet.cell(row=row, column=4).value = tooling.quantity
-            sheet.cell(row=row, column=5).value = tooling.pvf
-            self._set_money_cell(sheet.cell(row=row, column=6), tooling.subtotal)
 
         # total
-        row += 1
-        self._set_header_cell(sheet.cell(row=row, column=5), "Sub total")
-        self._set_header_cell(
-            sheet.cell(row=row, column=6), sum(map(SUBTOTAL, toolings))
-        )
-        sheet.cell(row=row, column=6).number_format = "#,##0.00$"
+        rows.append(self._create_total_row(sheet, 6, sum(map(SUBTOTAL, toolings))))
 
-        return row + 1
+        return self._append_rows(sheet, row, rows)
 
 
 class FSGAppendixLaTeXWriter(CostReportLaTeXWriter):
@@ -1627,15 +2300,6 @@ class FSGAppendixLaTeXWriter(CostReportLaTeXWriter):
     #
     #        return rows
 
-    def write_systems(self, metadata):
-        lines = []
-
-        for system in metadata.systems:
-            lines += self.write_system(system)
-            lines += [""]
-
-        return lines
-
     def write_system(self, system):
         lines = []
 
@@ -1665,9 +2329,14 @@ class FSGAppendixLaTeXWriter(CostReportLaTeXWriter):
             lines += [r"\section{%s (%s)}" % (e(name), pn)]
 
             for index, picture in enumerate(component.pictures):
-                path = posixpath.join(
-                    system.label, PICTURES_DIR, os.path.basename(picture)
+                duplicate = _create_duplicate_lines(
+                    "img", component, index, picture, self._duplicates
                 )
+                if duplicate:
+                    lines += duplicate
+                    continue
+
+                path = _get_picture_path(system, picture, self._pictures)
                 lines += [r"\begin{center}"]
                 lines += [r"\includegraphics[height=0.8\textheight]{%s}" % path]
                 lines += [r"\label{img:%s-%i}" % (pn, index)]
@@ -1675,6 +2344,13 @@ class FSGAppendixLaTeXWriter(CostReportLaTeXWriter):
                 lines += [r"\newpage"]
 
             for index, drawing in enumerate(component.drawings):
+                duplicate = _create_duplicate_lines(
+                    "dwg", component, index, drawing, self._duplicates
+                )
+                if duplicate:
+                    lines += duplicate
+                    continue
+
                 path = posixpath.join(
                     system.label, DRAWINGS_DIR, os.path.basename(drawing)
                 )
@@ -1685,6 +2361,13 @@ class FSGAppendixLaTeXWriter(CostReportLaTeXWriter):
         #                lines += [r'\addcontentsline{toc}{subsection}{Drawing %i}' % (index + 1,)]
         else:
             for index, drawing in enumerate(component.drawings):
+                duplicate = _create_duplicate_lines(
+                    "dwg", component, index, drawing, self._duplicates
+                )
+                if duplicate:
+                    lines += duplicate
+                    continue
+
                 path = posixpath.join(
                     system.label, DRAWINGS_DIR, os.path.basename(drawing)
                 )
@@ -36,7 +36,7 @@ else:
             sheetname = sheet.name
 
             if PATTERN.match(sheetname):
-                logging.debug("Converting %s..." % sheetname)
+                logging.debug("Converting %s...", sheetname)
                 sheet.Activate()
 
                 filename = sheetname + ".csv"
@@ -47,7 +47,7 @@ else:
 
                 sheet.SaveAs(output_path, 6)  # 6: FileFormat = xlCSV
 
-                logging.debug("Converting %s... DONE" % sheetname)
+                logging.debug("Converting %s... DONE", sheetname)
 
         wb.Close(False)
         xl.Quit
@@ -75,19 +75,19 @@ if __name__ == "__main__":
         sys.exit(1)
 
     base_path = os.path.abspath(options.base_path)
-    logging.info("Base path: %s" % base_path)
+    logging.info("Base path: %s", base_path)
 
     if options.system:
         systems = [options.system]
     else:
         systems = ["BR", "EN", "FR", "EL", "MS", "ST", "SU", "WT"]
-    logging.info("Looking through system(s): %s" % ",".join(systems))
+    logging.info("Looking through system(s): %s", ",".join(systems))
 
     for system in systems:
         dir = os.path.join(base_path, system)
         output_dir = os.path.join(dir, "components")
 
         for input_file in glob.glob(os.path.join(dir, "*.xls*")):
-            logging.info("Converting %s..." % input_file)
+            logging.info("Converting %s...", input_file)
             xlstocsv(input_file, output_dir)
-            logging.info("Converting %s... DONE" % input_file)
+            logging.info("Converting %s... DONE", input_file)
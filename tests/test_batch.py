@@ -0,0 +1,81 @@
+""""""
+
+# Standard library modules.
+import unittest
+import logging
+import os
+import shutil
+import tempfile
+import glob
+
+# Third party modules.
+
+# Local modules.
+from fsaecostreport.batch import run_batch, format_summary
+
+# Globals and constants variables.
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+
+        testdata = os.path.join(os.path.dirname(os.path.abspath(__file__)), "testdata")
+        self.tmpdir = tempfile.mkdtemp()
+
+        self.basepaths = []
+        for year in ["2012", "2013"]:
+            basepath = os.path.join(self.tmpdir, year)
+            shutil.copytree(testdata, basepath)
+            self.basepaths.append(basepath)
+
+    def tearDown(self):
+        unittest.TestCase.tearDown(self)
+
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def testskeleton(self):
+        self.assertEqual(2, len(self.basepaths))
+
+    def testrun_batch(self):
+        summaries = run_batch(self.basepaths, ["report", "ebom"], processes=2)
+
+        self.assertEqual(2, len(summaries))
+        for basepath, summary in zip(self.basepaths, summaries):
+            self.assertEqual(basepath, summary["basepath"])
+            self.assertEqual("ok", summary["status"])
+            self.assertEqual(
+                {"read", "load", "charts", "report", "ebom"}, set(summary["timings"])
+            )
+            self.assertTrue(glob.glob(os.path.join(basepath, "*.tex")))
+
+        lines = format_summary(summaries, 1.0).splitlines()
+        self.assertEqual("2 car(s), 0 failed in 1.00 s", lines[-1])
+
+    def testrun_batch_failure(self):
+        basepath = os.path.join(self.tmpdir, "missing")
+        os.makedirs(basepath)
+
+        summaries = run_batch(self.basepaths[:1] + [basepath], ["ebom"], processes=1)
+
+        self.assertEqual("ok", summaries[0]["status"])
+        self.assertEqual("failed", summaries[1]["status"])
+        self.assertIn("read", summaries[1]["errors"])
+
+        lines = format_summary(summaries).splitlines()
+        self.assertEqual("2 car(s), 1 failed", lines[-1])
+
+    def testrun_batch_duplicate(self):
+        basepaths = self.basepaths[:1] * 2 + [self.basepaths[0] + os.sep]
+        summaries = run_batch(basepaths, ["ebom"], processes=2)
+
+        self.assertEqual(1, len(summaries))
+        self.assertEqual("ok", summaries[0]["status"])
+
+    def testrun_batch_unknown_output(self):
+        self.assertRaises(ValueError, run_batch, self.basepaths, ["pdf"])
+
+
+if __name__ == "__main__":  # pragma: no cover
+    logging.getLogger().setLevel(logging.DEBUG)
+    unittest.main()
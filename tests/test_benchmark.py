@@ -0,0 +1,112 @@
+""""""
+
+# Standard library modules.
+import unittest
+import logging
+import os
+import shutil
+import tempfile
+
+# Third party modules.
+
+# Local modules.
+from fsaecostreport.benchmark import (
+    run_benchmarks,
+    save_results,
+    load_results,
+    compare,
+    format_comparison,
+    measure_startup,
+    check_startup,
+    BASELINE_VERSION,
+    HEAVY_MODULES,
+)
+
+# Globals and constants variables.
+
+
+def _create_results(**durations):
+    benchmarks = {}
+    for name, duration in durations.items():
+        benchmarks[name] = {"min": duration, "median": duration, "repeat": 1}
+    return {"version": BASELINE_VERSION, "results": {"small": benchmarks}}
+
+
+class TestBenchmark(unittest.TestCase):
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        unittest.TestCase.tearDown(self)
+
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def testrun_benchmarks(self):
+        sizes = {"tiny": dict(systems=1, parts=2, depth=1)}
+        names = ["ascii", "read_systems", "rollup", "eBOMWriter"]
+        results = run_benchmarks(sizes, repeat=2, names=names)
+
+        self.assertEqual(BASELINE_VERSION, results["version"])
+        self.assertEqual(set(names), set(results["results"]["tiny"]))
+
+        result = results["results"]["tiny"]["read_systems"]
+        self.assertEqual(2, result["repeat"])
+        self.assertLessEqual(result["min"], result["median"])
+
+    def testsave_load_results(self):
+        filepath = os.path.join(self.tmpdir, "baselines", "results.json")
+        results = _create_results(ascii=0.1)
+
+        save_results(filepath, results)
+        self.assertEqual(results, load_results(filepath))
+
+    def testload_results_version(self):
+        filepath = os.path.join(self.tmpdir, "results.json")
+        save_results(filepath, {"version": 0, "results": {}})
+
+        self.assertRaises(ValueError, load_results, filepath)
+
+    def testcompare(self):
+        baseline = _create_results(ascii=0.1, rollup=0.2, removed=1.0)
+        current = _create_results(ascii=0.11, rollup=0.3, added=1.0)
+
+        rows = compare(baseline, current, threshold=0.2)
+        self.assertEqual(2, len(rows))
+
+        size, name, before, after, ratio, regression = rows[0]
+        self.assertEqual("small", size)
+        self.assertEqual("ascii", name)
+        self.assertAlmostEqual(1.1, ratio, 4)
+        self.assertFalse(regression)
+
+        size, name, before, after, ratio, regression = rows[1]
+        self.assertEqual("rollup", name)
+        self.assertAlmostEqual(1.5, ratio, 4)
+        self.assertTrue(regression)
+
+        lines = format_comparison(rows).splitlines()
+        self.assertEqual(2, len(lines))
+        self.assertTrue(lines[1].endswith("REGRESSION"))
+
+    def testmeasure_startup(self):
+        basepath = os.path.join(os.path.dirname(os.path.abspath(__file__)), "testdata")
+        total, modules = measure_startup(basepath)
+
+        self.assertGreater(total, 0.0)
+        self.assertIn("fsaecostreport.reader", modules)
+        for name in HEAVY_MODULES:
+            self.assertNotIn(name, modules)
+
+    def testcheck_startup(self):
+        basepath = os.path.join(os.path.dirname(os.path.abspath(__file__)), "testdata")
+        _total, slowest, problems = check_startup(basepath, budget=0.0)
+
+        self.assertEqual(10, len(slowest))
+        self.assertEqual(1, len(problems))
+
+
+if __name__ == "__main__":  # pragma: no cover
+    logging.getLogger().setLevel(logging.DEBUG)
+    unittest.main()
@@ -0,0 +1,155 @@
+""""""
+
+# Standard library modules.
+import unittest
+import logging
+import os
+import shutil
+import tempfile
+import glob
+import multiprocessing
+
+# Third party modules.
+
+# Local modules.
+from fsaecostreport.bundle import (
+    compile_bundle,
+    load_bundle,
+    get_bundle_path,
+    Bundle,
+    _create_index,
+)
+from fsaecostreport.serialization import dump
+from fsaecostreport.reader import MetadataReader, SystemFileReader
+from fsaecostreport.pipeline import Pipeline, set_model
+import fsaecostreport.pipeline as pipeline_module
+
+from test_pipeline import _count_components
+
+# Globals and constants variables.
+
+
+class TestBundle(unittest.TestCase):
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+
+        testdata = os.path.join(os.path.dirname(os.path.abspath(__file__)), "testdata")
+        self.tmpdir = tempfile.mkdtemp()
+        self.basepath = os.path.join(self.tmpdir, "testdata")
+        shutil.copytree(testdata, self.basepath)
+
+        self.filepath = compile_bundle(self.basepath)
+
+    def tearDown(self):
+        unittest.TestCase.tearDown(self)
+
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def testskeleton(self):
+        self.assertEqual(get_bundle_path(self.basepath), self.filepath)
+        self.assertTrue(os.path.exists(self.filepath))
+
+    def testload_bundle(self):
+        expected = MetadataReader().read(self.basepath)
+        for system in expected.systems:
+            SystemFileReader().read(self.basepath, system)
+
+        # moved with its base path
+        basepath = os.path.join(self.tmpdir, "moved")
+        shutil.move(self.basepath, basepath)
+        filepath = os.path.join(basepath, os.path.relpath(self.filepath, self.basepath))
+
+        metadata = load_bundle(filepath, basepath)
+        self.assertEqual(expected.filename, metadata.filename)
+
+        system = metadata.systems[1]
+        part = system.get_component("TM-00001-AA")
+        expected_part = expected.systems[1].get_component("TM-00001-AA")
+        self.assertEqual(
+            os.path.join(basepath, "TM", "components", "TM-00001-AA.csv"),
+            part.filepath,
+        )
+        self.assertEqual(
+            [os.path.join(basepath, "TM", "drawings", "TM-00001-AA.pdf")],
+            part.drawings,
+        )
+        self.assertAlmostEqual(expected_part.unitcost, part.unitcost, 4)
+        self.assertEqual(expected_part.quantity, part.quantity)
+
+    def testfind(self):
+        with Bundle.open(self.filepath) as bundle:
+            self.assertEqual(6, len(bundle))
+            self.assertIn("TM-A0001-AA", bundle)
+            self.assertNotIn("TM-A0003-AA", bundle)
+            self.assertRaises(KeyError, bundle.find, "TM-A0003-AA")
+
+    def testget_component(self):
+        with Bundle.open(self.filepath, use_mmap=False) as bundle:
+            component = bundle.get_component("TM-A0001-AA")
+
+        self.assertEqual("TM", component["system"])
+        self.assertEqual("assembly", component["kind"])
+        self.assertEqual("Push bar", component["name"])
+        self.assertEqual([("TM-00001-AA", 2)], component["components"])
+        self.assertEqual(2, len(component["materials"]))
+        self.assertEqual(22, component["processes"][1]["multiplier_id"])
+        self.assertIsNone(component["processes"][0]["multiplier_id"])
+        self.assertIsNone(component["materials"][0]["unit2"])
+
+        path, digest = component["pictures"][0]
+        self.assertEqual(os.path.join("TM", "pictures", "TM-A0001-AA.jpg"), path)
+        self.assertEqual(40, len(digest))
+
+    def testis_uptodate(self):
+        with Bundle.open(self.filepath) as bundle:
+            self.assertTrue(bundle.is_uptodate())
+
+            filepath = os.path.join(
+                self.basepath, "TM", "components", "TM-00001-AA.csv"
+            )
+            stat = os.stat(filepath)
+            os.utime(filepath, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+            self.assertFalse(bundle.is_uptodate())
+
+    def testopen_not_bundle(self):
+        metadata = MetadataReader().read(self.basepath)
+        filepath = os.path.join(self.tmpdir, "model.bin")
+        dump(metadata, filepath)
+
+        self.assertRaises(ValueError, Bundle.open, filepath)
+
+    def testpipeline_spawn(self):
+        # an archived bundle, without the files of the components
+        for filepath in glob.glob(os.path.join(self.basepath, "*", "components", "*")):
+            os.remove(filepath)
+
+        metadata = load_bundle(self.filepath, self.basepath)
+        labels = [system.label for system in metadata.systems]
+        set_model(self.basepath, metadata, self.filepath)
+        self.addCleanup(pipeline_module._models.clear)
+        payloads = pipeline_module._dump_models()
+        self.assertEqual(self.filepath, payloads[(self.basepath, tuple(labels))])
+
+        method = multiprocessing.get_start_method()
+        multiprocessing.set_start_method("spawn", force=True)
+        try:
+            pipeline = Pipeline(processes=2)
+            pipeline.add_stage("a", _count_components, (self.basepath, labels))
+            pipeline.add_stage("b", _count_components, (self.basepath, labels))
+            results = pipeline.run()
+        finally:
+            multiprocessing.set_start_method(method, force=True)
+
+        self.assertEqual({"a": 6, "b": 6}, results)
+
+    def testcreate_index(self):
+        pns = [("TM-%05i-AA" % i).encode("ascii") for i in range(100)]
+        table = _create_index(pns)
+
+        self.assertEqual(256, len(table))
+        self.assertEqual(set(range(100)), set(table) - {-1})
+
+
+if __name__ == "__main__":  # pragma: no cover
+    logging.getLogger().setLevel(logging.DEBUG)
+    unittest.main()
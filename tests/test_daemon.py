@@ -0,0 +1,112 @@
+""""""
+
+# Standard library modules.
+import unittest
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import json
+import socket
+
+# Third party modules.
+
+# Local modules.
+from fsaecostreport.daemon import Daemon, send
+
+from test_incremental import _modify
+
+# Globals and constants variables.
+
+
+class TestDaemon(unittest.TestCase):
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+
+        testdata = os.path.join(os.path.dirname(os.path.abspath(__file__)), "testdata")
+        self.tmpdir = tempfile.mkdtemp()
+        self.basepath = os.path.join(self.tmpdir, "testdata")
+        shutil.copytree(testdata, self.basepath)
+
+        self.socket_path = os.path.join(self.tmpdir, "daemon.sock")
+        self.daemon = Daemon(self.basepath, self.socket_path, poll_interval=0.05)
+
+        self.thread = threading.Thread(target=self.daemon.serve)
+        self.thread.start()
+
+        timeout = time.time() + 10.0
+        while not os.path.exists(self.socket_path) and time.time() < timeout:
+            time.sleep(0.01)
+
+    def tearDown(self):
+        unittest.TestCase.tearDown(self)
+
+        if self.thread.is_alive():
+            send(self.socket_path, {"command": "stop"})
+        self.thread.join()
+
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def testping(self):
+        self.assertEqual({"status": "ok"}, send(self.socket_path, {"command": "ping"}))
+
+    def teststatus(self):
+        response = send(self.socket_path, {"command": "status"})
+        self.assertEqual({"FI": 2, "TM": 4}, response["systems"])
+
+    def testregenerate(self):
+        request = {"command": "regenerate", "outputs": ["ebom"]}
+        response = send(self.socket_path, request)
+
+        self.assertEqual("ok", response["status"])
+        self.assertIn("update", response["durations"])
+        self.assertIn("ebom", response["durations"])
+        filepath = os.path.join(self.basepath, "049_McGill University_FSAEM_CR.csv")
+        self.assertTrue(os.path.exists(filepath))
+
+    def testregenerate_modified(self):
+        filepath = os.path.join(self.basepath, "TM", "components", "TM-00001-AA.csv")
+        _modify(filepath, "Part,Cup holder", "Part,Mug holder")
+
+        request = {"command": "regenerate", "outputs": ["ebom"]}
+        send(self.socket_path, request)
+
+        filepath = os.path.join(self.basepath, "049_McGill University_FSAEM_CR.csv")
+        with open(filepath, "r") as fp:
+            self.assertIn("Mug holder", fp.read())
+
+    def testunknown(self):
+        response = send(self.socket_path, {"command": "unknown"})
+        self.assertEqual("error", response["status"])
+
+        request = {"command": "regenerate", "outputs": ["unknown"]}
+        response = send(self.socket_path, request)
+        self.assertEqual("error", response["status"])
+
+    def testrequest_timeout(self):
+        self.daemon.request_timeout = 0.1
+
+        # a client connected without sending its request
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.settimeout(10.0)
+        with client:
+            client.connect(self.socket_path)
+            with client.makefile("rb") as fp:
+                response = json.loads(fp.readline().decode("utf8"))
+        self.assertEqual("error", response["status"])
+
+        self.assertEqual({"status": "ok"}, send(self.socket_path, {"command": "ping"}))
+
+    def teststop(self):
+        send(self.socket_path, {"command": "stop"})
+        self.thread.join(10.0)
+
+        self.assertFalse(self.thread.is_alive())
+        self.assertFalse(os.path.exists(self.socket_path))
+
+
+if __name__ == "__main__":  # pragma: no cover
+    logging.getLogger().setLevel(logging.DEBUG)
+    unittest.main()
@@ -0,0 +1,108 @@
+""""""
+
+# Standard library modules.
+import unittest
+import logging
+import os
+import shutil
+import tempfile
+
+# Third party modules.
+
+# Local modules.
+from fsaecostreport.generator import CarGenerator
+from fsaecostreport.reader import MetadataReader, SystemFileReader
+from fsaecostreport.pattern import PART_PN, SUB_ASSY_PN, SYS_ASSY_PN
+
+# Globals and constants variables.
+
+
+class TestCarGenerator(unittest.TestCase):
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+
+        self.basepath = tempfile.mkdtemp()
+
+    def tearDown(self):
+        unittest.TestCase.tearDown(self)
+
+        shutil.rmtree(self.basepath, ignore_errors=True)
+
+    def _read(self):
+        metadata = MetadataReader().read(self.basepath)
+
+        for system in metadata.systems:
+            SystemFileReader().read(self.basepath, system)
+
+        return metadata
+
+    def testgenerate(self):
+        labels = CarGenerator(systems=3, parts=12, depth=3, fanout=2).generate(
+            self.basepath
+        )
+        self.assertEqual(["AA", "AB", "AC"], labels)
+
+        metadata = self._read()
+        self.assertEqual(3, len(metadata.systems))
+
+        for system in metadata.systems:
+            pns = [component.pn for component in system.get_components()]
+            self.assertEqual(12, len(list(filter(PART_PN.match, pns))))
+            self.assertEqual(6, len(list(filter(SUB_ASSY_PN.match, pns))))
+            self.assertEqual(1, len(list(filter(SYS_ASSY_PN.match, pns))))
+
+            for component in system.get_components():
+                if PART_PN.match(component.pn):
+                    self.assertEqual(1, len(component.drawings))
+                else:
+                    self.assertEqual(1, len(component.pictures))
+
+        self.assertEqual(3, len(metadata.sae_parts))
+
+    def testgenerate_items(self):
+        CarGenerator(systems=1, parts=3, items=4).generate(self.basepath)
+
+        system = self._read().systems[0]
+        for component in system.get_components():
+            self.assertEqual(4, len(component.materials))
+            self.assertEqual(4, len(component.processes))
+            self.assertEqual(4, len(component.fasteners))
+            self.assertEqual(4, len(component.toolings))
+
+    def testgenerate_shared(self):
+        CarGenerator(systems=1, parts=8, depth=3, fanout=2, shared=2).generate(
+            self.basepath
+        )
+
+        system = self._read().systems[0]
+        shared = [c for c in system.get_components() if len(c.parents) > 1]
+        self.assertEqual(2, len(shared))
+
+    def testgenerate_unicode_names(self):
+        CarGenerator(systems=1, parts=5, unicode_names=True).generate(self.basepath)
+
+        metadata = self._read()
+        self.assertEqual("Universite Synthetique", metadata.university)
+
+        for component in metadata.systems[0].get_components():
+            self.assertTrue(all(ord(char) < 128 for char in component.name))
+
+    def testgenerate_seed(self):
+        CarGenerator(systems=1, seed=1).generate(self.basepath)
+        filepath = os.path.join(self.basepath, "AA", "components", "AA-A1000-AA.csv")
+        with open(filepath, "r") as fp:
+            content = fp.read()
+
+        CarGenerator(systems=1, seed=1).generate(self.basepath)
+        with open(filepath, "r") as fp:
+            self.assertEqual(content, fp.read())
+
+    def testinvalid(self):
+        self.assertRaises(ValueError, CarGenerator, parts=1000)
+        self.assertRaises(ValueError, CarGenerator, depth=4, fanout=10)
+        self.assertRaises(ValueError, CarGenerator, depth=2, shared=1)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    logging.getLogger().setLevel(logging.DEBUG)
+    unittest.main()
@@ -4,6 +4,7 @@
 import unittest
 import logging
 import os
+import shutil
 
 # Third party modules.
 
@@ -39,6 +40,32 @@ class Test(unittest.TestCase):
         path = os.path.join(self.basepath, "cost_summary.pdf")
         self.assertTrue(os.path.exists(path))
         os.remove(path)
+        os.remove(os.path.join(self.basepath, ".cost_summary.pdf.sha1"))
+
+    def testgraph_costsummary_cached(self):
+        path = graph.cost_summary(self.basepath, self.metadata, "png")
+        mtime = os.path.getmtime(path)
+
+        self.assertEqual(path, graph.cost_summary(self.basepath, self.metadata, "png"))
+        self.assertEqual(mtime, os.path.getmtime(path))
+
+        os.remove(path)
+        os.remove(os.path.join(self.basepath, ".cost_summary.png.sha1"))
+
+    def testgraph_systemcharts(self):
+        paths = graph.system_charts(self.basepath, self.metadata, "png", processes=2)
+
+        self.assertEqual(2, len(paths))
+        for system in self.metadata.systems:
+            self.assertEqual(3, len(paths[system]))
+            for path in paths[system]:
+                self.assertTrue(os.path.exists(path))
+
+        shutil.rmtree(os.path.join(self.basepath, "charts"))
+
+    def testslice(self):
+        rects = graph._slice([1.0, 3.0], 0.0, 0.0, 1.0, 2.0, True)
+        self.assertEqual([(0.0, 0.0, 1.0, 0.5), (0.0, 0.5, 1.0, 1.5)], rects)
 
 
 if __name__ == "__main__":  # pragma: no cover
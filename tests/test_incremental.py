@@ -0,0 +1,147 @@
+""""""
+
+# Standard library modules.
+import unittest
+import logging
+import os
+import shutil
+import tempfile
+
+# Third party modules.
+
+# Local modules.
+from fsaecostreport.incremental import IncrementalReader, Changes
+
+# Globals and constants variables.
+
+
+def _modify(filepath, old, new):
+    with open(filepath, "r") as fp:
+        content = fp.read()
+
+    stat = os.stat(filepath)
+    with open(filepath, "w") as fp:
+        fp.write(content.replace(old, new))
+
+    # the modification is detected even if the size is the same
+    os.utime(filepath, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+class TestIncrementalReader(unittest.TestCase):
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+
+        testdata = os.path.join(os.path.dirname(os.path.abspath(__file__)), "testdata")
+        self.tmpdir = tempfile.mkdtemp()
+        self.basepath = os.path.join(self.tmpdir, "testdata")
+        shutil.copytree(testdata, self.basepath)
+
+        self.reader = IncrementalReader(self.basepath)
+        self.metadata = self.reader.read()
+        self.tm = self.metadata.systems[1]
+
+        self.part_filepath = os.path.join(
+            self.basepath, "TM", "components", "TM-00001-AA.csv"
+        )
+
+    def tearDown(self):
+        unittest.TestCase.tearDown(self)
+
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def testskeleton(self):
+        self.assertEqual("TM", self.tm.label)
+
+    def testupdate_unchanged(self):
+        changes = self.reader.update()
+        self.assertFalse(changes)
+        self.assertIs(self.metadata, self.reader.metadata)
+
+    def testupdate_part(self):
+        part = self.tm.get_component("TM-00001-AA")
+        _modify(self.part_filepath, "Part,Cup holder", "Part,Mug holder")
+
+        changes = self.reader.update()
+        self.assertFalse(changes.metadata)
+        self.assertEqual(set(), changes.systems)
+        self.assertEqual({"TM"}, changes.labels)
+        self.assertEqual(
+            {"TM-00001-AA", "TM-A0001-AA", "TM-A0002-AA", "TM-A1000-AA"},
+            changes.components["TM"],
+        )
+
+        # updated in place
+        self.assertIs(part, self.tm.get_component("TM-00001-AA"))
+        self.assertEqual("Mug holder", part.name)
+
+        self.assertFalse(self.reader.update())
+
+    def testupdate_part_cost(self):
+        part = self.tm.get_component("TM-00001-AA")
+        assembly = self.tm.get_component("TM-A0001-AA")
+        unitcost = assembly.unitcost
+        _modify(
+            self.part_filepath, "ring,8.8,0.4,kg,,,1,8.8", "ring,8.8,0.4,kg,,,2,17.6"
+        )
+
+        self.reader.update()
+        self.assertAlmostEqual(28.79333333, part.unitcost, 4)
+        self.assertAlmostEqual(unitcost + 2 * 8.8, assembly.unitcost, 4)
+
+    def testupdate_invalid(self):
+        _modify(
+            self.part_filepath, "ring,8.8,0.4,kg,,,1,8.8", "ring,8.8,0.4,kg,,,2,8.8"
+        )
+        self.assertRaises(AssertionError, self.reader.update)
+
+        # the system is read again once fixed
+        _modify(
+            self.part_filepath, "ring,8.8,0.4,kg,,,2,8.8", "ring,8.8,0.4,kg,,,1,8.8"
+        )
+        changes = self.reader.update()
+        self.assertEqual({"TM"}, changes.systems)
+        self.assertEqual(4, len(self.tm.get_components()))
+
+    def testupdate_drawing_added(self):
+        filepath = os.path.join(self.basepath, "TM", "drawings", "TM-A0001-AA.pdf")
+        shutil.copy(
+            os.path.join(self.basepath, "TM", "drawings", "TM-00001-AA.pdf"), filepath
+        )
+
+        changes = self.reader.update()
+        self.assertEqual({"TM"}, changes.systems)
+        self.assertEqual([filepath], self.tm.get_component("TM-A0001-AA").drawings)
+
+    def testupdate_metadata(self):
+        filepath = os.path.join(self.basepath, "introduction.txt")
+        with open(filepath, "a") as fp:
+            fp.write("More\n")
+
+        changes = self.reader.update()
+        self.assertTrue(changes.metadata)
+        self.assertEqual({"FI", "TM"}, changes.systems)
+        self.assertIsNot(self.metadata, self.reader.metadata)
+
+
+class TestChanges(unittest.TestCase):
+    def testto_dict(self):
+        changes = Changes(False, ["FI"], {"TM": {"TM-A1000-AA", "TM-00001-AA"}})
+
+        self.assertTrue(changes)
+        self.assertEqual({"FI", "TM"}, changes.labels)
+        self.assertEqual(
+            {
+                "metadata": False,
+                "systems": ["FI"],
+                "components": {"TM": ["TM-00001-AA", "TM-A1000-AA"]},
+            },
+            changes.to_dict(),
+        )
+
+    def testbool(self):
+        self.assertFalse(Changes())
+
+
+if __name__ == "__main__":  # pragma: no cover
+    logging.getLogger().setLevel(logging.DEBUG)
+    unittest.main()
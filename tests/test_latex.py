@@ -4,11 +4,13 @@
 import unittest
 import logging
 import os.path
+import shutil
+import tempfile
 
 # Third party modules.
 
 # Local modules.
-from fsaecostreport.latex import AuxReader
+from fsaecostreport.latex import AuxReader, IndexedAuxReader, create_tabular
 
 # Globals and constants variables.
 
@@ -24,6 +26,7 @@ class TestAuxReader(unittest.TestCase):
 
     def tearDown(self):
         unittest.TestCase.tearDown(self)
+        shutil.rmtree(os.path.join(self.basepath, "build"), ignore_errors=True)
 
     def testskeleton(self):
         self.assertTrue(True)
@@ -37,6 +40,79 @@ class TestAuxReader(unittest.TestCase):
         self.assertEqual(5, pagerefs["TM-00001-AA"])
 
 
+class TestIndexedAuxReader(unittest.TestCase):
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+
+        self.tmpdir = tempfile.mkdtemp()
+
+        basepath = os.path.join(os.path.dirname(os.path.abspath(__file__)), "testdata")
+        shutil.copy(os.path.join(basepath, "costreport2011.aux"), self.tmpdir)
+
+        with open(os.path.join(self.tmpdir, "child.aux"), "w") as fp:
+            fp.write("\\relax\n")
+            fp.write(
+                "\\newlabel{ct:FI-00001-AA}{{B.1}{12}{Cup holder}{section.2.1}{}}\n"
+            )
+
+        with open(os.path.join(self.tmpdir, "costreport2011.aux"), "a") as fp:
+            fp.write("\\@input{child.aux}\n")
+
+        self.reader = IndexedAuxReader()
+
+    def tearDown(self):
+        unittest.TestCase.tearDown(self)
+        shutil.rmtree(self.tmpdir)
+
+    def testread(self):
+        index = self.reader.read(self.tmpdir)
+
+        self.assertEqual(3, index.get_page("ct", "TM-A1000-AA"))
+        self.assertEqual(12, index.get_page("ct", "FI-00001-AA"))
+        self.assertEqual(8, index.get_page("dwg", "TM-00001-AA-0"))
+        self.assertEqual(9, index.get_page("img", "TM-A0001-AA-0"))
+        self.assertIsNone(index.get_page("ct", "XX-00001-AA"))
+
+    def testread_cache(self):
+        self.reader.read(self.tmpdir)
+        self.assertTrue(
+            os.path.exists(os.path.join(self.tmpdir, "build", "auxindex.json"))
+        )
+
+        index = self.reader.read(self.tmpdir)
+        self.assertEqual(12, index.get_page("ct", "FI-00001-AA"))
+
+        childpath = os.path.join(self.tmpdir, "child.aux")
+        with open(childpath, "w") as fp:
+            fp.write(
+                "\\newlabel{ct:FI-00001-AA}{{B.1}{13}{Cup holder}{section.2.1}{}}\n"
+            )
+        mtime = os.path.getmtime(childpath) + 10
+        os.utime(childpath, (mtime, mtime))
+
+        index = self.reader.read(self.tmpdir)
+        self.assertEqual(13, index.get_page("ct", "FI-00001-AA"))
+
+
+class TestCreateTabular(unittest.TestCase):
+    def testcreate_tabular(self):
+        data = [["a", "b"], [1, 2], [3, 4]]
+        lines = create_tabular(data, header_endrow=1)
+
+        self.assertEqual(r"\begin{tabular}{cc}", lines[0])
+        self.assertEqual(r"a & b\tabularnewline\hline", lines[2])
+        self.assertEqual(7, len(lines))
+
+    def testcreate_tabular_chunks(self):
+        data = [["a", "b"], [1, 2], [3, 4], [5, 6]]
+        lines = create_tabular(data, header_endrow=1, chunks=[3])
+
+        self.assertEqual(2, lines.count(r"\begin{tabular}{cc}"))
+        self.assertEqual(2, lines.count(r"a & b\tabularnewline\hline"))
+        self.assertEqual(1, lines.count(r"\newpage"))
+        self.assertEqual(r"5 & 6\tabularnewline", lines[-3])
+
+
 if __name__ == "__main__":  # pragma: no cover
     logging.getLogger().setLevel(logging.DEBUG)
     unittest.main()
@@ -0,0 +1,79 @@
+""""""
+
+# Standard library modules.
+import unittest
+import logging
+import os
+import shutil
+
+# Third party modules.
+
+# Local modules.
+from fsaecostreport.reader import SystemFileReader, MetadataReader
+from fsaecostreport.latex import AuxIndex, IndexedAuxReader
+from fsaecostreport.layout import PageEstimator, reconcile, _Cursor
+
+# Globals and constants variables.
+
+
+class TestPageEstimator(unittest.TestCase):
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+
+        self.basepath = os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), "testdata"
+        )
+
+        self.metadata = MetadataReader().read(self.basepath)
+
+        for system in self.metadata.systems:
+            SystemFileReader().read(self.basepath, system)
+
+        self.estimator = PageEstimator()
+
+    def tearDown(self):
+        unittest.TestCase.tearDown(self)
+
+    def testskeleton(self):
+        self.assertTrue(True)
+
+    def testestimate(self):
+        # the .aux file of the test data only has the TM system
+        self.metadata.systems = [
+            system for system in self.metadata.systems if system.label == "TM"
+        ]
+
+        estimate = self.estimator.estimate(self.metadata)
+        index = IndexedAuxReader(cache=False).read(self.basepath)
+
+        for prefix in ["ct", "dwg", "img"]:
+            self.assertEqual(index.get_pagerefs(prefix), estimate.get_pagerefs(prefix))
+
+    def testestimate_systems(self):
+        estimate = self.estimator.estimate(self.metadata)
+
+        self.assertEqual(3, estimate.get_page("ct", "FI-A0001-AA"))
+        self.assertEqual(9, estimate.get_page("ct", "TM-A1000-AA"))
+
+    def testestimate_costtables_assembly(self):
+        component = self.metadata.systems[1].get_component("TM-A0001-AA")
+        cursor = _Cursor()
+        self.estimator._estimate_costtables(component, cursor, AuxIndex())
+
+        # heading, then parts (1), materials (2), processes (2) and
+        # toolings (1) tables, each with a header and a total row
+        self.assertAlmostEqual(2.5 + 4 * 2.0 + 14 * 1.5, cursor.used)
+
+    def testreconcile(self):
+        estimate = AuxIndex({"ct": {"TM-A1000-AA": 3, "FI-00001-AA": 4}})
+        index = AuxIndex({"ct": {"TM-A1000-AA": 5}})
+
+        pagerefs = reconcile(estimate, index)
+
+        self.assertEqual(5, pagerefs["TM-A1000-AA"])
+        self.assertEqual(4, pagerefs["FI-00001-AA"])
+
+
+if __name__ == "__main__":  # pragma: no cover
+    logging.getLogger().setLevel(logging.DEBUG)
+    unittest.main()
@@ -0,0 +1,86 @@
+""""""
+
+# Standard library modules.
+import unittest
+import logging
+import os
+import json
+import shutil
+import tempfile
+import tracemalloc
+
+# Third party modules.
+
+# Local modules.
+from fsaecostreport.memory import trace_call, write_report
+from fsaecostreport.pipeline import Pipeline
+
+# Globals and constants variables.
+
+
+def _allocate(n):
+    return [str(i) for i in range(n)]
+
+
+class TestMemory(unittest.TestCase):
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        unittest.TestCase.tearDown(self)
+        shutil.rmtree(self.tmpdir)
+
+    def testskeleton(self):
+        self.assertTrue(True)
+
+    def testtrace_call(self):
+        result, stats = trace_call(_allocate, 10000, top=3)
+
+        self.assertEqual(10000, len(result))
+        self.assertGreater(stats["peak"], 10000 * 40)
+        self.assertGreaterEqual(stats["peak"], stats["current"])
+        self.assertLessEqual(len(stats["top"]), 3)
+        self.assertEqual(__file__, stats["top"][0]["filename"])
+
+    def testtrace_call_without_reset_peak(self):
+        # Python < 3.9, while the memory is already traced
+        reset_peak = getattr(tracemalloc, "reset_peak", None)
+        if reset_peak is not None:
+            del tracemalloc.reset_peak
+        tracemalloc.start()
+        try:
+            _allocate(10000)
+            _result, stats = trace_call(_allocate, 10)
+        finally:
+            tracemalloc.stop()
+            if reset_peak is not None:
+                tracemalloc.reset_peak = reset_peak
+
+        self.assertLess(stats["peak"], 10000 * 40)
+
+    def testwrite_report(self):
+        _result, stats = trace_call(_allocate, 10)
+
+        filepath = os.path.join(self.tmpdir, "build", "memory.json")
+        write_report(filepath, {"allocate": stats})
+
+        with open(filepath, "r") as fp:
+            report = json.load(fp)
+        self.assertEqual(stats["peak"], report["stages"]["allocate"]["peak"])
+
+    def testpipeline(self):
+        pipeline = Pipeline(processes=2, trace_memory=True)
+        pipeline.add_stage("a", _allocate, (100,))
+        pipeline.add_stage("b", _allocate, (1000,))
+        pipeline.call("c", _allocate, 10)
+        pipeline.run()
+
+        self.assertEqual({"a", "b", "c"}, set(pipeline.memory))
+        self.assertGreater(pipeline.memory["b"]["peak"], 0)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    logging.getLogger().setLevel(logging.DEBUG)
+    unittest.main()
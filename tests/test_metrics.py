@@ -0,0 +1,104 @@
+""""""
+
+# Standard library modules.
+import unittest
+import logging
+import os
+import shutil
+import tempfile
+
+# Third party modules.
+
+# Local modules.
+import fsaecostreport.metrics as metrics
+from fsaecostreport.metrics import Metrics
+from fsaecostreport.pipeline import Pipeline
+from fsaecostreport.reader import SystemFileReader, MetadataReader
+
+# Globals and constants variables.
+
+
+def _count(n):
+    metrics.inc("calls")
+    metrics.inc("rows", n, kind="test")
+    return n
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+
+        metrics.registry.clear()
+
+        self.metrics = Metrics()
+        self.metrics.inc("files_read", kind="component")
+        self.metrics.inc("files_read", 2, kind="component")
+        self.metrics.set("components", 4, system="TM")
+
+    def tearDown(self):
+        unittest.TestCase.tearDown(self)
+        metrics.registry.clear()
+
+    def testskeleton(self):
+        self.assertTrue(True)
+
+    def testget(self):
+        self.assertEqual(3, self.metrics.get("files_read", kind="component"))
+        self.assertEqual(4, self.metrics.get("components", system="TM"))
+        self.assertEqual(0, self.metrics.get("files_read", kind="config"))
+
+    def testformat_summary(self):
+        summary = self.metrics.format_summary()
+
+        self.assertEqual(2, len(summary.splitlines()))
+        self.assertIn("kind=component", summary)
+
+    def testwrite_textfile(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            filepath = os.path.join(tmpdir, "metrics.prom")
+            self.metrics.write_textfile(filepath)
+
+            with open(filepath, "r") as fp:
+                lines = fp.read().splitlines()
+        finally:
+            shutil.rmtree(tmpdir)
+
+        self.assertIn("# TYPE fsaecostreport_components gauge", lines)
+        self.assertIn('fsaecostreport_components{system="TM"} 4', lines)
+        self.assertIn('fsaecostreport_files_read_total{kind="component"} 3', lines)
+
+    def testcall_counted(self):
+        metrics.inc("calls")
+
+        result, recorded = metrics.call_counted(_count, 5)
+
+        self.assertEqual(5, result)
+        self.assertEqual(1, recorded.get("calls"))
+        self.assertEqual(5, recorded.get("rows", kind="test"))
+        self.assertEqual(1, metrics.registry.get("calls"))
+
+    def testpipeline(self):
+        pipeline = Pipeline(processes=2)
+        pipeline.add_stage("a", _count, (2,))
+        pipeline.add_stage("b", _count, (3,))
+        pipeline.call("c", _count, 4)
+        pipeline.run()
+
+        self.assertEqual(3, metrics.registry.get("calls"))
+        self.assertEqual(9, metrics.registry.get("rows", kind="test"))
+
+    def testreader(self):
+        basepath = os.path.join(os.path.dirname(os.path.abspath(__file__)), "testdata")
+        metadata = MetadataReader().read(basepath)
+        for system in metadata.systems:
+            SystemFileReader().read(basepath, system)
+
+        self.assertEqual(1, metrics.registry.get("files_read", kind="config"))
+        self.assertEqual(4, metrics.registry.get("components", system="TM"))
+        self.assertGreater(metrics.registry.get("rows_parsed", kind="component"), 0)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    logging.getLogger().setLevel(logging.DEBUG)
+    unittest.main()
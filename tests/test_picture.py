@@ -0,0 +1,90 @@
+""""""
+
+# Standard library modules.
+import unittest
+import logging
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+# Third party modules.
+from PIL import Image
+
+# Local modules.
+from fsaecostreport.reader import SystemFileReader, MetadataReader
+from fsaecostreport.picture import prepare_pictures, hash_file, get_digest
+
+# Globals and constants variables.
+
+
+class TestPicture(unittest.TestCase):
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+
+        self.basepath = os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), "testdata"
+        )
+
+        self.metadata = MetadataReader().read(self.basepath)
+
+        for system in self.metadata.systems:
+            SystemFileReader().read(self.basepath, system)
+
+    def tearDown(self):
+        unittest.TestCase.tearDown(self)
+
+        shutil.rmtree(os.path.join(self.basepath, "build"), ignore_errors=True)
+
+    def testskeleton(self):
+        self.assertTrue(True)
+
+    def testprepare_pictures(self):
+        pictures = prepare_pictures(self.basepath, self.metadata, dpi=10, processes=1)
+
+        self.assertEqual(1, len(pictures))
+        src, dst = list(pictures.items())[0]
+        self.assertTrue(dst.startswith("build/pictures/"))
+
+        filepath = os.path.join(self.basepath, dst)
+        with Image.open(filepath) as image:
+            self.assertLessEqual(image.size[0], 100)
+            self.assertLessEqual(image.size[1], 50)
+
+        # cached
+        mtime = os.path.getmtime(filepath)
+        self.assertEqual(pictures, prepare_pictures(self.basepath, self.metadata, 10))
+        self.assertEqual(mtime, os.path.getmtime(filepath))
+
+    def testhash_file(self):
+        filepath = os.path.join(self.basepath, "introduction.txt")
+        self.assertEqual(40, len(hash_file(filepath)))
+        self.assertEqual(hash_file(filepath), hash_file(filepath, blocksize=7))
+
+    def testget_digest(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        filepath = os.path.join(tmpdir, "drawing.pdf")
+        with open(filepath, "wb") as fp:
+            fp.write(b"abc")
+
+        with mock.patch(
+            "fsaecostreport.picture.hash_file", side_effect=hash_file
+        ) as mocked:
+            digest = get_digest(filepath)
+            self.assertEqual(hash_file(filepath), digest)
+            self.assertEqual(digest, get_digest(filepath))
+            self.assertEqual(1, mocked.call_count)
+
+            # hashed again once modified
+            stat = os.stat(filepath)
+            with open(filepath, "wb") as fp:
+                fp.write(b"abd")
+            os.utime(filepath, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+            self.assertNotEqual(digest, get_digest(filepath))
+            self.assertEqual(2, mocked.call_count)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    logging.getLogger().setLevel(logging.DEBUG)
+    unittest.main()
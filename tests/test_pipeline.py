@@ -0,0 +1,148 @@
+""""""
+
+# Standard library modules.
+import unittest
+import logging
+import os
+import glob
+import shutil
+import tempfile
+import multiprocessing
+
+# Third party modules.
+
+# Local modules.
+from fsaecostreport.pipeline import Pipeline, PipelineError, get_model, set_model
+import fsaecostreport.pipeline as pipeline_module
+from fsaecostreport.reader import MetadataReader, SystemFileReader
+
+# Globals and constants variables.
+
+
+def _add(a, b):
+    return a + b
+
+
+def _fail():
+    raise ValueError("failed")
+
+
+def _count_systems(basepath, labels):
+    return len(get_model(basepath, labels).systems)
+
+
+def _count_components(basepath, labels):
+    metadata = get_model(basepath, labels)
+    return sum(len(system.get_components()) for system in metadata.systems)
+
+
+class TestPipeline(unittest.TestCase):
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+
+        self.basepath = os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), "testdata"
+        )
+
+    def tearDown(self):
+        unittest.TestCase.tearDown(self)
+
+    def testskeleton(self):
+        self.assertTrue(True)
+
+    def testrun(self):
+        pipeline = Pipeline(processes=2)
+        pipeline.add_stage("a", _add, (1, 2))
+        pipeline.add_stage("b", _add, (3,), {"b": 4}, requires=["a"])
+        pipeline.add_stage("c", _count_systems, (self.basepath, ["TM"]))
+
+        results = pipeline.run()
+
+        self.assertEqual({"a": 3, "b": 7, "c": 1}, results)
+        self.assertEqual({"a", "b", "c"}, set(pipeline.timings))
+
+    def testrun_sequential(self):
+        pipeline = Pipeline(processes=1)
+        pipeline.add_stage("a", _add, (1, 2))
+        pipeline.add_stage("b", _add, (3, 4), requires=["a"])
+
+        self.assertEqual({"a": 3, "b": 7}, pipeline.run())
+
+    def testrun_failure(self):
+        for processes in [1, 2]:
+            pipeline = Pipeline(processes)
+            pipeline.add_stage("a", _fail)
+            pipeline.add_stage("b", _add, (1, 2), requires=["a"])
+
+            with self.assertRaises(PipelineError) as cm:
+                pipeline.run()
+
+            self.assertEqual("a", cm.exception.stage)
+            self.assertEqual(["b"], cm.exception.skipped)
+            self.assertIsInstance(cm.exception.__cause__, ValueError)
+
+    def testrun_keep_going(self):
+        for processes in [1, 2]:
+            pipeline = Pipeline(processes, keep_going=True)
+            pipeline.add_stage("a", _fail)
+            pipeline.add_stage("b", _add, (1, 2), requires=["a"])
+            pipeline.add_stage("c", _add, (3, 4))
+
+            self.assertEqual({"c": 7}, pipeline.run())
+            self.assertEqual({"a"}, set(pipeline.errors))
+            self.assertIsInstance(pipeline.errors["a"], ValueError)
+            self.assertEqual(["b"], pipeline.skipped)
+
+    def _set_model_without_files(self):
+        # the files are removed once the model is read, so that a worker
+        # reading it again would find no component
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir, ignore_errors=True)
+        self.addCleanup(pipeline_module._models.clear)
+
+        basepath = os.path.join(tmpdir, "testdata")
+        shutil.copytree(self.basepath, basepath)
+
+        metadata = MetadataReader().read(basepath)
+        for system in metadata.systems:
+            SystemFileReader().read(basepath, system)
+        set_model(basepath, metadata)
+
+        for filepath in glob.glob(os.path.join(basepath, "*", "components", "*")):
+            os.remove(filepath)
+
+        return basepath, [system.label for system in metadata.systems]
+
+    def testrun_spawn(self):
+        basepath, labels = self._set_model_without_files()
+
+        method = multiprocessing.get_start_method()
+        multiprocessing.set_start_method("spawn", force=True)
+        try:
+            pipeline = Pipeline(processes=2)
+            pipeline.add_stage("a", _count_components, (basepath, labels))
+            pipeline.add_stage("b", _count_components, (basepath, labels))
+            results = pipeline.run()
+        finally:
+            multiprocessing.set_start_method(method, force=True)
+
+        self.assertEqual({"a": 6, "b": 6}, results)
+        self.assertEqual(6, _count_components(basepath, labels))
+
+    def testinit_worker(self):
+        basepath, labels = self._set_model_without_files()
+
+        payloads = pipeline_module._dump_models()
+        pipeline_module._models.clear()
+        pipeline_module._init_worker(payloads)
+
+        self.assertEqual(6, _count_components(basepath, labels))
+
+    def testadd_stage_unknown(self):
+        pipeline = Pipeline()
+        self.assertRaises(ValueError, pipeline.add_stage, "a", _add, requires=["b"])
+
+
+if __name__ == "__main__":  # pragma: no cover
+    logging.getLogger().setLevel(logging.DEBUG)
+    unittest.main()
@@ -0,0 +1,67 @@
+""""""
+
+# Standard library modules.
+import unittest
+import logging
+import os
+import io
+import shutil
+import tempfile
+
+# Third party modules.
+
+# Local modules.
+from fsaecostreport.profiling import profile_call, print_summary
+from fsaecostreport.pipeline import Pipeline
+
+# Globals and constants variables.
+
+
+def _add(a, b):
+    return a + b
+
+
+class TestProfiling(unittest.TestCase):
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+
+        self.tmpdir = tempfile.mkdtemp()
+        self.profile_dir = os.path.join(self.tmpdir, "profile")
+
+    def tearDown(self):
+        unittest.TestCase.tearDown(self)
+        shutil.rmtree(self.tmpdir)
+
+    def testskeleton(self):
+        self.assertTrue(True)
+
+    def testprofile_call(self):
+        result = profile_call(self.profile_dir, "add", _add, 1, b=2)
+
+        self.assertEqual(3, result)
+        self.assertTrue(os.path.exists(os.path.join(self.profile_dir, "add.pstats")))
+
+    def testprint_summary(self):
+        profile_call(self.profile_dir, "add", _add, 1, 2)
+
+        stream = io.StringIO()
+        print_summary(self.profile_dir, ["add", "missing"], top=5, stream=stream)
+
+        self.assertIn("Stage add", stream.getvalue())
+        self.assertIn("_add", stream.getvalue())
+        self.assertNotIn("Stage missing", stream.getvalue())
+
+    def testpipeline(self):
+        pipeline = Pipeline(processes=2, profile_dir=self.profile_dir)
+        pipeline.add_stage("a", _add, (1, 2))
+        pipeline.add_stage("b", _add, (3, 4))
+        pipeline.run()
+
+        for name in ["a", "b"]:
+            path = os.path.join(self.profile_dir, name + ".pstats")
+            self.assertTrue(os.path.exists(path))
+
+
+if __name__ == "__main__":  # pragma: no cover
+    logging.getLogger().setLevel(logging.DEBUG)
+    unittest.main()
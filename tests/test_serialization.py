@@ -0,0 +1,162 @@
+""""""
+
+# Standard library modules.
+import unittest
+import logging
+import os
+import shutil
+import tempfile
+import sys
+
+# Third party modules.
+
+# Local modules.
+from fsaecostreport.serialization import (
+    dumps,
+    loads,
+    dump,
+    load,
+    create_sections,
+    pack_sections,
+    ModelFile,
+)
+from fsaecostreport.reader import MetadataReader, SystemFileReader
+
+# Globals and constants variables.
+
+
+class TestSerialization(unittest.TestCase):
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+
+        self.basepath = os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), "testdata"
+        )
+
+        self.metadata = MetadataReader().read(self.basepath)
+        for system in self.metadata.systems:
+            SystemFileReader().read(self.basepath, system)
+
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        unittest.TestCase.tearDown(self)
+
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def testskeleton(self):
+        self.assertEqual(2, len(self.metadata.systems))
+
+    def _assert_metadata_equal(self, expected, actual):
+        self.assertEqual(expected.filename, actual.filename)
+        self.assertEqual(expected.introduction, actual.introduction)
+        self.assertEqual(
+            [(system.label, system.name, system.colour) for system in expected.systems],
+            [(system.label, system.name, system.colour) for system in actual.systems],
+        )
+        self.assertEqual(
+            dict((system.label, parts) for system, parts in expected.sae_parts.items()),
+            dict((system.label, parts) for system, parts in actual.sae_parts.items()),
+        )
+
+        for system, other in zip(expected.systems, actual.systems):
+            self.assertEqual(
+                [component.pn for component in system.get_hierarchy()],
+                [component.pn for component in other.get_hierarchy()],
+            )
+
+            for component in system.get_components():
+                loaded = other.get_component(component.pn)
+                self.assertIsInstance(loaded, type(component))
+                self.assertEqual(component.name, loaded.name)
+                self.assertEqual(component.details, loaded.details)
+                self.assertEqual(component.filepath, loaded.filepath)
+                self.assertEqual(component.drawings, loaded.drawings)
+                self.assertEqual(component.pictures, loaded.pictures)
+                self.assertEqual(component.quantity, loaded.quantity)
+                self.assertEqual(component.unitcost, loaded.unitcost)
+                self.assertEqual(
+                    dict((c.pn, qty) for c, qty in component.components.items()),
+                    dict((c.pn, qty) for c, qty in loaded.components.items()),
+                )
+                self.assertEqual(
+                    {parent.pn for parent in component.parents},
+                    {parent.pn for parent in loaded.parents},
+                )
+
+                for attr in ["materials", "processes", "fasteners", "toolings"]:
+                    self.assertEqual(
+                        [vars(item) for item in getattr(component, attr)],
+                        [vars(item) for item in getattr(loaded, attr)],
+                    )
+
+    def testdumps_loads(self):
+        metadata = loads(dumps(self.metadata))
+        self._assert_metadata_equal(self.metadata, metadata)
+
+    def testdump_load(self):
+        filepath = os.path.join(self.tmpdir, "model.bin")
+        dump(self.metadata, filepath)
+
+        for use_mmap in [False, True]:
+            metadata = load(filepath, use_mmap)
+            self._assert_metadata_equal(self.metadata, metadata)
+
+    def testloads_selected_systems(self):
+        self.metadata.systems = self.metadata.systems[1:]
+
+        metadata = loads(dumps(self.metadata))
+        self.assertEqual(["TM"], [system.label for system in metadata.systems])
+        self.assertEqual({"FI", "TM"}, {system.label for system in metadata.sae_parts})
+
+    def testloads_deep_assemblies(self):
+        # no recursion through the parents and components
+        limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(100)
+        try:
+            loads(dumps(self.metadata))
+        finally:
+            sys.setrecursionlimit(limit)
+
+    def testmodelfile_mmap(self):
+        filepath = os.path.join(self.tmpdir, "model.bin")
+        dump(self.metadata, filepath)
+
+        with ModelFile.open(filepath, use_mmap=True) as modelfile:
+            edges = modelfile.get_ints("edges")
+            self.assertEqual("i", edges.format)
+            self.assertEqual(0, len(edges) % 3)
+
+            floats = modelfile.get_floats("mat.f")
+            self.assertEqual("d", floats.format)
+            self.assertEqual(0, len(floats) % 4)
+
+            edges.release()
+            floats.release()
+
+    def testpack_sections(self):
+        data = pack_sections({"a": b"abc", "b": b"defgh"})
+
+        modelfile = ModelFile(data)
+        self.assertEqual(b"abc", bytes(modelfile.get_bytes("a")))
+        self.assertEqual(b"defgh", bytes(modelfile.get_bytes("b")))
+        self.assertTrue(modelfile.has_section("b"))
+        self.assertFalse(modelfile.has_section("c"))
+
+    def testcreate_sections(self):
+        sections = create_sections(self.metadata)
+        for name, content in sections.items():
+            self.assertLessEqual(len(name), 8)
+            self.assertIsInstance(content, bytes)
+
+    def testloads_invalid(self):
+        self.assertRaises(ValueError, loads, b"\0" * 64)
+
+        data = bytearray(dumps(self.metadata))
+        data[8] = 99  # version
+        self.assertRaises(ValueError, loads, bytes(data))
+
+
+if __name__ == "__main__":  # pragma: no cover
+    logging.getLogger().setLevel(logging.DEBUG)
+    unittest.main()
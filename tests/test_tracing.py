@@ -0,0 +1,94 @@
+""""""
+
+# Standard library modules.
+import unittest
+import logging
+import os
+import json
+import shutil
+import tempfile
+
+# Third party modules.
+
+# Local modules.
+import fsaecostreport.tracing as tracing
+from fsaecostreport.pipeline import Pipeline
+
+# Globals and constants variables.
+
+
+def _traced(name):
+    with tracing.span(name, "test"):
+        return os.getpid()
+
+
+class TestTracing(unittest.TestCase):
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+
+        self.tmpdir = tempfile.mkdtemp()
+        tracing.clear()
+        tracing.enable()
+
+    def tearDown(self):
+        unittest.TestCase.tearDown(self)
+        tracing.disable()
+        tracing.clear()
+        shutil.rmtree(self.tmpdir)
+
+    def testskeleton(self):
+        self.assertTrue(True)
+
+    def testspan(self):
+        with tracing.span("a", "test", value=1):
+            pass
+
+        events = tracing.get_events()
+        self.assertEqual(1, len(events))
+        self.assertEqual("a", events[0]["name"])
+        self.assertEqual("X", events[0]["ph"])
+        self.assertEqual(os.getpid(), events[0]["pid"])
+        self.assertEqual({"value": 1}, events[0]["args"])
+
+    def testspan_disabled(self):
+        tracing.disable()
+
+        with tracing.span("a"):
+            pass
+
+        self.assertEqual([], tracing.get_events())
+
+    def testcall_traced(self):
+        result, events = tracing.call_traced(_traced, "a")
+
+        self.assertEqual(os.getpid(), result)
+        self.assertEqual(["a"], [event["name"] for event in events])
+        self.assertEqual([], tracing.get_events())
+
+    def testwrite_trace(self):
+        _traced("a")
+
+        filepath = os.path.join(self.tmpdir, "build", "trace.json")
+        tracing.write_trace(filepath)
+
+        with open(filepath, "r") as fp:
+            trace = json.load(fp)
+
+        names = [event["name"] for event in trace["traceEvents"]]
+        self.assertEqual(["process_name", "a"], names)
+
+    def testpipeline(self):
+        pipeline = Pipeline(processes=2)
+        pipeline.add_stage("a", _traced, ("span_a",))
+        pipeline.add_stage("b", _traced, ("span_b",))
+        results = pipeline.run()
+
+        events = dict((event["name"], event) for event in tracing.get_events())
+        self.assertEqual(results["a"], events["span_a"]["pid"])
+        self.assertEqual(results["a"], events["a"]["pid"])
+        self.assertNotEqual(os.getpid(), events["span_b"]["pid"])
+
+
+if __name__ == "__main__":  # pragma: no cover
+    logging.getLogger().setLevel(logging.DEBUG)
+    unittest.main()
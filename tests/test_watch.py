@@ -0,0 +1,168 @@
+""""""
+
+# Standard library modules.
+import unittest
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import json
+
+# Third party modules.
+
+# Local modules.
+from fsaecostreport.watch import Watcher, invalidate_writers
+from fsaecostreport.incremental import IncrementalReader, Changes
+from fsaecostreport.writer import eBOMWriter
+import fsaecostreport.tracing as tracing
+
+from test_incremental import _modify
+
+# Globals and constants variables.
+
+
+class _Writer(object):
+    def __init__(self):
+        self.invalidated = []
+        self.written = 0
+
+    def invalidate(self, labels=None):
+        self.invalidated.append(labels)
+
+    def write(self, basepath, metadata):
+        self.written += 1
+
+
+class TestWatcher(unittest.TestCase):
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+
+        testdata = os.path.join(os.path.dirname(os.path.abspath(__file__)), "testdata")
+        self.tmpdir = tempfile.mkdtemp()
+        self.basepath = os.path.join(self.tmpdir, "testdata")
+        shutil.copytree(testdata, self.basepath)
+
+        self.reader = IncrementalReader(self.basepath)
+        self.reader.read()
+
+        self.ebom = eBOMWriter(reuse_rows=True)
+        self.writer = _Writer()
+        self.watcher = Watcher(
+            self.basepath,
+            self.reader,
+            [("ebom", self.ebom), ("other", self.writer)],
+            poll_interval=0.01,
+            debounce=0.05,
+        )
+
+        self.part_filepath = os.path.join(
+            self.basepath, "TM", "components", "TM-00001-AA.csv"
+        )
+
+    def tearDown(self):
+        unittest.TestCase.tearDown(self)
+
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def testskeleton(self):
+        self.assertEqual(self.reader.scan(), self.reader.signatures)
+
+    def testwait(self):
+        _modify(self.part_filepath, "Part,Cup holder", "Part,Mug holder")
+
+        changes = self.watcher.wait()
+        self.assertEqual({"TM"}, changes.labels)
+        self.assertEqual(
+            "Mug holder",
+            self.reader.metadata.systems[1].get_component("TM-00001-AA").name,
+        )
+
+    def testwait_debounce(self):
+        # modified again during the debounce delay: read once
+        def modify():
+            _modify(self.part_filepath, "Part,Mug holder", "Part,Tea holder")
+
+        _modify(self.part_filepath, "Part,Cup holder", "Part,Mug holder")
+        timer = threading.Timer(0.03, modify)
+        timer.start()
+
+        changes = self.watcher.wait()
+        timer.join()
+
+        self.assertEqual({"TM"}, changes.labels)
+        part = self.reader.metadata.systems[1].get_component("TM-00001-AA")
+        self.assertEqual("Tea holder", part.name)
+
+    def testwait_stop(self):
+        timer = threading.Timer(0.05, self.watcher.stop)
+        timer.start()
+
+        self.assertIsNone(self.watcher.wait())
+        timer.join()
+
+    def testwait_invalid(self):
+        _modify(
+            self.part_filepath, "ring,8.8,0.4,kg,,,1,8.8", "ring,8.8,0.4,kg,,,2,8.8"
+        )
+        self.assertRaises(AssertionError, self.watcher.wait)
+
+        # not read again until modified again
+        timer = threading.Timer(0.1, self.watcher.stop)
+        timer.start()
+        self.assertIsNone(self.watcher.wait())
+        timer.join()
+
+    def testregenerate(self):
+        self.watcher.regenerate(Changes())
+        filepath = os.path.join(self.basepath, self.reader.metadata.filename + ".csv")
+        with open(filepath, "r") as fp:
+            self.assertNotIn("Mug holder", fp.read())
+
+        _modify(self.part_filepath, "Part,Cup holder", "Part,Mug holder")
+        changes = self.watcher.wait()
+        durations = self.watcher.regenerate(changes)
+
+        self.assertEqual({"ebom", "other"}, set(durations))
+        self.assertEqual([set(), {"TM"}], self.writer.invalidated)
+        self.assertEqual(2, self.writer.written)
+        with open(filepath, "r") as fp:
+            self.assertIn("Mug holder", fp.read())
+
+    def testrun_export(self):
+        self.watcher.trace_file = os.path.join(self.tmpdir, "trace.json")
+        self.watcher.metrics_textfile = os.path.join(self.tmpdir, "metrics.prom")
+
+        tracing.enable()
+        self.addCleanup(tracing.disable)
+        self.addCleanup(tracing.clear)
+
+        # stopped once the outputs are regenerated
+        def regenerate(changes):
+            self.watcher.stop()
+            with tracing.span("regenerate"):
+                return {}
+
+        self.watcher.regenerate = regenerate
+        _modify(self.part_filepath, "Part,Cup holder", "Part,Mug holder")
+
+        thread = threading.Thread(target=self.watcher.run)
+        thread.start()
+        thread.join(10.0)
+        self.assertFalse(thread.is_alive())
+
+        with open(self.watcher.trace_file, "r") as fp:
+            trace = json.load(fp)
+        names = [event["name"] for event in trace["traceEvents"]]
+        self.assertIn("regenerate", names)
+        self.assertEqual([], tracing.get_events())
+        self.assertTrue(os.path.exists(self.watcher.metrics_textfile))
+
+    def testinvalidate_writers_metadata(self):
+        invalidate_writers([self.writer, object()], Changes(True, ["FI", "TM"]))
+        self.assertEqual([None], self.writer.invalidated)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    logging.getLogger().setLevel(logging.DEBUG)
+    unittest.main()
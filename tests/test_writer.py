@@ -4,36 +4,62 @@
 import unittest
 import logging
 import os.path
+import shutil
+import tempfile
 
 # Third party modules.
+from openpyxl import load_workbook
 
 # Local modules.
 from fsaecostreport.writer import (
     eBOMWriter,
+    eBOMXLSXWriter,
     CostReportLaTeXWriter,
     FSGBOMWriter,
     FSGAppendixLaTeXWriter,
+    BOM_TABLESPEC,
+    _compute_chunks,
 )
 from fsaecostreport.reader import SystemFileReader, MetadataReader
 
 # Globals and constants variables.
 
 
+def _read_workbook_values(filepath):
+    wb = load_workbook(filepath)
+
+    values = {}
+    for sheet in wb.worksheets:
+        for row in sheet.iter_rows():
+            for cell in row:
+                if cell.value is not None:
+                    values[(sheet.title, cell.coordinate)] = (
+                        cell.value,
+                        cell.font.b,
+                        cell.number_format,
+                    )
+
+    return values
+
+
 class TesteBOMWriter(unittest.TestCase):
     def setUp(self):
         unittest.TestCase.setUp(self)
 
-        basepath = os.path.join(os.path.dirname(os.path.abspath(__file__)), "testdata")
+        self.basepath = os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), "testdata"
+        )
 
-        self.metadata = MetadataReader().read(basepath)
+        self.metadata = MetadataReader().read(self.basepath)
 
         for system in self.metadata.systems:
-            SystemFileReader().read(basepath, system)
+            SystemFileReader().read(self.basepath, system)
 
         self.writer = eBOMWriter()
 
     def tearDown(self):
         unittest.TestCase.tearDown(self)
+        shutil.rmtree(os.path.join(self.basepath, "build"), ignore_errors=True)
 
     def testskeleton(self):
         self.assertTrue(True)
@@ -42,6 +68,80 @@ class TesteBOMWriter(unittest.TestCase):
         rows = self.writer._create_rows(self.metadata, {})
         self.assertEqual(15, len(rows))
 
+    def testwrite_totals(self):
+        rows = self.writer._create_rows(self.metadata, {})
+
+        area_totals = [row[13] for row in rows if row[5] == "Area Total"]
+        self.assertEqual(2, len(area_totals))
+        self.assertAlmostEqual(sum(area_totals), rows[0][14], 4)
+        self.assertAlmostEqual(rows[0][14], rows[-1][13], 4)
+
+    def testwrite_reuse_rows(self):
+        writer = eBOMWriter(reuse_rows=True)
+        writer._create_rows(self.metadata, {})
+
+        tm = self.metadata.systems[1]
+        part = tm.get_component("TM-00001-AA")
+        name = part.name
+        part.name = "Mug holder"
+        try:
+            rows = writer._create_rows(self.metadata, {})
+            self.assertNotIn("Mug holder", [row[5] for row in rows])
+
+            writer.invalidate(["TM"])
+            rows = writer._create_rows(self.metadata, {})
+            self.assertIn("Mug holder", [row[5] for row in rows])
+        finally:
+            part.name = name
+
+        # all the rows are computed again when the page references change
+        rows = writer._create_rows(self.metadata, {"TM-00001-AA": 7})
+        self.assertIn(7, [row[14] for row in rows])
+
+    def testread_pagerefs_estimate(self):
+        writer = eBOMWriter(estimate_pages=True)
+        pagerefs = writer._read_pagerefs(self.basepath, self.metadata)
+
+        # estimated, not in the .aux file
+        self.assertEqual(3, pagerefs["FI-A0001-AA"])
+        # from the .aux file
+        self.assertEqual(3, pagerefs["TM-A1000-AA"])
+
+
+class TesteBOMXLSXWriter(unittest.TestCase):
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+
+        self.basepath = os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), "testdata"
+        )
+
+        self.metadata = MetadataReader().read(self.basepath)
+
+        for system in self.metadata.systems:
+            SystemFileReader().read(self.basepath, system)
+
+        self.writer = eBOMXLSXWriter()
+
+    def tearDown(self):
+        unittest.TestCase.tearDown(self)
+        shutil.rmtree(os.path.join(self.basepath, "build"), ignore_errors=True)
+
+    def testskeleton(self):
+        self.assertTrue(True)
+
+    def testwrite(self):
+        self.writer.write(self.basepath, self.metadata)
+
+        filepath = os.path.join(
+            self.basepath, "049_McGill University_FSAEM_CR_eBOM.xlsx"
+        )
+        wb = load_workbook(filepath)
+        os.remove(filepath)
+
+        self.assertEqual(15, wb["eBOM"].max_row)
+        self.assertEqual("University", wb["eBOM"]["A1"].value)
+
 
 class TestCostReportLaTeXWriter(unittest.TestCase):
     def setUp(self):
@@ -61,6 +161,11 @@ class TestCostReportLaTeXWriter(unittest.TestCase):
     def tearDown(self):
         unittest.TestCase.tearDown(self)
 
+        for filename in ["cost_summary.pdf", ".cost_summary.pdf.sha1"]:
+            filepath = os.path.join(self.basepath, filename)
+            if os.path.exists(filepath):
+                os.remove(filepath)
+
     def testskeleton(self):
         self.assertTrue(True)
 
@@ -68,6 +173,79 @@ class TestCostReportLaTeXWriter(unittest.TestCase):
         lines = self.writer._write(self.basepath, self.metadata)
         self.assertEqual(443, len(lines))
 
+    def testwrite_chunks(self):
+        writer = CostReportLaTeXWriter(chunk_size=2)
+        lines = writer._write(self.basepath, self.metadata)
+
+        self.assertNotIn(r"\begin{longtable}[l]{%s}" % BOM_TABLESPEC, lines)
+        self.assertEqual(7, lines.count(r"\begin{tabular}{%s}" % BOM_TABLESPEC))
+
+    def testcompute_chunks(self):
+        header = [r"\color{white} Component"]
+        assembly = [r"\hline\rowcolor[gray]{.9}{Assembly}"]
+        part = ["Part"]
+        rows = [header, assembly, part, assembly, part, part]
+
+        self.assertEqual([3, 5], _compute_chunks(rows, 1, 2))
+        self.assertEqual([3], _compute_chunks(rows, 1, 3))
+        self.assertEqual([], _compute_chunks(rows, 1, 5))
+
+    def testwrite_split(self):
+        writer = CostReportLaTeXWriter(include_only=["TM"])
+        lines = writer._write(self.basepath, self.metadata)
+
+        self.assertIn(r"\includeonly{049_McGill_University_FSAEM_CR_TM}", lines)
+        self.assertIn(r"\include{049_McGill_University_FSAEM_CR_FI}", lines)
+        self.assertIn(r"\include{049_McGill_University_FSAEM_CR_TM}", lines)
+        self.assertEqual(2, len(writer._chapters))
+
+        chapter = writer._chapters["049_McGill_University_FSAEM_CR_TM"]
+        self.assertEqual(r"\chapter{Random stuff}", chapter[0])
+
+    def testwrite_reuse_chapters(self):
+        writer = CostReportLaTeXWriter(reuse_chapters=True)
+        writer._write(self.basepath, self.metadata)
+
+        tm = self.metadata.systems[1]
+        part = tm.get_component("TM-00001-AA")
+        name = part.name
+        part.name = "Mug holder"
+        try:
+            lines = writer._write(self.basepath, self.metadata)
+            self.assertFalse(any("Mug holder" in line for line in lines))
+
+            writer.invalidate(["TM"])
+            lines = writer._write(self.basepath, self.metadata)
+            self.assertTrue(any("Mug holder" in line for line in lines))
+        finally:
+            part.name = name
+
+    def testwrite_duplicates(self):
+        tmpdir = tempfile.mkdtemp()
+        basepath = os.path.join(tmpdir, "testdata")
+        shutil.copytree(self.basepath, basepath)
+
+        drawings_dir = os.path.join(basepath, "TM", "drawings")
+        shutil.copy(
+            os.path.join(drawings_dir, "TM-00001-AA.pdf"),
+            os.path.join(drawings_dir, "TM-A0002-AA.pdf"),
+        )
+
+        metadata = MetadataReader().read(basepath)
+        for system in metadata.systems:
+            SystemFileReader().read(basepath, system)
+
+        lines = self.writer._write(basepath, metadata)
+        shutil.rmtree(tmpdir)
+
+        includes = [line for line in lines if line.startswith(r"\includepdf")]
+        self.assertEqual(1, len(includes))
+
+        crossrefs = [line for line in lines if "same as" in line]
+        self.assertEqual(1, len(crossrefs))
+        self.assertIn(r"\label{dwg:TM-A0002-AA-0}", crossrefs[0])
+        self.assertIn(r"\pageref{dwg:TM-00001-AA-0}", crossrefs[0])
+
 
 #        self.writer.write(self.basepath, self.metadata)
 
@@ -97,6 +275,69 @@ class TestFSGBOMWriter(unittest.TestCase):
         self.writer.write(self.basepath, self.metadata)
         os.remove(os.path.join(self.basepath, "049_McGill University_FSAEM_CR.xlsx"))
 
+    def testwrite_write_only(self):
+        filepath = os.path.join(self.basepath, "049_McGill University_FSAEM_CR.xlsx")
+
+        self.writer.write(self.basepath, self.metadata)
+        expected = _read_workbook_values(filepath)
+        os.remove(filepath)
+
+        FSGBOMWriter(write_only=True).write(self.basepath, self.metadata)
+        actual = _read_workbook_values(filepath)
+        os.remove(filepath)
+
+        self.assertEqual(expected, actual)
+
+    def testwrite_compact(self):
+        filepath = os.path.join(self.basepath, "049_McGill University_FSAEM_CR.xlsx")
+
+        FSGBOMWriter(write_only=True, layout="compact").write(
+            self.basepath, self.metadata
+        )
+        wb = load_workbook(filepath)
+        os.remove(filepath)
+
+        self.assertEqual(["Summary", "FI", "TM"], wb.sheetnames)
+
+        links = [cell.hyperlink for cell in wb["Summary"]["B"] if cell.hyperlink]
+        self.assertEqual(6, len(links))
+        self.assertEqual("'TM'!A31", links[3].location)
+        self.assertEqual("University", wb["TM"]["A31"].value)
+        self.assertEqual("TM-A0001-AA", wb["TM"]["A11"].value)
+
+    def testwrite_shards_system(self):
+        writer = FSGBOMWriter(shard="system", processes=2)
+        filenames = writer.write_shards(self.basepath, self.metadata)
+
+        self.assertEqual(2, len(filenames))
+        for filename in filenames:
+            filepath = os.path.join(self.basepath, filename)
+            self.assertTrue(os.path.exists(filepath))
+            os.remove(filepath)
+
+        filepath = os.path.join(self.basepath, "049_McGill University_FSAEM_CR.xlsx")
+        wb = load_workbook(filepath)
+        self.assertEqual(["Index"], wb.sheetnames)
+        self.assertEqual(7, wb["Index"].max_row)
+        os.remove(filepath)
+
+    def testwrite_shards_components(self):
+        writer = FSGBOMWriter(shard=3, processes=1, index=False)
+        filenames = writer.write_shards(self.basepath, self.metadata)
+
+        self.assertEqual(3, len(filenames))
+        for filename in filenames:
+            filepath = os.path.join(self.basepath, filename)
+            self.assertTrue(os.path.exists(filepath))
+            os.remove(filepath)
+
+        filepath = os.path.join(self.basepath, "049_McGill University_FSAEM_CR.xlsx")
+        self.assertFalse(os.path.exists(filepath))
+
+    def testinvalid_shard(self):
+        for shard in ["abc", "0", 0, -1]:
+            self.assertRaises(ValueError, FSGBOMWriter, shard=shard)
+
 
 class TestFSGAppendixLaTeXWriter(unittest.TestCase):
     def setUp(self):
@@ -116,6 +357,11 @@ class TestFSGAppendixLaTeXWriter(unittest.TestCase):
     def tearDown(self):
         unittest.TestCase.tearDown(self)
 
+        for filename in ["cost_summary.pdf", ".cost_summary.pdf.sha1"]:
+            filepath = os.path.join(self.basepath, filename)
+            if os.path.exists(filepath):
+                os.remove(filepath)
+
     def testskeleton(self):
         self.assertTrue(True)
 